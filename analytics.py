@@ -0,0 +1,243 @@
+"""
+Statistics over finished games, computed with NumPy.
+
+Reads finished games from an archive written by archiveGames.py, or from a
+scan of the Games table, --chunkSize games at a time, so memory use depends on
+the chunk size and not on the number of games. The boards of each chunk are
+decoded into one array, and every board is evaluated at once: a line is found
+by AND-ing shifted slices of the array, the same few operations for a chunk of
+a hundred games or a million.
+
+    python analytics.py --input finished.jsonl.gz
+    python analytics.py --config config
+
+Prints, for each board size and win length, as JSON: the number of games, how
+often the player who moved first won, lost or tied, the average game length in
+moves, win rates by opening square, how often the winner held each square, and
+how many games have a stored Result that disagrees with their board. Opening
+statistics only cover games played since the Opening attribute was recorded.
+
+NumPy is needed here but not by the application: pip install numpy
+"""
+import sys
+import os
+import argparse
+import gzip
+import json
+import time
+from ConfigParser import ConfigParser
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dynamodb'))
+from dynamodb.setupDynamoDB import getDynamoDBConnection
+from dynamodb.userSummaries import isSummaryKey
+from models.board import (Board, BOARD_ATTRIBUTE, SIZE_ATTRIBUTE, WIN_LENGTH_ATTRIBUTE, DEFAULT_SIZE,
+                          DEFAULT_WIN_LENGTH, DIRECTIONS)
+from models.game import OPENING_ATTRIBUTE, parseStatus
+from rebuildSummaries import scanGames
+
+# Markers as stored in the arrays of decoded boards.
+X = ord("X")
+O = ord("O")
+# Outcome codes, from the point of view of the player who moved first.
+FIRST_WON, SECOND_WON, TIE, UNDECIDED = range(4)
+
+
+def readArchive(path):
+    """
+    Yields the games in a JSON-lines archive, gzipped when its name ends in .gz.
+    """
+    with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def isFinished(item):
+    return (not isSummaryKey(item["GameId"]) and "StatusDate" in item and
+            parseStatus(item["StatusDate"]) == "FINISHED")
+
+
+def readChunks(items, chunkSize):
+    """
+    Groups finished games into lists of at most chunkSize by board size and win
+    length, yielding each list as it fills and the rest at the end.
+    """
+    groups = {}
+    for item in items:
+        if not isFinished(item):
+            continue
+        shape = (int(item.get(SIZE_ATTRIBUTE, DEFAULT_SIZE)), int(item.get(WIN_LENGTH_ATTRIBUTE, DEFAULT_WIN_LENGTH)))
+        group = groups.setdefault(shape, [])
+        group.append(item)
+        if len(group) >= chunkSize:
+            yield shape, group
+            groups[shape] = []
+    for shape, group in groups.items():
+        if group:
+            yield shape, group
+
+
+def packedBoard(item, cells):
+    packed = item.get(BOARD_ATTRIBUTE)
+    if packed is None:
+        # Games stored with an attribute per square.
+        packed = Board.fromItem(item).toPacked()
+    return packed[:cells].ljust(cells)
+
+
+def decodeChunk(items, size):
+    """
+    Returns the boards of items as an array of shape (games, size, size) holding
+    the character code of each square, and for each game the character code of
+    the first player's marker, the character code of the winner's marker
+    according to the stored Result, 0 for a tie, and the opening square, -1 when
+    it was not recorded.
+    """
+    cells = size * size
+    packed = "".join(packedBoard(item, cells) for item in items)
+    boards = np.frombuffer(packed.encode("ascii"), dtype=np.uint8).reshape(len(items), size, size)
+    # The invitee moves first, and the host plays X.
+    first = np.array([O if item["OUser"] != item["OpponentId"] else X for item in items], dtype=np.uint8)
+    stored = np.array([0 if item.get("Result") == "Tie" else X if item.get("Result") == item["OUser"] else O
+                       for item in items], dtype=np.uint8)
+    openings = np.array([int(item.get(OPENING_ATTRIBUTE, -1)) for item in items], dtype=np.int32)
+    return boards, first, stored, openings
+
+
+def hasLine(held, winLength):
+    """
+    Given a boolean array of shape (games, size, size) of the squares a player
+    holds, returns for each game whether they hold winLength squares in a row.
+    """
+    games, size = held.shape[0], held.shape[1]
+    found = np.zeros(games, dtype=bool)
+    for rowStep, columnStep in DIRECTIONS:
+        rows = size - rowStep * (winLength - 1)
+        columns = size - abs(columnStep) * (winLength - 1)
+        # Lines running down and to the left start winLength - 1 columns in.
+        start = winLength - 1 if columnStep < 0 else 0
+        # line[g, r, c] is whether game g has a line starting at row r and column start + c.
+        line = np.ones((games, rows, columns), dtype=bool)
+        for step in range(winLength):
+            row, column = rowStep * step, start + columnStep * step
+            line &= held[:, row:row + rows, column:column + columns]
+        found |= line.reshape(games, -1).any(axis=1)
+    return found
+
+
+class ShapeStats(object):
+    """
+    Running totals for the games on one board size and win length.
+    """
+    def __init__(self, size, winLength):
+        self.size = size
+        self.winLength = winLength
+        cells = size * size
+        self.games = 0
+        self.outcomes = np.zeros(4, dtype=np.int64)
+        self.moves = 0
+        self.mismatches = 0
+        self.openingOutcomes = np.zeros((cells, 4), dtype=np.int64)
+        self.winnerSquares = np.zeros(cells, dtype=np.int64)
+
+    def add(self, boards, first, stored, openings):
+        games = len(boards)
+        xHeld = boards == X
+        oHeld = boards == O
+        xWins = hasLine(xHeld, self.winLength)
+        oWins = hasLine(oHeld, self.winLength)
+        occupied = (xHeld | oHeld).reshape(games, -1)
+        full = occupied.all(axis=1)
+
+        # The winner's marker as the board shows it, 0 for a full board without a line.
+        winner = np.where(xWins, X, np.where(oWins, O, 0)).astype(np.uint8)
+        decided = xWins | oWins | full
+        outcome = np.where(~decided, UNDECIDED,
+                           np.where(winner == 0, TIE, np.where(winner == first, FIRST_WON, SECOND_WON)))
+
+        self.games += games
+        self.outcomes += np.bincount(outcome, minlength=4)
+        self.moves += int(occupied.sum())
+        self.mismatches += int((decided & (winner != stored)).sum())
+
+        cells = self.size * self.size
+        opened = (openings >= 0) & (openings < cells)
+        self.openingOutcomes += np.bincount(openings[opened] * 4 + outcome[opened],
+                                            minlength=cells * 4).reshape(cells, 4)
+        self.winnerSquares += (xHeld[xWins].reshape(-1, cells).sum(axis=0) +
+                               oHeld[oWins].reshape(-1, cells).sum(axis=0))
+
+    def report(self):
+        games = max(self.games, 1)
+        winners = max(int(self.outcomes[FIRST_WON] + self.outcomes[SECOND_WON]), 1)
+        openings = []
+        for square in np.flatnonzero(self.openingOutcomes.sum(axis=1)):
+            counts = self.openingOutcomes[square]
+            total = float(counts.sum())
+            openings.append({
+                "square": int(square),
+                "games": int(total),
+                "firstPlayerWinRate": round(counts[FIRST_WON] / total, 4),
+                "firstPlayerLossRate": round(counts[SECOND_WON] / total, 4),
+                "tieRate": round(counts[TIE] / total, 4)
+            })
+        return {
+            "size": self.size,
+            "winLength": self.winLength,
+            "games": self.games,
+            "firstPlayerWinRate": round(self.outcomes[FIRST_WON] / float(games), 4),
+            "firstPlayerLossRate": round(self.outcomes[SECOND_WON] / float(games), 4),
+            "tieRate": round(self.outcomes[TIE] / float(games), 4),
+            "undecided": int(self.outcomes[UNDECIDED]),
+            "averageMoves": round(self.moves / float(games), 2),
+            "openings": openings,
+            "winnerSquareRates": [round(count / float(winners), 4) for count in self.winnerSquares],
+            "resultMismatches": self.mismatches
+        }
+
+
+def analyze(items, chunkSize=100000):
+    """
+    Returns the report for every board size and win length among items.
+    """
+    stats = {}
+    for (size, winLength), chunk in readChunks(items, chunkSize):
+        if (size, winLength) not in stats:
+            stats[(size, winLength)] = ShapeStats(size, winLength)
+        stats[(size, winLength)].add(*decodeChunk(chunk, size))
+    return [stats[shape].report() for shape in sorted(stats)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute statistics over finished TicTacToe games',
+                                     prog='analytics.py')
+    parser.add_argument('--input', help='Archive written by archiveGames.py. Without it, the Games table is scanned.')
+    parser.add_argument('--config', help='Path to the config file containing application settings.')
+    parser.add_argument('--mode', help='Whether to connect to a DynamoDB service endpoint, or to DynamoDB Local.',
+                        choices=['local', 'service'], default='service')
+    parser.add_argument('--endpoint', help='An endpoint to connect to.')
+    parser.add_argument('--port', help='The port of DynamoDB Local endpoint to connect to.', type=int)
+    parser.add_argument('--pageSize', help='Items read per scan request.', type=int, default=100)
+    parser.add_argument('--chunkSize', help='Games evaluated together.', type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.input is not None:
+        items = readArchive(args.input)
+    else:
+        configFile = args.config or os.environ.get('CONFIG_FILE')
+        config = None
+        if configFile is not None:
+            config = ConfigParser()
+            config.read(configFile)
+        dynamodb = getDynamoDBConnection(config=config, endpoint=args.endpoint, port=args.port,
+                                         local=(args.mode == 'local'))
+        items = scanGames(dynamodb.Table("Games"), args.pageSize)
+
+    start = time.time()
+    report = analyze(items, args.chunkSize)
+    print(json.dumps({"shapes": report, "seconds": round(time.time() - start, 2)}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
 import sys
 import os
 import json
+import hashlib
+import mimetypes
 import argparse
 import time
-from flask import Flask, render_template, request, session, flash, redirect, jsonify
+import threading
+from flask import (Flask, Response, g, render_template, request, session, flash, redirect, jsonify, make_response,
+                   send_from_directory, url_for, abort)
 from uuid import uuid4
 from ConfigParser import ConfigParser  # Note the change in import name
 from datetime import datetime
@@ -11,16 +15,26 @@ from datetime import datetime
 sys.path.append(os.path.join(os.path.dirname(__file__), 'dynamodb'))
 from dynamodb.connectionManager import ConnectionManager
 from dynamodb.gameController import GameController
+from dynamodb import instrumentation
+from dynamodb.stateBus import SocketBus
+from dynamodb.leaderboard import Leaderboard
+from dynamodb.batchWriter import RateLimiter
+from dynamodb.retry import RetryPolicy
+from dynamodb.matchmaking import Matchmaker, SharedQueue, newQueue, connectSharedQueue
 from models.game import Game
+from models.board import DEFAULT_SIZE, DEFAULT_WIN_LENGTH, MAX_SIZE, isValidSize
+from models.solver import Solver
 
 application = Flask(__name__)
 application.debug = True
-application.secret_key = str(uuid4())
+# Worker processes started by server.py share the secret key, so a session cookie is valid on any of them.
+application.secret_key = os.environ.get('SECRET_KEY') or str(uuid4())
 
 parser = argparse.ArgumentParser(description='Run the TicTacToe sample app', prog='application.py')
 parser.add_argument('--config', help='Path to the config file containing application settings.')
-parser.add_argument('--mode', help='Whether to connect to a DynamoDB service endpoint, or to connect to DynamoDB Local.',
-                    choices=['local', 'service'], default='service')
+parser.add_argument('--mode', help='Whether to connect to a DynamoDB service endpoint, to connect to DynamoDB Local, '
+                    'or to keep the tables in memory in this process.',
+                    choices=['local', 'service', 'memory'], default='service')
 parser.add_argument('--endpoint', help='An endpoint to connect to.')
 parser.add_argument('--port', help='The port of DynamoDB Local endpoint to connect to.', type=int)
 parser.add_argument('--serverPort', help='The port for this Flask web server to listen on.', type=int)
@@ -40,8 +54,86 @@ use_instance_metadata = ""
 if 'USE_EC2_INSTANCE_METADATA' in os.environ:
     use_instance_metadata = os.environ['USE_EC2_INSTANCE_METADATA']
 
+cacheSize = 1024
+cacheTtl = 30
+statusDateFormat = 'legacy'
+legacyStatusDates = True
+solver = None
+userSummaries = False
+packedBoards = False
+leaderboardSnapshot = None
+leaderboardSnapshotSeconds = 60
+leaderboardRebuildPagesPerSecond = 2
+retryOptions = {}
+matchQueue = 'fifo'
+matchWaitSeconds = 60
+skillOptions = {}
+assetsDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+if config is not None:
+    if config.has_option('cache', 'size'):
+        cacheSize = config.getint('cache', 'size')
+    if config.has_option('cache', 'ttl'):
+        cacheTtl = config.getfloat('cache', 'ttl')
+    if config.has_option('games', 'statusDateFormat'):
+        statusDateFormat = config.get('games', 'statusDateFormat')
+    if config.has_option('games', 'legacyStatusDates'):
+        legacyStatusDates = config.getboolean('games', 'legacyStatusDates')
+    if config.has_option('games', 'solverTable'):
+        solver = Solver.load(config.get('games', 'solverTable'))
+    if config.has_option('games', 'userSummaries'):
+        userSummaries = config.getboolean('games', 'userSummaries')
+    if config.has_option('games', 'packedBoards'):
+        packedBoards = config.getboolean('games', 'packedBoards')
+    if config.has_option('leaderboard', 'snapshot'):
+        leaderboardSnapshot = config.get('leaderboard', 'snapshot')
+    if config.has_option('leaderboard', 'snapshotSeconds'):
+        leaderboardSnapshotSeconds = config.getfloat('leaderboard', 'snapshotSeconds')
+    if config.has_option('leaderboard', 'rebuildPagesPerSecond'):
+        leaderboardRebuildPagesPerSecond = config.getfloat('leaderboard', 'rebuildPagesPerSecond')
+    for name, get in (('maxAttempts', config.getint), ('baseDelay', config.getfloat), ('maxDelay', config.getfloat),
+                      ('requestsPerSecond', config.getfloat)):
+        if config.has_option('retry', name):
+            retryOptions[name] = get('retry', name)
+    if config.has_option('matchmaking', 'queue'):
+        matchQueue = config.get('matchmaking', 'queue')
+    if config.has_option('matchmaking', 'waitSeconds'):
+        matchWaitSeconds = config.getfloat('matchmaking', 'waitSeconds')
+    for name, get in (('bucketWidth', config.getfloat), ('widenSeconds', config.getfloat),
+                      ('maxSpread', config.getint)):
+        if config.has_option('matchmaking', name):
+            skillOptions[name] = get('matchmaking', name)
+    if config.has_option('assets', 'directory'):
+        assetsDirectory = config.get('assets', 'directory')
+
+# Set by server.py when running several worker processes, which share game updates through this bus.
+bus = None
+if 'STATE_BUS_ADDRESS' in os.environ:
+    bus = SocketBus(os.environ['STATE_BUS_ADDRESS'], os.environ['STATE_BUS_AUTHKEY'])
+
+leaderboard = Leaderboard(snapshotPath=leaderboardSnapshot, snapshotSeconds=leaderboardSnapshotSeconds)
+
 cm = ConnectionManager(mode=args.mode, config=config, endpoint=args.endpoint, port=args.port, use_instance_metadata=use_instance_metadata)
-controller = GameController(cm)
+controller = GameController(cm, cacheSize=cacheSize, cacheTtl=cacheTtl,
+                            statusDateFormat=statusDateFormat, legacyStatusDates=legacyStatusDates, bus=bus,
+                            solver=solver, userSummaries=userSummaries, leaderboard=leaderboard,
+                            retryPolicy=RetryPolicy(**retryOptions), packedBoards=packedBoards)
+# With several workers, server.py serves the quick play queue to all of them.
+if 'MATCH_QUEUE_ADDRESS' in os.environ:
+    sharedQueue = connectSharedQueue(os.environ['MATCH_QUEUE_ADDRESS'], os.environ['STATE_BUS_AUTHKEY'],
+                                     matchQueue, skillOptions)
+else:
+    sharedQueue = SharedQueue(newQueue(matchQueue, skillOptions))
+matchmaker = Matchmaker(controller, queue=sharedQueue, ratingFor=leaderboard.rating, waitSeconds=matchWaitSeconds)
+metrics = instrumentation.Metrics()
+
+# The leaderboard is loaded from its last snapshot, or else rebuilt from the finished games in the background.
+# Every worker process rebuilds its own copy, so the scan is rate limited to leave read capacity for requests.
+if not leaderboard.load():
+    print("Warning: no leaderboard snapshot to load; rebuilding it with a scan of the Games table at {} pages per "
+          "second. Set [leaderboard] snapshot to start from a saved copy.".format(leaderboardRebuildPagesPerSecond))
+    threading.Thread(target=leaderboard.rebuildFrom, args=(controller.gamesTable,),
+                     kwargs={"limiter": RateLimiter(leaderboardRebuildPagesPerSecond)}).start()
+leaderboard.start()
 
 serverPort = args.serverPort
 if config is not None:
@@ -57,6 +149,106 @@ if 'SERVER_PORT' in os.environ:
 if serverPort is None:
     serverPort = 5000
 
+# How long a single game event stream stays open, and how often it sends a keep-alive comment.
+EVENT_STREAM_SECONDS = 5 * 60
+EVENT_KEEPALIVE_SECONDS = 15
+
+# Built by buildAssets.py. Without a manifest, pages link to the assets under static/.
+assetManifest = {"assets": {}, "encodings": {}}
+if os.path.exists(os.path.join(assetsDirectory, 'manifest.json')):
+    with open(os.path.join(assetsDirectory, 'manifest.json')) as f:
+        assetManifest = json.load(f)
+
+# Built assets never change under the same name, so browsers may keep them for a year without asking again.
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+# Preferred first.
+ASSET_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+@application.context_processor
+def assetUrls():
+    def asset(path):
+        built = assetManifest["assets"].get(path)
+        if built is None:
+            return url_for('static', filename=path)
+        return url_for('builtAsset', filename=built)
+    return {"asset": asset}
+
+def templateVersion(directory):
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            digest.update(f.read())
+    # Pages also change when the assets they link to are rebuilt.
+    digest.update(json.dumps(assetManifest, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+# Part of every page ETag, so that pages cached before the templates changed are rendered again.
+TEMPLATE_VERSION = templateVersion(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'))
+
+def collectControllerMetrics():
+    stats = controller.getCacheStats()
+    lines = []
+    for name in ('hits', 'misses', 'evictions', 'expirations'):
+        lines += instrumentation.singleMetric("tictactoe_game_cache_%s_total" % name, "counter",
+                                              "Game cache %s." % name, stats[name])
+    lines += instrumentation.singleMetric("tictactoe_game_cache_size", "gauge", "Games currently cached.", stats['size'])
+    lines += instrumentation.singleMetric("tictactoe_game_subscribers", "gauge", "Open game event streams.",
+                                          controller.hub.subscriberCount())
+    lines += instrumentation.singleMetric("tictactoe_leaderboard_players", "gauge", "Players on the leaderboard.",
+                                          leaderboard.playerCount())
+    lines += instrumentation.singleMetric("tictactoe_matchmaking_waiting", "gauge", "Players waiting for a quick game.",
+                                          matchmaker.waitingCount())
+    retryStats = controller.getRetryStats()
+    for name, help in (("throttles", "DynamoDB requests throttled."), ("retries", "Throttled DynamoDB requests retried."),
+                       ("failures", "Throttled DynamoDB requests given up on.")):
+        counter = instrumentation.Counter("tictactoe_dynamodb_%s_total" % name, help, ("operation",))
+        for operation, count in retryStats[name].items():
+            counter.inc((operation,), count)
+        lines += counter.render()
+    return lines
+
+metrics.addCollector(collectControllerMetrics)
+
+@application.before_request
+def startTiming():
+    g.requestStart = time.time()
+    instrumentation.startRequest()
+
+@application.after_request
+def recordTiming(response):
+    recorder = instrumentation.endRequest()
+    seconds = time.time() - g.requestStart
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.observeRequest(route, seconds, recorder)
+    response.headers["Server-Timing"] = instrumentation.serverTiming(recorder, seconds)
+    return response
+
+@application.route('/metrics')
+def prometheusMetrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@application.route('/assets/<path:filename>')
+def builtAsset(filename):
+    """
+    Serves a fingerprinted asset, precompressed in the best encoding the browser accepts.
+    """
+    encodings = assetManifest["encodings"].get(filename)
+    if encodings is None:
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0]
+    encoding = None
+    for name, extension in ASSET_ENCODINGS:
+        if name in encodings and request.accept_encodings[name]:
+            encoding = name
+            filename += extension
+            break
+    response = send_from_directory(assetsDirectory, filename, mimetype=mimetype)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "public, max-age=%d, immutable" % ASSET_MAX_AGE
+    return response
+
 @application.route('/logout')
 def logout():
     session["username"] = None
@@ -64,9 +256,8 @@ def logout():
 
 @application.route('/table', methods=["GET", "POST"])
 def createTable():
-    cm.createGamesTable()
-    while not controller.checkIfTableIsActive():
-        time.sleep(3)
+    if not controller.checkIfTableIsActive():
+        cm.createGamesTable()
     return redirect('/index')
 
 @application.route('/')
@@ -76,7 +267,10 @@ def index():
         form = request.form
         if form:
             formInput = form.get("username")
-            if formInput and formInput.strip():
+            if formInput and controller.isComputer(formInput.strip()):
+                flash("That name is reserved for the computer opponent.")
+                session["username"] = None
+            elif formInput and formInput.strip():
                 session["username"] = formInput
             else:
                 session["username"] = None
@@ -86,31 +280,34 @@ def index():
     if request.method == "POST":
         return redirect('/index')
 
-    inviteGames = controller.getGameInvites(session.get("username"))
-    if inviteGames is None:
-        flash("Table has not been created yet, please follow this link to create table.")
+    dashboard = controller.getDashboard(session.get("username"), finishedCursor=request.args.get("finished"))
+    if dashboard is None:
+        if cm.isSettingUp():
+            flash("The table is being created, please refresh this page in a few moments.")
+        else:
+            flash("Table has not been created yet, please follow this link to create table.")
         return render_template("table.html", user="")
 
-    inviteGames = [Game(inviteGame) for inviteGame in inviteGames]
-
-    inProgressGames = controller.getGamesWithStatus(session.get("username"), "IN_PROGRESS")
-    inProgressGames = [Game(inProgressGame) for inProgressGame in inProgressGames]
-
-    finishedGames = controller.getGamesWithStatus(session.get("username"), "FINISHED")
-    fs = [Game(finishedGame) for finishedGame in finishedGames]
+    inviteGames = [Game(inviteGame) for inviteGame in dashboard["invites"]]
+    inProgressGames = [Game(inProgressGame) for inProgressGame in dashboard["inProgress"]]
+    fs = [Game(finishedGame) for finishedGame in dashboard["finished"]]
 
     return render_template("index.html",
                            user=session["username"],
                            invites=inviteGames,
                            inprogress=inProgressGames,
-                           finished=fs)
+                           finished=fs,
+                           finishedCursor=dashboard["finishedCursor"],
+                           record=dashboard.get("record"),
+                           olderThanFirstPage=bool(request.args.get("finished")))
 
 @application.route('/create')
 def create():
     if session.get("username", None) is None:
         flash("Need to login to create game")
         return redirect("/index")
-    return render_template("create.html", user=session["username"])
+    return render_template("create.html", user=session["username"], computerUser=controller.computerUser,
+                           sizes=range(DEFAULT_SIZE, MAX_SIZE + 1))
 
 @application.route('/play', methods=["POST"])
 def play():
@@ -124,12 +321,59 @@ def play():
             flash("Use valid a name (not empty or your name)")
             return redirect("/create")
 
-        if controller.createNewGame(gameId, creator, invitee):
+        try:
+            size = int(form.get("boardSize", DEFAULT_SIZE))
+            winLength = int(form.get("winLength", DEFAULT_WIN_LENGTH))
+        except ValueError:
+            size = winLength = 0
+        if not isValidSize(size, winLength):
+            flash("Boards are %d to %d squares wide, and lines to win at least %d and at most as long as the board."
+                  % (DEFAULT_SIZE, MAX_SIZE, DEFAULT_WIN_LENGTH))
+            return redirect("/create")
+        if controller.isComputer(invitee) and size != DEFAULT_SIZE:
+            flash("The computer only plays on %dx%d boards." % (DEFAULT_SIZE, DEFAULT_SIZE))
+            return redirect("/create")
+
+        if controller.createNewGame(gameId, creator, invitee, size, winLength):
             return redirect("/game=%s" % gameId)
 
     flash("Something went wrong creating the game.")
     return redirect("/create")
 
+@application.route('/quickplay', methods=["POST"])
+def quickplay():
+    """
+    Pairs the player with the next player looking for a game, starting the game
+    straight away, or queues them until someone else arrives. With ?format=json
+    returns {"gameId": ...}, where gameId is null while the player waits.
+    """
+    if session.get("username") is None:
+        flash("Need to login to play")
+        return redirect("/index")
+    gameId = matchmaker.join(session["username"])
+    if gameId is False:
+        if request.args.get("format") == "json":
+            return jsonify(gameId=None, error="The game could not be started."), 503
+        flash("Your quick game could not be started, please try again.")
+        return redirect("/index")
+    if request.args.get("format") == "json":
+        return jsonify(gameId=gameId)
+    if gameId is not None:
+        return redirect("/game=%s" % gameId)
+    return render_template("quickplay.html", user=session["username"], waitSeconds=matchmaker.waitSeconds)
+
+@application.route('/quickplay/status')
+def quickplayStatus():
+    if session.get("username") is None:
+        return jsonify(gameId=None), 401
+    return jsonify(gameId=matchmaker.status(session["username"]))
+
+@application.route('/quickplay/cancel', methods=["POST"])
+def quickplayCancel():
+    if session.get("username") is not None:
+        matchmaker.leave(session["username"])
+    return redirect("/index")
+
 @application.route('/game=<gameId>')
 def game(gameId):
     if session.get("username", None) is None:
@@ -142,13 +386,26 @@ def game(gameId):
         return redirect("/index")
 
     boardState = controller.getBoardState(item)
-    result = controller.checkForGameResult(boardState, item, session["username"])
+    game = Game(item)
 
-    if result is not None:
-        if not controller.changeGameToFinishedState(item, result, session["username"]):
-            flash("Some error occurred while trying to finish the game.")
+    # Moves that end a game finish it atomically; only games stored before games had a
+    # version, all of them on the classic board, can be decided and still in progress.
+    if game.status == "IN_PROGRESS" and game.version == 0 and boardState.isClassic():
+        result = controller.checkForGameResult(boardState, item, session["username"])
+        if result is not None:
+            if controller.changeGameToFinishedState(item, result, session["username"]):
+                item = controller.getGame(gameId)
+                game = Game(item)
+            else:
+                flash("Some error occurred while trying to finish the game.")
+
+    # The page only depends on the game's version and on who is looking at it, unless
+    # there are messages to flash, so a page the browser already has is not rendered again.
+    etag = "%d-%s" % (game.version, hashlib.sha1(("%s|%s" % (TEMPLATE_VERSION, session["username"]))
+                                                 .encode("utf-8")).hexdigest()[:16])
+    if "_flashes" not in session and request.if_none_match.contains(etag):
+        return notModified(etag, private=True)
 
-    game = Game(item)
     status = game.status
     turn = game.turn
 
@@ -162,44 +419,150 @@ def game(gameId):
     else:
         turn += " (X)"
 
-    gameData = {
-        'gameId': gameId,
-        'status': game.status,
-        'turn': game.turn,
-        'board': boardState
-    }
-    gameJson = json.dumps(gameData)
-    return render_template("play.html",
-                           gameId=gameId,
-                           gameJson=gameJson,
-                           user=session["username"],
-                           status=status,
-                           turn=turn,
-                           opponent=game.getOpposingPlayer(session["username"]),
-                           result=result,
-                           TopLeft=boardState[0],
-                           TopMiddle=boardState[1],
-                           TopRight=boardState[2],
-                           MiddleLeft=boardState[3],
-                           MiddleMiddle=boardState[4],
-                           MiddleRight=boardState[5],
-                           BottomLeft=boardState[6],
-                           BottomMiddle=boardState[7],
-                           BottomRight=boardState[8])
-
+    gameJson = json.dumps(controller.getGameData(item))
+    response = make_response(render_template("play.html",
+                                             gameId=gameId,
+                                             gameJson=gameJson,
+                                             user=session["username"],
+                                             status=status,
+                                             turn=turn,
+                                             opponent=game.getOpposingPlayer(session["username"]),
+                                             result=result,
+                                             board=boardState,
+                                             version=game.version,
+                                             oUser=game.o))
+    return tagged(response, etag, private=True)
+
+@application.route('/gameData=<gameId>')
+def gameData(gameId):
+    """
+    JSON state of a game, tagged with its version. While the game is unchanged, a
+    client sending the tag back in If-None-Match gets an empty 304; the game is
+    usually found in the game cache, so that costs no read either.
+    """
+    item = controller.getGame(gameId)
+    if item is None:
+        return jsonify(game=None), 404
+    etag = str(Game(item).version)
+    if request.if_none_match.contains(etag):
+        return notModified(etag)
+    return tagged(jsonify(**controller.getGameData(item)), etag)
+
+def tagged(response, etag, private=False):
+    """
+    Adds a strong ETag to response, and asks browsers to revalidate it on every use.
+    """
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+    if private:
+        response.headers["Vary"] = "Cookie"
+    return response
+
+def notModified(etag, private=False):
+    return tagged(Response(status=304), etag, private)
+
+
+@application.route('/gameEvents=<gameId>')
+def gameEvents(gameId):
+    """
+    Server-Sent Events stream of game states. Moves are pushed by the controller
+    as they are accepted, so an idle board costs no reads against the Games table.
+    """
+    def stream():
+        subscription = controller.hub.subscribe(gameId)
+        try:
+            deadline = time.time() + EVENT_STREAM_SECONDS
+            yield "retry: 3000\n\n"
+            while time.time() < deadline:
+                gameData = subscription.wait(EVENT_KEEPALIVE_SECONDS)
+                if gameData is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "data: %s\n\n" % json.dumps(gameData)
+                if gameData["status"] == "FINISHED":
+                    break
+        finally:
+            controller.hub.unsubscribe(subscription)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Most players listed on one leaderboard page.
+LEADERBOARD_MAX = 100
+
+@application.route('/leaderboard')
+def showLeaderboard():
+    """
+    Lists the top players, and the rank of the logged in player or of ?user=.
+    Served from memory; ?format=json returns the same data as JSON.
+    """
+    try:
+        count = min(max(int(request.args.get("n", 10)), 1), LEADERBOARD_MAX)
+    except ValueError:
+        count = 10
+    player = request.args.get("user") or session.get("username")
+    top = leaderboard.top(count)
+    stats = leaderboard.stats(player) if player else None
+    if request.args.get("format") == "json":
+        return jsonify(top=top, player=stats)
+    return render_template("leaderboard.html", user=session.get("username"), top=top, player=stats)
+
+@application.route('/cacheStats')
+def cacheStats():
+    return jsonify(**controller.getCacheStats())
+
+def clientVersion(value):
+    """
+    The game version a move was made on, as sent by the client, or None.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def moveResponse(success, item, status=200):
+    response = jsonify(success=success, game=controller.getGameData(item) if item is not None else None)
+    response.status_code = status
+    return response
 
 @application.route('/update', methods=["POST"])
 def update():
-    form = request.form
-    if form:
-        gameId = form.get("gameId")
-        position = form.get("position")
-        marker = form.get("marker")
+    """
+    JSON move API. Takes gameId, position (a square index, or a name on 3x3 boards), the version
+    of the game the move was made on and an optional requestId, also accepted as an
+    Idempotency-Key header, so that retried or double-clicked moves are only applied once.
+    Returns the new game state.
+    """
+    if session.get("username") is None:
+        return moveResponse(False, None, 401)
 
-        if controller.updateGameState(gameId, int(position), marker):
-            return jsonify(success=True)
+    data = request.get_json(silent=True) or request.form
+    gameId = data.get("gameId")
+    position = data.get("position")
+    requestKey = request.headers.get("Idempotency-Key") or data.get("requestId")
+    if not gameId or position is None:
+        return moveResponse(False, None, 400)
 
-    return jsonify(success=False)
+    success, item = controller.makeMove(gameId, position, session["username"], requestKey,
+                                        clientVersion(data.get("version")))
+    if item is None:
+        return moveResponse(False, None, 404)
+    return moveResponse(success, item, 200 if success else 409)
+
+@application.route('/select=<gameId>', methods=["POST"])
+def select(gameId):
+    """
+    Form fallback for the board when JavaScript is not available.
+    """
+    if session.get("username") is None:
+        flash("Need to login")
+        return redirect("/index")
+
+    success, item = controller.makeMove(gameId, request.form.get("cell"), session["username"],
+                                        version=clientVersion(request.form.get("version")))
+    if not success:
+        flash("That move is not allowed.")
+    return redirect("/game=%s" % gameId)
 
 @application.route('/accept/<gameId>', methods=['POST'])
 def accept_game(gameId):
@@ -229,9 +592,12 @@ def reject_game(gameId):
         flash("Game not found.")
         return redirect("/index")
     
-    # Implement your rejection logic here
-    flash("Game invite rejected.")
+    if controller.rejectGameInvite(game):
+        flash("Game invite rejected.")
+    else:
+        flash("Error rejecting game invite.")
     return redirect("/index")
 
 if __name__ == '__main__':
-    application.run(host='0.0.0.0', port=serverPort)
+    # Threaded, so that open game event streams do not block other requests.
+    application.run(host='0.0.0.0', port=serverPort, threaded=True)
@@ -0,0 +1,276 @@
+"""
+Archives FINISHED games out of the Games table.
+
+Scans the table in parallel segments, copies finished games older than a
+threshold to an archive, either a JSON-lines file (gzipped when its name ends
+in .gz) or another DynamoDB table, and then deletes them from the Games table
+with batch writes. Writes are rate limited, and progress is saved to a
+checkpoint file after every page so that an interrupted run can be resumed.
+
+    python archiveGames.py --config config --olderThanDays 30 --output finished.jsonl.gz
+
+Games are archived before they are deleted, so a run that is interrupted
+between the two may archive some games twice when resumed; archived lines can
+be deduplicated by GameId.
+
+Archived games are also removed from the Recent lists of their players'
+summaries. The summaries' win, loss and tie counters, and the leaderboard,
+still count them; rebuilding either from the Games table afterwards, with
+rebuildSummaries.py or without a leaderboard snapshot, only counts the games
+left in it.
+"""
+import sys
+import os
+import argparse
+import gzip
+import json
+import threading
+import time
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from ConfigParser import ConfigParser
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dynamodb'))
+from dynamodb.batchWriter import RateLimiter, batchWrite
+from dynamodb.setupDynamoDB import getDynamoDBConnection
+from dynamodb.userSummaries import RECENT, summaryKey
+from models.game import parseStatus, statusDateTimestamp
+
+# Attempts at trimming a summary that keeps changing between reading and writing it.
+SUMMARY_ATTEMPTS = 3
+
+class Checkpoint(object):
+    """
+    Progress of each scan segment, saved as JSON after every page.
+    """
+    def __init__(self, path, cutoff, totalSegments):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {"cutoff": cutoff, "totalSegments": totalSegments, "segments": {}}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state["totalSegments"] != totalSegments:
+                raise ValueError("Checkpoint %s was written with %d segments" % (path, state["totalSegments"]))
+            self.state = state
+
+    @property
+    def cutoff(self):
+        return self.state["cutoff"]
+
+    def segment(self, segment):
+        return self.state["segments"].get(str(segment), {"startKey": None, "done": False, "archived": 0, "scanned": 0})
+
+    def update(self, segment, progress):
+        with self.lock:
+            self.state["segments"][str(segment)] = progress
+            if self.path is None:
+                return
+            temporary = self.path + ".tmp"
+            with open(temporary, "w") as f:
+                json.dump(self.state, f)
+            os.rename(temporary, self.path)
+
+
+def _jsonValue(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError("Cannot archive %r" % (value,))
+
+
+class ArchiveFile(object):
+    """
+    Appends archived games to a JSON-lines file, one compact object per line.
+    """
+    def __init__(self, path):
+        self.file = gzip.open(path, "ab") if path.endswith(".gz") else open(path, "ab")
+        self.lock = threading.Lock()
+
+    def write(self, items):
+        lines = "".join(json.dumps(item, separators=(",", ":"), sort_keys=True, default=_jsonValue) + "\n"
+                        for item in items)
+        with self.lock:
+            self.file.write(lines.encode("utf-8"))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+class ArchiveTable(object):
+    """
+    Copies archived games to another DynamoDB table with the Games key schema.
+    """
+    def __init__(self, archiver, tableName):
+        self.archiver = archiver
+        self.tableName = tableName
+
+    def write(self, items):
+        self.archiver.batchWrite(self.tableName, [{"PutRequest": {"Item": item}} for item in items])
+
+    def close(self):
+        pass
+
+
+class GameArchiver(object):
+    """
+    Moves finished games older than the checkpoint's cutoff from the Games table
+    to an archive, scanning each segment of the table on its own thread.
+    """
+    def __init__(self, dynamodb, checkpoint, totalSegments=4, pageSize=100, writesPerSecond=25, dryRun=False,
+                 tableName="Games"):
+        self.dynamodb = dynamodb
+        self.table = dynamodb.Table(tableName)
+        self.tableName = tableName
+        self.checkpoint = checkpoint
+        self.totalSegments = totalSegments
+        self.pageSize = pageSize
+        self.limiter = RateLimiter(writesPerSecond)
+        self.dryRun = dryRun
+        self.archive = None
+
+    def isArchivable(self, item):
+        statusDate = item.get("StatusDate")
+        if not statusDate or parseStatus(statusDate) != "FINISHED":
+            return False
+        return statusDateTimestamp(statusDate) < self.checkpoint.cutoff
+
+    def batchWrite(self, tableName, requests):
+        """
+        Raises RuntimeError when some requests could not be written, so that the
+        page is not checkpointed and its games are not deleted before they are archived.
+        """
+        unwritten = batchWrite(self.dynamodb, tableName, requests, self.limiter)
+        if unwritten:
+            raise RuntimeError("{} of {} writes to {} were still unprocessed after retrying".format(
+                len(unwritten), len(requests), tableName))
+
+    def trimSummaries(self, items):
+        """
+        Removes archived games from the Recent lists of their players' summaries,
+        so that dashboards do not link to games that are gone. Players without a
+        summary are skipped.
+        """
+        archived = {}
+        for item in items:
+            for user in (item["HostId"], item["OpponentId"]):
+                archived.setdefault(user, set()).add(item["GameId"])
+        for user, gameIds in archived.items():
+            self.trimSummary(user, gameIds)
+
+    def trimSummary(self, user, gameIds):
+        key = {"GameId": summaryKey(user)}
+        for _ in range(SUMMARY_ATTEMPTS):
+            summary = self.table.get_item(Key=key, ConsistentRead=True).get("Item")
+            if summary is None:
+                return
+            recent = summary.get(RECENT, [])
+            trimmed = [record for record in recent if record["GameId"] not in gameIds]
+            if len(trimmed) == len(recent):
+                return
+            self.limiter.acquire(1)
+            try:
+                # Only if no game finished since the summary was read.
+                self.table.update_item(Key=key, UpdateExpression="SET #r = :trimmed",
+                                       ConditionExpression="#r = :recent", ExpressionAttributeNames={"#r": RECENT},
+                                       ExpressionAttributeValues={":trimmed": trimmed, ":recent": recent})
+                return
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+        print("Error trimming the summary of {}: it changed on every attempt".format(user))
+
+    def archiveSegment(self, segment):
+        progress = self.checkpoint.segment(segment)
+        while not progress["done"]:
+            kwargs = {"Segment": segment, "TotalSegments": self.totalSegments, "Limit": self.pageSize}
+            if progress["startKey"] is not None:
+                kwargs["ExclusiveStartKey"] = progress["startKey"]
+            response = self.table.scan(**kwargs)
+            items = [item for item in response["Items"] if self.isArchivable(item)]
+            if items and not self.dryRun:
+                self.archive.write(items)
+                self.batchWrite(self.tableName, [{"DeleteRequest": {"Key": {"GameId": item["GameId"]}}}
+                                                 for item in items])
+                self.trimSummaries(items)
+            progress = {
+                "startKey": response.get("LastEvaluatedKey"),
+                "done": "LastEvaluatedKey" not in response,
+                "archived": progress["archived"] + len(items),
+                "scanned": progress["scanned"] + len(response["Items"])
+            }
+            self.checkpoint.update(segment, progress)
+        return progress
+
+    def run(self, archive):
+        """
+        Archives every segment in parallel. Returns the number of games scanned and archived.
+        """
+        self.archive = archive
+        pool = ThreadPoolExecutor(max_workers=self.totalSegments)
+        try:
+            results = list(pool.map(self.archiveSegment, range(self.totalSegments)))
+        finally:
+            pool.shutdown()
+        return sum(result["scanned"] for result in results), sum(result["archived"] for result in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive finished TicTacToe games', prog='archiveGames.py')
+    parser.add_argument('--config', help='Path to the config file containing application settings.')
+    parser.add_argument('--mode', help='Whether to connect to a DynamoDB service endpoint, or to DynamoDB Local.',
+                        choices=['local', 'service'], default='service')
+    parser.add_argument('--endpoint', help='An endpoint to connect to.')
+    parser.add_argument('--port', help='The port of DynamoDB Local endpoint to connect to.', type=int)
+    parser.add_argument('--olderThanDays', help='Archive games finished more than this many days ago.', type=float,
+                        default=30)
+    parser.add_argument('--output', help='JSON-lines file to append archived games to; gzipped if it ends in .gz.')
+    parser.add_argument('--archiveTable', help='DynamoDB table to copy archived games to, instead of a file.')
+    parser.add_argument('--segments', help='Number of parallel scan segments.', type=int, default=4)
+    parser.add_argument('--pageSize', help='Items read per scan request.', type=int, default=100)
+    parser.add_argument('--writesPerSecond', help='Maximum items written per second, across segments.',
+                        type=float, default=25)
+    parser.add_argument('--checkpoint', help='File recording progress, to resume an interrupted run.',
+                        default='archiveGames.checkpoint')
+    parser.add_argument('--dryRun', help='Count the games that would be archived without changing anything.',
+                        action='store_true')
+    args = parser.parse_args()
+
+    if not args.dryRun and (args.output is None) == (args.archiveTable is None):
+        parser.error('Specify exactly one of --output and --archiveTable')
+
+    configFile = args.config or os.environ.get('CONFIG_FILE')
+    config = None
+    if configFile is not None:
+        config = ConfigParser()
+        config.read(configFile)
+
+    dynamodb = getDynamoDBConnection(config=config, endpoint=args.endpoint, port=args.port, local=(args.mode == 'local'))
+    cutoff = int((time.time() - args.olderThanDays * 24 * 60 * 60) * 1000)
+    checkpoint = Checkpoint(None if args.dryRun else args.checkpoint, cutoff, args.segments)
+    archiver = GameArchiver(dynamodb, checkpoint, totalSegments=args.segments, pageSize=args.pageSize,
+                            writesPerSecond=args.writesPerSecond, dryRun=args.dryRun)
+    archive = None
+    if not args.dryRun:
+        archive = ArchiveFile(args.output) if args.output else ArchiveTable(archiver, args.archiveTable)
+
+    start = time.time()
+    try:
+        scanned, archived = archiver.run(archive)
+    except RuntimeError as e:
+        print("Error archiving games: {}. Run it again to resume from the checkpoint.".format(e))
+        sys.exit(1)
+    finally:
+        if archive is not None:
+            archive.close()
+    print("Scanned {} games and {} {} finished games in {:.1f}s".format(
+        scanned, "found" if args.dryRun else "archived", archived, time.time() - start))
+    if not args.dryRun and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+if __name__ == '__main__':
+    main()
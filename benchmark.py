@@ -0,0 +1,230 @@
+"""
+Load generator and benchmark for the TicTacToe application.
+
+Simulates concurrent pairs of players going through the whole game lifecycle
+(log in, create a game, accept it, open the board and play moves) and reports
+latency percentiles and throughput per route as JSON.
+
+By default the application is loaded in process against the in-memory table
+backend and driven through the Flask test client; pass --url to drive a running
+server over a real socket instead.
+
+    python benchmark.py --pairs 20 --games 5 --output bench.json
+"""
+import sys
+import os
+import re
+import json
+import argparse
+import threading
+import time
+import cookielib
+import urllib
+import urllib2
+
+# The application reports the DynamoDB calls made for each request in its Server-Timing header.
+DYNAMODB_TIMING = re.compile(r'dynamodb;dur=[0-9.]+;desc="([0-9]+) calls')
+
+# A game that ends in a tie: the invitee (O) moves first.
+MOVES = ["MiddleMiddle", "TopLeft", "TopRight", "BottomLeft", "MiddleLeft",
+         "MiddleRight", "TopMiddle", "BottomMiddle", "BottomRight"]
+
+
+class TestClient(object):
+    """
+    Drives the application in process through the Flask test client.
+    """
+    def __init__(self, application):
+        self.client = application.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.headers.get("Location"), response.headers.get("Server-Timing")
+
+
+class _NoRedirect(urllib2.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class HttpClient(object):
+    """
+    Drives a running server over HTTP, keeping its own session cookie.
+    """
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.opener = urllib2.build_opener(urllib2.HTTPCookieProcessor(cookielib.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.urlencode(data) if data is not None else None
+        if method == "POST" and body is None:
+            body = ""
+        try:
+            response = self.opener.open(self.url + path, body)
+            response.read()
+            headers = response.info()
+            return response.getcode(), headers.getheader("Location"), headers.getheader("Server-Timing")
+        except urllib2.HTTPError as e:
+            e.read()
+            return e.code, e.info().getheader("Location"), e.info().getheader("Server-Timing")
+
+
+class Recorder(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.dynamoCalls = {}
+
+    def record(self, route, seconds, ok, dynamoCalls):
+        with self.lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+            if dynamoCalls is not None:
+                self.dynamoCalls.setdefault(route, []).append(dynamoCalls)
+
+
+class Player(object):
+    def __init__(self, name, client, recorder):
+        self.name = name
+        self.client = client
+        self.recorder = recorder
+
+    def request(self, route, method, path, data=None, expected=(200, 302)):
+        start = time.time()
+        try:
+            status, location, timing = self.client.request(method, path, data)
+            ok = status in expected
+        except Exception as e:
+            sys.stderr.write("%s %s failed: %r\n" % (method, path, e))
+            status, location, timing, ok = None, None, None, False
+        seconds = time.time() - start
+        match = DYNAMODB_TIMING.search(timing or "")
+        self.recorder.record(route, seconds, ok, int(match.group(1)) if match else None)
+        return status, location
+
+
+def playGame(host, opponent):
+    host.request("/index", "GET", "/index")
+    status, location = host.request("/play", "POST", "/play", {"invitee": opponent.name}, expected=(302,))
+    if not location or "game=" not in location:
+        return
+    gameId = location.split("game=", 1)[1]
+
+    opponent.request("/index", "GET", "/index")
+    opponent.request("/accept/<gameId>", "POST", "/accept/%s" % gameId, expected=(302,))
+    host.request("/game=<gameId>", "GET", "/game=%s" % gameId, expected=(200,))
+
+    players = [opponent, host]
+    for turn, position in enumerate(MOVES):
+        player = players[turn % 2]
+        player.request("/update", "POST", "/update",
+                       {"gameId": gameId, "position": position, "requestId": "%s-%d" % (gameId, turn)},
+                       expected=(200,))
+        players[(turn + 1) % 2].request("/game=<gameId>", "GET", "/game=%s" % gameId, expected=(200,))
+
+
+def runPair(index, games, makeClient, recorder):
+    host = Player("host%d" % index, makeClient(), recorder)
+    opponent = Player("opponent%d" % index, makeClient(), recorder)
+    host.request("/index", "POST", "/index", {"username": host.name})
+    opponent.request("/index", "POST", "/index", {"username": opponent.name})
+    for _ in range(games):
+        playGame(host, opponent)
+
+
+def mean(values):
+    if not values:
+        return None
+    return float(sum(values)) / len(values)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    allLatencies = []
+    for route, latencies in sorted(recorder.latencies.items()):
+        allLatencies.extend(latencies)
+        routes[route] = {
+            "requests": len(latencies),
+            "errors": recorder.errors.get(route, 0),
+            "throughput": len(latencies) / elapsed,
+            "meanMs": 1000 * sum(latencies) / len(latencies),
+            "p50Ms": 1000 * percentile(latencies, 0.50),
+            "p95Ms": 1000 * percentile(latencies, 0.95),
+            "p99Ms": 1000 * percentile(latencies, 0.99),
+            "dynamodbCallsPerRequest": mean(recorder.dynamoCalls.get(route))
+        }
+    allCalls = sum(recorder.dynamoCalls.values(), [])
+    total = {
+        "requests": len(allLatencies),
+        "errors": sum(recorder.errors.values()),
+        "dynamodbCallsPerRequest": mean(allCalls),
+        "seconds": elapsed,
+        "throughput": len(allLatencies) / elapsed if elapsed else 0
+    }
+    return routes, total
+
+
+def loadApplication(config=None):
+    """
+    Imports the application against the in-memory table backend.
+    """
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.argv = ["application.py", "--mode", "memory"]
+    if config is not None:
+        sys.argv += ["--config", config]
+    import application
+    application.application.testing = True
+    return application
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the TicTacToe sample app', prog='benchmark.py')
+    parser.add_argument('--pairs', help='Number of concurrent pairs of players.', type=int, default=10)
+    parser.add_argument('--games', help='Number of games each pair plays.', type=int, default=5)
+    parser.add_argument('--url', help='Benchmark a running server at this URL instead of an in-process application.')
+    parser.add_argument('--config', help='Config file for the in-process application.')
+    parser.add_argument('--output', help='File to write the JSON results to, instead of standard output.')
+    args = parser.parse_args()
+
+    if args.url:
+        makeClient = lambda: HttpClient(args.url)
+    else:
+        application = loadApplication(args.config)
+        makeClient = lambda: TestClient(application.application)
+
+    recorder = Recorder()
+    threads = [threading.Thread(target=runPair, args=(index, args.games, makeClient, recorder))
+               for index in range(args.pairs)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    routes, total = summarize(recorder, elapsed)
+    results = {
+        "target": args.url or "in-process (memory)",
+        "pairs": args.pairs,
+        "gamesPerPair": args.games,
+        "total": total,
+        "routes": routes
+    }
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
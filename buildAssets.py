@@ -0,0 +1,161 @@
+"""
+Builds the static assets for serving with long-lived cache headers.
+
+Copies every stylesheet, script and font under static/ to the assets
+directory under a name carrying a hash of its content, minifying stylesheets
+on the way and rewriting the url() references between them to the new names.
+Each file is also written precompressed with gzip, and with brotli when the
+brotli package is installed. The manifest maps the path of every asset under
+static/ to its fingerprinted name, and every fingerprinted name to the
+encodings it was precompressed in.
+
+    python buildAssets.py
+
+The application serves the built assets from /assets/ when it finds the
+manifest on start up, and otherwise links to static/ as before. Run it again
+after changing anything under static/, and restart the application. Assets
+from earlier builds are left in place, so pages already in browser caches can
+still load them.
+"""
+import os
+import re
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import posixpath
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = "manifest.json"
+# Files copied to the assets directory; anything else under static/, such as source maps, is left out.
+EXTENSIONS = (".css", ".js", ".eot", ".svg", ".ttf", ".woff", ".woff2", ".png", ".gif", ".jpg", ".ico")
+# Fonts and images are already compressed, apart from svg.
+COMPRESSIBLE = (".css", ".js", ".svg")
+# Compressed copies that do not save at least this much are not worth negotiating.
+MIN_SAVING = 0.05
+
+STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*[\s\S]*?\*/)')
+URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minifyCss(css):
+    """
+    Removes comments, other than /*! license comments, and the whitespace that
+    does not change the meaning of a stylesheet. Strings are left as they are.
+    """
+    parts = []
+    for index, part in enumerate(STRING_OR_COMMENT.split(css)):
+        if index % 2:
+            if not part.startswith("/*") or part.startswith("/*!"):
+                parts.append(part)
+            continue
+        part = re.sub(r"\s+", " ", part)
+        # A space before ":" is a descendant combinator in a selector, so it stays.
+        part = re.sub(r" ?([{};,]) ?", r"\1", part)
+        part = re.sub(r": ", ":", part)
+        parts.append(part.replace(";}", "}"))
+    return "".join(parts).strip()
+
+
+def fingerprint(path, content):
+    base, extension = posixpath.splitext(path)
+    return "%s.%s%s" % (base, hashlib.sha1(content).hexdigest()[:12], extension)
+
+
+def rewriteUrls(css, path, manifest):
+    """
+    Points the url() references of the stylesheet at path to the fingerprinted
+    names of the assets they refer to.
+    """
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2)
+        target, suffix = re.match(r"([^?#]*)(.*)", url).groups()
+        if not target or "://" in url or url.startswith(("/", "data:")):
+            return match.group(0)
+        resolved = posixpath.normpath(posixpath.join(directory, target))
+        if resolved not in manifest:
+            return match.group(0)
+        return "url(%s%s%s%s)" % (quote, posixpath.relpath(manifest[resolved], directory), suffix, quote)
+    return URL.sub(replace, css)
+
+
+def compress(path, content):
+    """
+    Writes the gzip and brotli copies of content next to path. Returns the encodings written.
+    """
+    encodings = []
+    buffer = io.BytesIO()
+    # mtime is fixed so that building the same file twice gives the same bytes.
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(content)
+    candidates = [("gzip", ".gz", buffer.getvalue())]
+    if brotli is not None:
+        candidates.append(("br", ".br", brotli.compress(content)))
+    for encoding, extension, compressed in candidates:
+        if len(compressed) <= len(content) * (1 - MIN_SAVING):
+            with open(path + extension, "wb") as f:
+                f.write(compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def findAssets(source):
+    paths = []
+    for directory, _, names in os.walk(source):
+        for name in names:
+            if name.endswith(EXTENSIONS):
+                paths.append(os.path.relpath(os.path.join(directory, name), source).replace(os.sep, "/"))
+    # Stylesheets last, so that the assets they refer to already have their names.
+    return sorted(paths, key=lambda path: (path.endswith(".css"), path))
+
+
+def build(source, output, minify=True):
+    """
+    Builds every asset under source into output. Returns the manifest.
+    """
+    manifest = {}
+    encodings = {}
+    for path in findAssets(source):
+        with open(os.path.join(source, path), "rb") as f:
+            content = f.read()
+        if path.endswith(".css"):
+            css = content.decode("utf-8")
+            if minify and not path.endswith(".min.css"):
+                css = minifyCss(css)
+            content = rewriteUrls(css, path, manifest).encode("utf-8")
+        built = fingerprint(path, content)
+        target = os.path.join(output, *built.split("/"))
+        if not os.path.isdir(os.path.dirname(target)):
+            os.makedirs(os.path.dirname(target))
+        with open(target, "wb") as f:
+            f.write(content)
+        manifest[path] = built
+        encodings[built] = compress(target, content) if path.endswith(COMPRESSIBLE) else []
+
+    with open(os.path.join(output, MANIFEST), "w") as f:
+        json.dump({"assets": manifest, "encodings": encodings}, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the TicTacToe static assets', prog='buildAssets.py')
+    parser.add_argument('--source', help='Directory of the assets to build.', default=os.path.join(ROOT, 'static'))
+    parser.add_argument('--output', help='Directory to write the built assets and manifest to.',
+                        default=os.path.join(ROOT, 'assets'))
+    parser.add_argument('--noMinify', help='Copy stylesheets without minifying them.', action='store_true')
+    args = parser.parse_args()
+
+    manifest = build(args.source, args.output, minify=not args.noMinify)
+    print("Built {} assets into {}{}".format(len(manifest), args.output,
+                                              "" if brotli is not None else " (brotli is not installed; gzip only)"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import threading
+import time
+from botocore.exceptions import ClientError
+
+# DynamoDB accepts at most 25 requests in one BatchWriteItem call.
+BATCH_SIZE = 25
+# Attempts at each batch, and the longest wait between them, unless a RetryPolicy is given.
+BATCH_ATTEMPTS = 8
+BATCH_MAX_DELAY = 5.0
+THROTTLING_ERRORS = ("ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded")
+
+
+class RateLimiter(object):
+    """
+    Token bucket that can be shared by several threads, limiting writes per second.
+    """
+    def __init__(self, perSecond):
+        self.perSecond = float(perSecond)
+        self.tokens = self.perSecond
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self, count):
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.perSecond, self.tokens + (now - self.updated) * self.perSecond)
+                self.updated = now
+                if self.tokens >= count or self.tokens >= self.perSecond:
+                    self.tokens -= count
+                    return
+                wait = (count - self.tokens) / self.perSecond
+            time.sleep(wait)
+
+
+def batchWrite(dynamodb, tableName, requests, limiter=None, policy=None):
+    """
+    Writes put and delete requests in batches of 25, retrying unprocessed and
+    throttled requests with the backoff of a RetryPolicy, by default one of
+    BATCH_ATTEMPTS attempts per batch. Returns the requests still unwritten
+    when a batch runs out of attempts, which is an empty list when every
+    request was written.
+    """
+    if policy is None:
+        # retry imports this module, so it cannot be imported at the top.
+        from retry import RetryPolicy
+        policy = RetryPolicy(maxAttempts=BATCH_ATTEMPTS, maxDelay=BATCH_MAX_DELAY)
+    for start in range(0, len(requests), BATCH_SIZE):
+        pending = requests[start:start + BATCH_SIZE]
+        attempt = 0
+        while pending:
+            if limiter is not None:
+                limiter.acquire(len(pending))
+            try:
+                response = dynamodb.batch_write_item(RequestItems={tableName: pending})
+                pending = response.get("UnprocessedItems", {}).get(tableName, [])
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in THROTTLING_ERRORS:
+                    raise
+            if pending:
+                attempt += 1
+                if attempt >= policy.maxAttempts:
+                    return pending + requests[start + BATCH_SIZE:]
+                time.sleep(policy.delay(attempt))
+    return []
@@ -1,35 +1,70 @@
 import boto3
+import threading
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
-from setupDynamoDB import getDynamoDBConnection, createGamesTable
+from setupDynamoDB import getDynamoDBConnection, createGamesTable, getTableCapacity, getIndexProjection
 
 class ConnectionManager:
 
-    def __init__(self, mode='service', config=None, endpoint=None, port=None, use_instance_metadata=''):
-        self.dynamodb = getDynamoDBConnection(config=config, endpoint=endpoint, port=port, local=(mode == 'local'), use_instance_metadata=use_instance_metadata)
-        self.gamesTable = None
-        self.setupGamesTable()
+    def __init__(self, mode='service', config=None, endpoint=None, port=None, use_instance_metadata='',
+                 maxPoolConnections=None):
+        self.dynamodb = getDynamoDBConnection(config=config, endpoint=endpoint, port=port, local=(mode == 'local'),
+                                              use_instance_metadata=use_instance_metadata, memory=(mode == 'memory'),
+                                              maxPoolConnections=maxPoolConnections)
+        # Capacity the Games table is created with, if it does not exist.
+        self.capacity = getTableCapacity(config)
+        self.indexProjection = getIndexProjection(config)
+        # Table resources are lazy, so this makes no request to DynamoDB.
+        self.gamesTable = self.dynamodb.Table('Games')
+        self.tableActive = False
+        self.setupLock = threading.Lock()
+        self.setupThread = None
+        if mode == 'memory':
+            self.setupGamesTable()
+        else:
+            # Check for the table, and warm up the connection pool, without blocking start up.
+            self.startSetup()
 
     def setupGamesTable(self):
-        try:
-            # Retrieve the table if it exists
-            self.gamesTable = self.dynamodb.Table('Games')
-            self.gamesTable.load()  # Load the table metadata to check if it exists
-        except self.dynamodb.meta.client.exceptions.ResourceNotFoundException:
-            # Table does not exist; create it
-            self.gamesTable = createGamesTable(self.dynamodb)
+        """
+        Creates the Games table if it does not exist, and waits for it to become active.
+        """
+        with self.setupLock:
+            try:
+                if self.checkIfTableIsActive():
+                    return
+            except self.dynamodb.meta.client.exceptions.ResourceNotFoundException:
+                # Table does not exist; create it
+                createGamesTable(self.dynamodb, self.capacity, self.indexProjection)
+            except Exception as e:
+                print("Error setting up the Games table: {}".format(e))
+                return
+            self.checkIfTableIsActive()
+
+    def startSetup(self):
+        if self.setupThread is not None and self.setupThread.is_alive():
+            return
+        self.setupThread = threading.Thread(target=self.setupGamesTable)
+        self.setupThread.daemon = True
+        self.setupThread.start()
+
+    def isSettingUp(self):
+        return self.setupThread is not None and self.setupThread.is_alive()
 
     def getGamesTable(self):
-        if self.gamesTable is None:
-            self.setupGamesTable()
         return self.gamesTable
 
     def createGamesTable(self):
-        self.gamesTable = createGamesTable(self.dynamodb)
+        """
+        Starts creating the Games table in the background.
+        """
+        self.startSetup()
 
     def checkIfTableIsActive(self):
-        try:
-            self.getGamesTable()  # Ensure the table is loaded
-            return self.gamesTable.table_status == 'ACTIVE'
-        except Exception as e:
-            print("Error checking table status: {}".format(e))
-            return False
+        """
+        Returns whether the Games table is active. Once it is, that is remembered and
+        DynamoDB is not asked again. Raises ResourceNotFoundException if it does not exist.
+        """
+        if not self.tableActive:
+            description = self.dynamodb.meta.client.describe_table(TableName='Games')
+            self.tableActive = description['Table']['TableStatus'] == 'ACTIVE'
+        return self.tableActive
@@ -0,0 +1,260 @@
+import errno
+import fcntl
+import json
+import os
+import re
+import select
+import socket
+import threading
+import time
+import urllib
+from collections import deque
+
+# Request line of a game event stream, as routed to /gameEvents=<gameId> by the application.
+EVENT_REQUEST = re.compile(r"^GET /gameEvents=([^/?# ]+)(?:\?\S*)? HTTP/1\.[01]$")
+
+RESPONSE_HEAD = ("HTTP/1.1 200 OK\r\n"
+                 "Content-Type: text/event-stream; charset=utf-8\r\n"
+                 "Cache-Control: no-cache\r\n"
+                 "X-Accel-Buffering: no\r\n"
+                 "Connection: close\r\n"
+                 "\r\n"
+                 "retry: 3000\n\n")
+
+# Longest request head that is inspected, and how long a client may take to send it.
+MAX_HEAD = 8192
+HEAD_SECONDS = 10
+# How long to wait before looking again at a request head that has only partly arrived.
+HEAD_RETRY_SECONDS = 0.05
+
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+class _Connection(object):
+    __slots__ = ('sock', 'fd', 'address', 'opened', 'recheck', 'subscription', 'output', 'deadline', 'keepalive', 'closing')
+
+    def __init__(self, sock, address, now):
+        self.sock = sock
+        self.fd = sock.fileno()
+        self.address = address
+        self.opened = now
+        self.recheck = None
+        self.subscription = None
+        self.output = ""
+        self.deadline = None
+        self.keepalive = None
+        self.closing = False
+
+
+class EventStreams(object):
+    """
+    Serves game event streams from one thread with non-blocking sockets, so that
+    an open board costs a socket and a hub subscription rather than a request
+    thread. Every accepted connection is passed to add(). Requests for
+    /gameEvents=<gameId> are answered here; any other request is handed back
+    untouched to handOff(sock, address), to be served by the WSGI server.
+    """
+    def __init__(self, hub, handOff, streamSeconds=300, keepaliveSeconds=15):
+        self.hub = hub
+        self.handOff = handOff
+        self.streamSeconds = streamSeconds
+        self.keepaliveSeconds = keepaliveSeconds
+        # Filled by other threads and drained by the event loop.
+        self.incoming = deque()
+        self.events = deque()
+        self.wakeRead, self.wakeWrite = os.pipe()
+        for fd in (self.wakeRead, self.wakeWrite):
+            _setNonBlocking(fd)
+        self.poller = select.poll()
+        self.poller.register(self.wakeRead, select.POLLIN)
+        self.connections = {}
+        self.rechecks = 0
+        self.nextTick = 0
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def add(self, sock, address):
+        self.incoming.append((sock, address))
+        self.wake()
+
+    def wake(self):
+        try:
+            os.write(self.wakeWrite, b"x")
+        except OSError as e:
+            if e.errno not in _WOULD_BLOCK:
+                raise
+
+    def streamCount(self):
+        return sum(1 for connection in list(self.connections.values()) if connection.subscription is not None)
+
+    def run(self):
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                print("Error serving game event streams: {}".format(e))
+
+    def step(self):
+        timeout = max(self.nextTick - time.time(), 0)
+        for fd, flags in self.poller.poll(timeout * 1000):
+            if fd == self.wakeRead:
+                self.drainWake()
+                continue
+            connection = self.connections.get(fd)
+            if connection is None:
+                continue
+            if flags & (select.POLLERR | select.POLLNVAL):
+                self.close(connection)
+            elif connection.subscription is None:
+                self.readHead(connection)
+            else:
+                if flags & (select.POLLIN | select.POLLHUP):
+                    self.readIdle(connection)
+                if flags & select.POLLOUT and self.connections.get(fd) is connection:
+                    self.flush(connection)
+
+        now = time.time()
+        while self.incoming:
+            sock, address = self.incoming.popleft()
+            sock.setblocking(0)
+            connection = _Connection(sock, address, now)
+            self.connections[connection.fd] = connection
+            self.poller.register(connection.fd, select.POLLIN)
+        while self.events:
+            connection, data = self.events.popleft()
+            if self.connections.get(connection.fd) is connection and not connection.closing:
+                self.send(connection, "data: %s\n\n" % json.dumps(data))
+                if data["status"] == "FINISHED":
+                    connection.closing = True
+        if now >= self.nextTick:
+            self.tick(now)
+            self.nextTick = now + (HEAD_RETRY_SECONDS if self.rechecks else 1.0)
+
+    def drainWake(self):
+        try:
+            while os.read(self.wakeRead, 4096):
+                pass
+        except OSError as e:
+            if e.errno not in _WOULD_BLOCK:
+                raise
+
+    def tick(self, now):
+        for fd, connection in list(self.connections.items()):
+            if connection.subscription is None:
+                if connection.recheck is not None and now >= connection.recheck:
+                    connection.recheck = None
+                    self.rechecks -= 1
+                    self.poller.modify(fd, select.POLLIN)
+                elif now - connection.opened > HEAD_SECONDS:
+                    self.close(connection)
+            elif now >= connection.deadline:
+                connection.closing = True
+                self.send(connection, "")
+            elif now >= connection.keepalive:
+                self.send(connection, ": keep-alive\n\n")
+
+    def readHead(self, connection):
+        try:
+            head = connection.sock.recv(MAX_HEAD, socket.MSG_PEEK)
+        except socket.error as e:
+            if e.args[0] not in _WOULD_BLOCK:
+                self.close(connection)
+            return
+        if not head:
+            self.close(connection)
+            return
+
+        end = head.find("\r\n\r\n")
+        if end < 0 and len(head) < MAX_HEAD:
+            # Wait for the rest of the head without spinning on the data already buffered.
+            if connection.recheck is None:
+                self.rechecks += 1
+            connection.recheck = time.time() + HEAD_RETRY_SECONDS
+            self.nextTick = min(self.nextTick, connection.recheck)
+            self.poller.modify(connection.fd, 0)
+            return
+
+        match = EVENT_REQUEST.match(head.split("\r\n", 1)[0]) if end >= 0 else None
+        if match is None:
+            self.release(connection)
+            self.handOff(connection.sock, connection.address)
+            return
+
+        # Only the head is consumed; an event stream request has no body.
+        try:
+            connection.sock.recv(end + 4)
+        except socket.error:
+            self.close(connection)
+            return
+        self.startStream(connection, urllib.unquote(match.group(1)))
+
+    def startStream(self, connection, gameId):
+        connection.deadline = time.time() + self.streamSeconds
+        connection.subscription = self.hub.subscribe(gameId, lambda data: self.publish(connection, data))
+        self.send(connection, RESPONSE_HEAD)
+
+    def publish(self, connection, data):
+        # Called on the thread that published the game; handled on the event loop.
+        self.events.append((connection, data))
+        self.wake()
+
+    def readIdle(self, connection):
+        try:
+            data = connection.sock.recv(4096)
+        except socket.error as e:
+            if e.args[0] not in _WOULD_BLOCK:
+                self.close(connection)
+            return
+        if not data:
+            self.close(connection)
+
+    def send(self, connection, data):
+        connection.output += data
+        connection.keepalive = time.time() + self.keepaliveSeconds
+        self.flush(connection)
+
+    def flush(self, connection):
+        try:
+            while connection.output:
+                sent = connection.sock.send(connection.output)
+                connection.output = connection.output[sent:]
+        except socket.error as e:
+            if e.args[0] not in _WOULD_BLOCK:
+                self.close(connection)
+                return
+        if not connection.output and connection.closing:
+            self.close(connection)
+            return
+        self.poller.modify(connection.fd, select.POLLIN | (select.POLLOUT if connection.output else 0))
+
+    def release(self, connection):
+        """
+        Stops watching a connection, without closing it.
+        """
+        if self.connections.get(connection.fd) is connection:
+            del self.connections[connection.fd]
+        try:
+            self.poller.unregister(connection.fd)
+        except (KeyError, ValueError):
+            pass
+        if connection.recheck is not None:
+            connection.recheck = None
+            self.rechecks -= 1
+        if connection.subscription is not None:
+            self.hub.unsubscribe(connection.subscription)
+        connection.sock.setblocking(1)
+
+    def close(self, connection):
+        self.release(connection)
+        try:
+            connection.sock.close()
+        except socket.error:
+            pass
+
+
+def _setNonBlocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
@@ -1,16 +1,202 @@
 import boto3
+import threading
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
-from datetime import datetime
+from functools import partial
+from gameCache import TTLCache
+from gameHub import GameHub
+from indexMerge import IndexStream, mergeStreams, encodeCursor, decodeCursor, encodeStartKeys
+from instrumentation import InstrumentedTable, RecordingThreadPool
+from retry import RetryPolicy, RetryingTable
+from stateBus import LocalBus
+from userSummaries import (RECENT, RECENT_GAMES, COUNTERS, Put, Delete, Update, transactWrite, summaryKey, isSummaryKey,
+                           gameCreated, gameAccepted, gameRejected, gameFinished, readSummary)
+from models.board import (Board, SQUARES, EMPTY, BOARD_ATTRIBUTE, SIZE_ATTRIBUTE, WIN_LENGTH_ATTRIBUTE, DEFAULT_SIZE,
+                          DEFAULT_WIN_LENGTH, isValidSize)
+from models.solver import Solver
+from models.game import (Game, LEGACY, COMPACT, LIST_ATTRIBUTES, VERSION_ATTRIBUTE, OPENING_ATTRIBUTE, encodeStatusDate,
+                         statusDateTimestamp, statusPrefix, statusPrefixOf)
+
+HOST_INDEX = "HostId-StatusDate-index"
+OPPONENT_INDEX = "OpponentId-StatusDate-index"
+INDEX_KEYS = {HOST_INDEX: "HostId", OPPONENT_INDEX: "OpponentId"}
+
+# Index queries only return what the dashboard lists, leaving the boards behind.
+LIST_PROJECTION = ", ".join("#a%d" % index for index in range(len(LIST_ATTRIBUTES)))
+LIST_PROJECTION_NAMES = dict(("#a%d" % index, name) for index, name in enumerate(LIST_ATTRIBUTES))
+
+# Number of locks that serialize moves carrying the same idempotency key.
+MOVE_LOCKS = 64
+
+# State bus channels for changed or deleted games, and for the outcome of idempotent moves.
+GAME_CHANNEL = "game"
+MOVE_CHANNEL = "move"
+
+# Invitations to this user are played by the computer.
+COMPUTER_USER = "computer"
 
 class GameController:
-    def __init__(self, connectionManager):
+    def __init__(self, connectionManager, cacheSize=1024, cacheTtl=30, queryThreads=8,
+                 statusDateFormat=LEGACY, legacyStatusDates=True, bus=None, solver=None, computerUser=COMPUTER_USER,
+                 userSummaries=False, leaderboard=None, retryPolicy=None, packedBoards=False):
         self.cm = connectionManager
         self.dynamodb = self.cm.dynamodb
-        self.gamesTable = self.cm.getGamesTable()
+        # Throttled requests are retried with backoff rather than failing the move or page.
+        # Each attempt is recorded separately against the request.
+        self.retryPolicy = retryPolicy if retryPolicy is not None else RetryPolicy()
+        self.gamesTable = RetryingTable(InstrumentedTable(self.cm.getGamesTable()), self.retryPolicy)
+        self.client = RetryingTable(InstrumentedTable(self.dynamodb.meta.client), self.retryPolicy)
+        # When enabled, a summary item per user is kept up to date in the same transactions
+        # as the games, and the dashboard is read from it with a single GetItem.
+        self.userSummaries = userSummaries
+        # Whether moves write the board as the single packed Board attribute. Games already
+        # packed stay packed either way, and other games are packed by their next move.
+        self.packedBoards = packedBoards
+        self.hub = GameHub()
+        self.gameCache = TTLCache(maxSize=cacheSize, ttl=cacheTtl)
+        # Shared pool used to issue independent index queries concurrently.
+        self.queryPool = RecordingThreadPool(max_workers=queryThreads)
+        # Outcome of recent moves by idempotency key, so that retried moves are not applied twice.
+        self.moveResults = TTLCache(maxSize=cacheSize * 4, ttl=300)
+        self.moveLocks = [threading.Lock() for _ in range(MOVE_LOCKS)]
+        # New StatusDate values are written in statusDateFormat. Queries also look for
+        # legacy-format values while games written before switching to compact remain.
+        self.statusDateFormat = statusDateFormat
+        self.statusDateFormats = [statusDateFormat]
+        if statusDateFormat == COMPACT and legacyStatusDates:
+            self.statusDateFormats.append(LEGACY)
+        # Game changes and move outcomes are shared with any other worker processes
+        # through the bus, so that their caches and open boards stay current.
+        self.bus = bus if bus is not None else LocalBus()
+        self.changeLock = threading.Lock()
+        # Version of each game last pushed to boards, kept apart from the cache, which
+        # also holds games written or read by this worker before their change arrives.
+        self.publishedVersions = TTLCache(maxSize=cacheSize * 4, ttl=300)
+        self.bus.subscribe(GAME_CHANNEL, self.applyGameChange)
+        self.bus.subscribe(MOVE_CHANNEL, self.applyMoveResult)
+        # Perfect-play table used to choose the computer's moves.
+        self.solver = solver if solver is not None else Solver.build()
+        self.computerUser = computerUser
+        # Counts every game that finishes, as the change reaches this worker.
+        self.leaderboard = leaderboard
+
+    def getGameData(self, item):
+        game = Game(item)
+        board = self.getBoardState(item)
+        return {
+            'gameId': game.gameId,
+            'status': game.status,
+            'turn': game.turn,
+            'board': board.toList(),
+            'size': board.size,
+            'winLength': board.winLength,
+            'version': game.version
+        }
+
+    def publishGame(self, item):
+        """
+        Pushes the latest state of a game to every board subscribed to it.
+        """
+        return self.hub.publish(item["GameId"], self.getGameData(item))
+
+    def gameChanged(self, item):
+        """
+        Writes a game item that was just stored in the Games table through to the
+        game cache, and pushes it to subscribed boards, in every worker.
+        """
+        self.bus.publish(GAME_CHANNEL, (item["GameId"], item))
+
+    def gameDeleted(self, gameId):
+        self.bus.publish(GAME_CHANNEL, (gameId, None))
+
+    def applyGameChange(self, message):
+        """
+        Changes from other workers can arrive out of order, so a change is only
+        cached when it is newer than the cached copy of the game, and only pushed
+        to boards when it is newer than the last version pushed.
+        """
+        gameId, item = message
+        if item is None:
+            self.gameCache.invalidate(gameId)
+            self.publishedVersions.invalidate(gameId)
+            return
+        version = Game(item).version
+        with self.changeLock:
+            cached = self.gameCache.get(gameId)
+            published = self.publishedVersions.get(gameId)
+            publishedVersion = published["Version"] if published is not None else 0
+            if version > max(Game(cached).version if cached is not None else 0, publishedVersion):
+                self.gameCache.put(gameId, item)
+            if version <= publishedVersion:
+                return
+            self.publishedVersions.put(gameId, {"Version": version})
+        self.publishGame(item)
+        # A game is only written once after it finishes, so each finish is counted once.
+        if self.leaderboard is not None and item.get("Result"):
+            self.leaderboard.recordGame(item)
+
+    def applyMoveResult(self, message):
+        cacheKey, result = message
+        self.moveResults.put(cacheKey, result)
+
+    def updateGame(self, item, attributeUpdates, conditions, summaryUpdates=None):
+        """
+        Applies a conditional update to a game and returns the updated item. With
+        user summaries enabled, summaryUpdates(tableName, updatedItem) gives the
+        summary updates written in the same transaction. Every update advances the
+        game's Version.
+        """
+        key = {"GameId": item["GameId"]}
+        attributeUpdates = dict(attributeUpdates)
+        attributeUpdates[VERSION_ATTRIBUTE] = {"Value": 1, "Action": "ADD"}
+        if not self.userSummaries or summaryUpdates is None:
+            response = self.gamesTable.update_item(
+                Key=key,
+                AttributeUpdates=attributeUpdates,
+                Expected=conditions,
+                ReturnValues="ALL_NEW"
+            )
+            return response["Attributes"]
+
+        tableName = self.gamesTable.table_name
+        update = Update(tableName, key).attributeUpdates(attributeUpdates).expect(conditions)
+        # Every attribute that was read from item and not updated is covered by the conditions.
+        updated = update.applyTo(item)
+        transactWrite(self.client, [update] + summaryUpdates(tableName, updated))
+        return updated
+
+    def getCacheStats(self):
+        return self.gameCache.stats()
+
+    def getRetryStats(self):
+        return self.retryPolicy.stats()
+
+    def newStatusDate(self, status):
+        return encodeStatusDate(status, self.statusDateFormat)
 
-    def createNewGame(self, gameId, creator, invitee):
-        now = str(datetime.now())
-        statusDate = "PENDING_" + now
+    def statusPrefixes(self, status):
+        return [statusPrefix(status, statusDateFormat) for statusDateFormat in self.statusDateFormats]
+
+    def statusCondition(self, status, item):
+        """
+        Expected clause requiring the stored game to have the given status.
+        """
+        return {
+            "AttributeValueList": [statusPrefixOf(status, item["StatusDate"])],
+            "ComparisonOperator": "BEGINS_WITH"
+        }
+
+    def createNewGame(self, gameId, creator, invitee, size=DEFAULT_SIZE, winLength=DEFAULT_WIN_LENGTH):
+        """
+        Invites invitee to a game on a size x size board, won by winLength in a row.
+        The computer only plays on the classic 3x3 board.
+        """
+        if not isValidSize(size, winLength):
+            print("Error creating new game: no {0}x{0} board with {1} in a row".format(size, winLength))
+            return False
+        if self.isComputer(invitee) and (size, winLength) != (DEFAULT_SIZE, DEFAULT_WIN_LENGTH):
+            print("Error creating new game: the computer only plays {0}x{0} boards".format(DEFAULT_SIZE))
+            return False
+        statusDate = self.newStatusDate("PENDING")
         item = {
             "GameId": gameId,
             "HostId": creator,
@@ -19,141 +205,309 @@ class GameController:
             "Turn": invitee,
             "OpponentId": invitee
         }
+        if (size, winLength) != (DEFAULT_SIZE, DEFAULT_WIN_LENGTH):
+            item[SIZE_ATTRIBUTE] = size
+            item[WIN_LENGTH_ATTRIBUTE] = winLength
+            item[BOARD_ATTRIBUTE] = Board.empty(size, winLength).toPacked()
         try:
-            self.gamesTable.put_item(Item=item)
-            return True
+            self.putGame(item, gameCreated)
         except ClientError as e:
             print("Error creating new game: {}".format(e))
             return False
+        if self.isComputer(invitee):
+            self.startComputerGame(item)
+        return True
+
+    def createStartedGame(self, gameId, host, opponent):
+        """
+        Creates a game that is already in progress, for two players who were paired
+        with each other, so there is no invitation to accept.
+        """
+        item = {
+            "GameId": gameId,
+            "HostId": host,
+            "StatusDate": self.newStatusDate("IN_PROGRESS"),
+            "OUser": host,
+            "Turn": opponent,
+            "OpponentId": opponent
+        }
+        try:
+            self.putGame(item, gameAccepted)
+        except ClientError as e:
+            print("Error creating started game: {}".format(e))
+            return False
+        self.gameChanged(item)
+        return True
+
+    def putGame(self, item, summaryUpdates):
+        """
+        Writes a new game as Version 1, with the summary updates for it when user
+        summaries are enabled.
+        """
+        item[VERSION_ATTRIBUTE] = 1
+        if self.userSummaries:
+            tableName = self.gamesTable.table_name
+            transactWrite(self.client, [Put(tableName, item)] + summaryUpdates(tableName, item))
+        else:
+            self.gamesTable.put_item(Item=item)
+        self.gameCache.put(item["GameId"], item)
+
+    def isComputer(self, user):
+        return user == self.computerUser
+
+    def startComputerGame(self, item):
+        """
+        Accepts an invitation to the computer and plays its opening move.
+        """
+        if self.acceptGameInvite(item):
+            self.playComputerMove(self.getGame(item["GameId"]))
+
+    def playComputerMove(self, item):
+        """
+        Plays the computer's move in a game where it is the computer's turn, looking
+        the best square up in the solver table. Returns the latest state of the game.
+        """
+        if item is None or not self.isComputer(item["Turn"]):
+            return item
+        board = self.getBoardState(item)
+        if not board.isClassic():
+            return item
+        marker = "X" if item["OUser"] == self.computerUser else "O"
+        index = self.solver.playFor(board, marker)
+        if index is None or not self.updateBoardAndTurn(item, index, self.computerUser):
+            return item
+        return self.getGame(item["GameId"])
 
     def checkIfTableIsActive(self):
         try:
-            description = self.dynamodb.meta.client.describe_table(TableName=self.gamesTable.name)
-            status = description['Table']['TableStatus']
-            return status == "ACTIVE"
+            return self.cm.checkIfTableIsActive()
         except ClientError as e:
             print("Error checking table status: {}".format(e))
             return False
 
     def getGame(self, gameId):
+        if isSummaryKey(gameId):
+            return None
+        item = self.gameCache.get(gameId)
+        if item is not None:
+            return item
         try:
             response = self.gamesTable.get_item(Key={"GameId": gameId})
-            return response.get('Item', None)
+            item = response.get('Item', None)
+            if item is not None:
+                self.gameCache.put(gameId, item)
+            return item
         except ClientError as e:
             print("Error retrieving game: {}".format(e))
             return None
 
     def acceptGameInvite(self, game):
-        date = str(datetime.now())
-        status = "IN_PROGRESS_"
-        statusDate = status + date
-        key = {"GameId": game["GameId"]}
         attributeUpdates = {
-            "StatusDate": {"Value": statusDate, "Action": "PUT"}
+            "StatusDate": {"Value": self.newStatusDate("IN_PROGRESS"), "Action": "PUT"}
         }
         conditions = {
-            "StatusDate": {
-                "AttributeValueList": ["PENDING_"],
-                "ComparisonOperator": "BEGINS_WITH"
-            }
+            "StatusDate": self.statusCondition("PENDING", game)
         }
         try:
-            self.gamesTable.update_item(
-                Key=key,
-                AttributeUpdates=attributeUpdates,
-                Expected=conditions
-            )
+            self.gameChanged(self.updateGame(game, attributeUpdates, conditions, gameAccepted))
             return True
         except ClientError as e:
+            self.gameCache.invalidate(game["GameId"])
             print("Error accepting game invite: {}".format(e))
             return False
 
     def rejectGameInvite(self, game):
         key = {"GameId": game["GameId"]}
         condition = {
-            "StatusDate": {
-                "AttributeValueList": ["PENDING_"],
-                "ComparisonOperator": "BEGINS_WITH"
-            }
+            "StatusDate": self.statusCondition("PENDING", game)
         }
         try:
-            self.gamesTable.delete_item(Key=key, Expected=condition)
+            if self.userSummaries:
+                transactWrite(self.client, [Delete(self.gamesTable.table_name, key).expect(condition)] +
+                              gameRejected(self.gamesTable.table_name, game))
+            else:
+                self.gamesTable.delete_item(Key=key, Expected=condition)
+            self.gameDeleted(game["GameId"])
             return True
         except ClientError as e:
+            self.gameCache.invalidate(game["GameId"])
             print("Error rejecting game invite: {}".format(e))
             return False
 
+    def queryIndex(self, indexName, user, status, limit=10):
+        response = self.gamesTable.query(
+            IndexName=indexName,
+            KeyConditionExpression="%s = :v_user AND begins_with(StatusDate, :v_status)" % INDEX_KEYS[indexName],
+            ExpressionAttributeValues={
+                ":v_user": user,
+                ":v_status": status
+            },
+            ProjectionExpression=LIST_PROJECTION,
+            ExpressionAttributeNames=LIST_PROJECTION_NAMES,
+            Limit=limit
+        )
+        return response.get('Items', [])
+
+    def queryIndexPage(self, indexName, user, status, limit, startKey=None):
+        """
+        Fetches one page of an index query, newest first. Returns the items and the
+        LastEvaluatedKey to continue from.
+        """
+        kwargs = {
+            "IndexName": indexName,
+            "KeyConditionExpression": "%s = :v_user AND begins_with(StatusDate, :v_status)" % INDEX_KEYS[indexName],
+            "ExpressionAttributeValues": {
+                ":v_user": user,
+                ":v_status": status
+            },
+            "ProjectionExpression": LIST_PROJECTION,
+            "ExpressionAttributeNames": LIST_PROJECTION_NAMES,
+            "ScanIndexForward": False,
+            "Limit": limit
+        }
+        if startKey is not None:
+            kwargs["ExclusiveStartKey"] = startKey
+        response = self.gamesTable.query(**kwargs)
+        return response.get('Items', []), response.get('LastEvaluatedKey')
+
+    def getIndexKey(self, keyName, item):
+        return {"GameId": item["GameId"], keyName: item[keyName], "StatusDate": item["StatusDate"]}
+
     def getGameInvites(self, user):
         if user is None:
             return []
         try:
-            response = self.gamesTable.query(
-                IndexName="OpponentId-StatusDate-index",
-                KeyConditionExpression="OpponentId = :v_user AND begins_with(StatusDate, :v_status)",
-                ExpressionAttributeValues={
-                    ":v_user": user,
-                    ":v_status": "PENDING_"
-                },
-                Limit=10
-            )
-            return response.get('Items', [])
+            invites = []
+            for prefix in self.statusPrefixes("PENDING"):
+                invites.extend(self.queryIndex(OPPONENT_INDEX, user, prefix))
+            return invites
         except ClientError as e:
             print("Error getting game invites: {}".format(e))
             return []
 
     def updateBoardAndTurn(self, item, position, current_player):
+        """
+        Places current_player's marker on the square at position, given as an index
+        or, on a 3x3 board, a square name. Only the lines through the new marker are
+        checked for a win, and if the move ends the game the finished status and
+        Result are written in the same conditional update. The update is conditioned
+        on every square still matching the board it was evaluated on.
+        """
         player_one = item["HostId"]
         player_two = item["OpponentId"]
         gameId = item["GameId"]
-        statusDate = item["StatusDate"]
-        date = statusDate.split("_")[1]
+
+        board = self.getBoardState(item)
+        index = board.indexOf(position)
+        if index is None:
+            print("Error updating board and turn: unknown square {}".format(position))
+            return False
+        if board.isOccupied(index):
+            print("Error updating board and turn: square {} is already taken".format(position))
+            return False
 
         representation = "X" if item["OUser"] == current_player else "O"
         next_player = player_two if current_player == player_one else player_one
+        newBoard = board.place(index, representation)
 
-        key = {"GameId": gameId}
         attributeUpdates = {
-            position: {"Value": representation, "Action": "PUT"},
             "Turn": {"Value": next_player, "Action": "PUT"}
         }
+        packed = BOARD_ATTRIBUTE in item or self.packedBoards
+        if packed:
+            attributeUpdates[BOARD_ATTRIBUTE] = {"Value": newBoard.toPacked(), "Action": "PUT"}
+        else:
+            attributeUpdates[SQUARES[index]] = {"Value": representation, "Action": "PUT"}
+        if not board.x and not board.o:
+            attributeUpdates[OPENING_ATTRIBUTE] = {"Value": index, "Action": "PUT"}
+        winner = representation if newBoard.winsWith(index) else None
+        finishing = winner is not None or newBoard.isFull()
+        if finishing:
+            attributeUpdates["StatusDate"] = {"Value": self.newStatusDate("FINISHED"), "Action": "PUT"}
+            attributeUpdates["Turn"] = {"Value": "N/A", "Action": "PUT"}
+            attributeUpdates["Result"] = {"Value": current_player if winner is not None else "Tie", "Action": "PUT"}
+
         conditions = {
-            "StatusDate": {
-                "AttributeValueList": ["IN_PROGRESS_"],
-                "ComparisonOperator": "BEGINS_WITH"
-            },
-            "Turn": {"Value": current_player},
-            position: {"Exists": False}
+            "StatusDate": self.statusCondition("IN_PROGRESS", item),
+            "Turn": {"Value": current_player}
         }
+        if BOARD_ATTRIBUTE in item:
+            conditions[BOARD_ATTRIBUTE] = {"Value": item[BOARD_ATTRIBUTE]}
+        else:
+            conditions[BOARD_ATTRIBUTE] = {"Exists": False}
+            for square, marker in zip(SQUARES, board):
+                conditions[square] = {"Exists": False} if marker == EMPTY else {"Value": marker}
+                # Packing the board replaces the attribute for each square.
+                if packed and marker != EMPTY:
+                    attributeUpdates[square] = {"Action": "DELETE"}
 
         try:
-            self.gamesTable.update_item(
-                Key=key,
-                AttributeUpdates=attributeUpdates,
-                Expected=conditions
-            )
+            self.gameChanged(self.updateGame(item, attributeUpdates, conditions, gameFinished if finishing else None))
             return True
         except ClientError as e:
+            self.gameCache.invalidate(gameId)
             print("Error updating board and turn: {}".format(e))
             return False
 
+    def makeMove(self, gameId, position, user, requestKey=None, version=None):
+        """
+        Plays user's move on the square at position, given as a square name or index.
+        Moves carrying the same requestKey are only applied once; repeating one returns
+        the original outcome without touching the Games table. A move without one that
+        was already applied only succeeds again when version, the version of the game
+        the move was made on, shows it was this move.
+        Returns (success, item) where item is the latest state of the game.
+        """
+        if requestKey is None:
+            return self.playMove(gameId, position, user, version)
+
+        cacheKey = "%s|%s|%s" % (gameId, user, requestKey)
+        with self.moveLocks[hash(cacheKey) % len(self.moveLocks)]:
+            previous = self.moveResults.get(cacheKey)
+            if previous is not None:
+                return previous["success"], self.getGame(gameId)
+            success, item = self.playMove(gameId, position, user, version)
+            self.bus.publish(MOVE_CHANNEL, (cacheKey, {"success": success}))
+        return success, item
+
+    def playMove(self, gameId, position, user, version=None):
+        item = self.getGame(gameId)
+        if item is None:
+            return False, None
+
+        board = self.getBoardState(item)
+        index = board.indexOf(position)
+        if index is None:
+            return False, item
+
+        # Only the two players can move, or have a repeated move count as applied.
+        if user not in (item["HostId"], item["OpponentId"]):
+            return False, item
+
+        # A repeated move succeeds without another write when it was applied to the
+        # version the client saw: user holds the square, and since then the game has
+        # moved on by this move alone, or by this move and the reply to it.
+        marker = "X" if item["OUser"] == user else "O"
+        if version is not None and board[index] == marker:
+            since = Game(item).version - version
+            if (since == 1 and item["Turn"] != user) or (since == 2 and item["Turn"] == user):
+                return True, item
+
+        success = self.updateBoardAndTurn(item, index, user)
+        item = self.getGame(gameId)
+        if success:
+            item = self.playComputerMove(item)
+        return success, item
+
     def getBoardState(self, item):
-        squares = ["TopLeft", "TopMiddle", "TopRight", "MiddleLeft", "MiddleMiddle", "MiddleRight",
-                   "BottomLeft", "BottomMiddle", "BottomRight"]
-        return [item.get(square, " ") for square in squares]
+        return Board.fromItem(item)
 
     def checkForGameResult(self, board, item, current_player):
         yourMarker = "X" if current_player == item["OUser"] else "O"
-        theirMarker = "O" if yourMarker == "X" else "X"
-
-        winConditions = [[0, 3, 6], [0, 1, 2], [0, 4, 8],
-                         [1, 4, 7], [2, 5, 8], [2, 4, 6],
-                         [3, 4, 5], [6, 7, 8]]
 
-        for winCondition in winConditions:
-            if all(board[i] == yourMarker for i in winCondition):
-                return "Win"
-            if all(board[i] == theirMarker for i in winCondition):
-                return "Lose"
+        winner = board.winner()
+        if winner is not None:
+            return "Win" if winner == yourMarker else "Lose"
 
         if self.checkForTie(board):
             return "Tie"
@@ -161,89 +515,175 @@ class GameController:
         return None
 
     def checkForTie(self, board):
-        return all(cell != " " for cell in board)
+        return board.isFull()
 
     def changeGameToFinishedState(self, item, result, current_user):
+        """
+        Marks a game whose board is already decided as finished. Moves that end a game
+        finish it themselves, so this is only needed for games stored before that.
+        """
         if item.get("Result"):
             return True
 
-        date = str(datetime.now())
-        status = "FINISHED_" + date
-
-        item["StatusDate"] = status
-        item["Turn"] = "N/A"
         if result == "Tie":
-            item["Result"] = result
+            winner = result
         elif result == "Win":
-            item["Result"] = current_user
+            winner = current_user
         else:
-            item["Result"] = item["OpponentId"] if item["HostId"] == current_user else item["HostId"]
+            winner = item["OpponentId"] if item["HostId"] == current_user else item["HostId"]
+
+        attributeUpdates = {
+            "StatusDate": {"Value": self.newStatusDate("FINISHED"), "Action": "PUT"},
+            "Turn": {"Value": "N/A", "Action": "PUT"},
+            "Result": {"Value": winner, "Action": "PUT"}
+        }
+        conditions = {
+            "StatusDate": self.statusCondition("IN_PROGRESS", item)
+        }
 
         try:
-            self.gamesTable.put_item(Item=item)
+            self.gameChanged(self.updateGame(item, attributeUpdates, conditions, gameFinished))
             return True
         except ClientError as e:
+            self.gameCache.invalidate(item["GameId"])
             print("Error changing game to finished state: {}".format(e))
             return False
 
-    def mergeQueries(self, host, opp, limit=10):
-        games = []
+    def mergeQueries(self, streams, limit=10):
+        return mergeStreams(streams, lambda item: statusDateTimestamp(item["StatusDate"]), limit)
+
+    def getGameStreams(self, user, status, pageSize, cursor=None):
+        """
+        Returns a stream over each of the HostId and OpponentId indexes, for each
+        StatusDate format in use, resuming from the positions recorded in cursor.
+        """
+        queries = [(indexName, prefix) for indexName in (HOST_INDEX, OPPONENT_INDEX)
+                   for prefix in self.statusPrefixes(status)]
         try:
-            while len(games) < limit:
-                try:
-                    game_one = next(host)
-                except StopIteration:
-                    for game in opp:
-                        if len(games) == limit:
-                            break
-                        games.append(game)
-                    return games
-
-                try:
-                    game_two = next(opp)
-                except StopIteration:
-                    for game in host:
-                        if len(games) == limit:
-                            break
-                        games.append(game)
-                    return games
-
-                if game_one > game_two:
-                    games.append(game_one)
-                else:
-                    games.append(game_two)
-
-        except StopIteration:
-            pass
-
-        return games
-
-    def getGamesWithStatus(self, user, status):
+            startKeys = decodeCursor(cursor, len(queries),
+                                     [("GameId", INDEX_KEYS[indexName], "StatusDate") for indexName, _ in queries])
+        except (TypeError, ValueError) as e:
+            print("Ignoring invalid cursor: {}".format(e))
+            startKeys = [None] * len(queries)
+
+        streams = []
+        for (indexName, prefix), startKey in zip(queries, startKeys):
+            keyName = INDEX_KEYS[indexName]
+            fetchPage = partial(self.queryIndexPage, indexName, user, prefix, pageSize)
+            keyFor = partial(self.getIndexKey, keyName)
+            streams.append(IndexStream(fetchPage, keyFor, startKey, exhausted=(startKey == 0)))
+        return streams
+
+    def getGamesPage(self, user, status, limit=10, cursor=None):
+        """
+        Returns up to limit games with the given status, newest first, and a cursor
+        for the next page (None when there are no more games).
+        """
         if user is None:
-            return []
+            return [], None
+        streams = self.getGameStreams(user, status, limit, cursor)
+        for stream in streams:
+            stream.prefetch(self.queryPool)
         try:
-            hostGamesInProgress = self.gamesTable.query(
-                IndexName="HostId-StatusDate-index",
-                KeyConditionExpression="HostId = :v_user AND begins_with(StatusDate, :v_status)",
-                ExpressionAttributeValues={
-                    ":v_user": user,
-                    ":v_status": status
-                },
-                Limit=10
-            )
+            games = self.mergeQueries(streams, limit)
+            return games, encodeCursor(streams)
+        except ClientError as e:
+            print("Error getting games with status: {}".format(e))
+            return [], None
 
-            oppGamesInProgress = self.gamesTable.query(
-                IndexName="OpponentId-StatusDate-index",
-                KeyConditionExpression="OpponentId = :v_user AND begins_with(StatusDate, :v_status)",
-                ExpressionAttributeValues={
-                    ":v_user": user,
-                    ":v_status": status
-                },
-                Limit=10
-            )
+    def getGamesWithStatus(self, user, status, limit=10):
+        return self.getGamesPage(user, status, limit)[0]
+
+    def getDashboard(self, user, finishedCursor=None, pageSize=10):
+        """
+        Loads everything the index page shows for a user. The invite query and the
+        first page of the host and opponent queries for both statuses are issued
+        concurrently, so the latency is that of the slowest query rather than the
+        sum of all of them. Returns None if the Games table does not exist.
+        """
+        dashboard = {"invites": [], "inProgress": [], "finished": [], "finishedCursor": None}
+        if user is None:
+            return dashboard
+
+        if self.userSummaries and finishedCursor is None:
+            try:
+                summary = self.getSummaryDashboard(user, pageSize)
+                if summary is not None:
+                    return summary
+            except ClientError as e:
+                if e.response["Error"]["Code"] == "ResourceNotFoundException":
+                    return None
+                print("Error reading user summary: {}".format(e))
+
+        invites = [self.queryPool.submit(self.queryIndex, OPPONENT_INDEX, user, prefix)
+                   for prefix in self.statusPrefixes("PENDING")]
+        inProgress = self.getGameStreams(user, "IN_PROGRESS", pageSize)
+        finished = self.getGameStreams(user, "FINISHED", pageSize, finishedCursor)
+        for stream in inProgress + finished:
+            stream.prefetch(self.queryPool)
 
-            games = self.mergeQueries(iter(hostGamesInProgress['Items']), iter(oppGamesInProgress['Items']))
-            return games
+        try:
+            dashboard["invites"] = sum((future.result() for future in invites), [])
+            dashboard["inProgress"] = self.mergeQueries(inProgress, pageSize)
+            dashboard["finished"] = self.mergeQueries(finished, pageSize)
+            dashboard["finishedCursor"] = encodeCursor(finished)
         except ClientError as e:
-            print("Error getting games with status: {}".format(e))
-            return []
+            if e.response["Error"]["Code"] == "ResourceNotFoundException":
+                return None
+            print("Error getting dashboard: {}".format(e))
+        return dashboard
+
+    def getSummaryDashboard(self, user, pageSize=10):
+        """
+        Loads the first page of the dashboard from the user's summary item with a
+        single GetItem. Returns None if the user has no summary yet.
+        """
+        response = self.gamesTable.get_item(Key={"GameId": summaryKey(user)})
+        summary = response.get("Item")
+        if summary is None:
+            return None
+        invites, inProgress, finished, hasOlder = readSummary(summary, pageSize)
+        dashboard = {
+            "invites": invites,
+            "inProgress": inProgress,
+            "finished": finished,
+            "finishedCursor": self.finishedCursorAfter(user, finished[-1] if finished else None) if hasOlder else None,
+            "record": dict((counter, int(summary.get(counter, 0))) for counter in COUNTERS.values())
+        }
+        if len(summary.get(RECENT, [])) > 2 * RECENT_GAMES:
+            self.trimRecent(user, len(summary[RECENT]))
+        return dashboard
+
+    def finishedCursorAfter(self, user, item):
+        """
+        Builds a cursor for the finished game queries that resumes after item, the
+        last finished game listed from a summary, in every index and StatusDate format.
+        """
+        startKeys = []
+        for indexName in (HOST_INDEX, OPPONENT_INDEX):
+            for prefix in self.statusPrefixes("FINISHED"):
+                if item is None:
+                    startKeys.append(None)
+                    continue
+                statusDate = item["StatusDate"]
+                if not statusDate.startswith(prefix):
+                    statusDateFormat = COMPACT if prefix == statusPrefix("FINISHED", COMPACT) else LEGACY
+                    statusDate = encodeStatusDate("FINISHED", statusDateFormat,
+                                                  statusDateTimestamp(statusDate) / 1000.0)
+                startKeys.append({"GameId": item["GameId"], INDEX_KEYS[indexName]: user, "StatusDate": statusDate})
+        return encodeStartKeys(startKeys)
+
+    def trimRecent(self, user, length):
+        """
+        Drops the finished games past the first RECENT_GAMES from a summary. Games are
+        prepended, so one finished meanwhile only leaves an extra entry at the end.
+        Best effort: a failure only leaves the list longer until the next dashboard load.
+        """
+        try:
+            self.gamesTable.update_item(
+                Key={"GameId": summaryKey(user)},
+                UpdateExpression="REMOVE " + ", ".join("#r[%d]" % index for index in range(RECENT_GAMES, length)),
+                ExpressionAttributeNames={"#r": RECENT}
+            )
+        except ClientError as e:
+            print("Error trimming user summary: {}".format(e))
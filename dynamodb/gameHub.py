@@ -0,0 +1,76 @@
+import threading
+
+
+class Subscription(object):
+    """
+    A single listener on a game. Only the most recent game state is kept, since
+    a board only ever needs to be redrawn from its latest state. When a callback
+    is given it is called with each game state instead, on the publishing thread.
+    """
+    def __init__(self, gameId, callback=None):
+        self.gameId = gameId
+        self.callback = callback
+        self.condition = threading.Condition()
+        self.latest = None
+        self.pending = False
+
+    def push(self, data):
+        if self.callback is not None:
+            self.callback(data)
+            return
+        with self.condition:
+            self.latest = data
+            self.pending = True
+            self.condition.notify_all()
+
+    def wait(self, timeout):
+        """
+        Blocks until a new game state is published or the timeout expires.
+        Returns the game state, or None on timeout.
+        """
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+            if not self.pending:
+                return None
+            self.pending = False
+            return self.latest
+
+
+class GameHub(object):
+    """
+    In-process publish/subscribe hub keyed by GameId. The GameController
+    publishes every accepted change to a game, and open boards subscribe to it
+    instead of polling the Games table.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def subscribe(self, gameId, callback=None):
+        subscription = Subscription(gameId, callback)
+        with self.lock:
+            self.subscribers.setdefault(gameId, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.gameId)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[subscription.gameId]
+
+    def publish(self, gameId, data):
+        with self.lock:
+            subscribers = list(self.subscribers.get(gameId, ()))
+        for subscription in subscribers:
+            subscription.push(data)
+        return len(subscribers)
+
+    def subscriberCount(self, gameId=None):
+        with self.lock:
+            if gameId is not None:
+                return len(self.subscribers.get(gameId, ()))
+            return sum(len(subscribers) for subscribers in self.subscribers.values())
@@ -0,0 +1,140 @@
+import base64
+import binascii
+import heapq
+import json
+from itertools import islice
+
+
+class IndexStream(object):
+    """
+    Lazily pages through the results of one index query, newest first.
+    fetchPage(startKey) must return the items of one page and the LastEvaluatedKey.
+    keyFor(item) returns the ExclusiveStartKey that resumes the query after item.
+    """
+    def __init__(self, fetchPage, keyFor, startKey=None, exhausted=False):
+        self.fetchPage = fetchPage
+        self.keyFor = keyFor
+        self.items = []
+        self.position = 0
+        self.nextPageKey = None if exhausted else startKey
+        self.fetched = exhausted
+        self.future = None
+        # Where to resume the query so that the next item after the last one consumed comes first.
+        self.resumeKey = startKey
+
+    def prefetch(self, pool):
+        """
+        Starts fetching the first page in the background.
+        """
+        if self.future is None and not self.fetched:
+            self.future = pool.submit(self.fetchPage, self.nextPageKey)
+
+    def hasMorePages(self):
+        return not self.fetched or self.nextPageKey is not None
+
+    def peek(self):
+        while self.position >= len(self.items):
+            if not self.hasMorePages():
+                return None
+            if self.future is not None:
+                items, lastKey = self.future.result()
+                self.future = None
+            else:
+                items, lastKey = self.fetchPage(self.nextPageKey)
+            self.items = items
+            self.position = 0
+            self.nextPageKey = lastKey
+            self.fetched = True
+        return self.items[self.position]
+
+    def pop(self):
+        item = self.peek()
+        self.position += 1
+        self.resumeKey = self.keyFor(item)
+        return item
+
+    def isExhausted(self):
+        return self.fetched and self.position >= len(self.items) and self.nextPageKey is None
+
+
+class _Newest(object):
+    """
+    Heap key that orders larger (more recent) sort keys first.
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+
+def iterMerged(streams, sortKey):
+    """
+    Heap-backed k-way merge of streams that are each sorted newest first.
+    Pages are only fetched when the merge reaches them.
+    """
+    heap = []
+    for index, stream in enumerate(streams):
+        item = stream.peek()
+        if item is not None:
+            heap.append((_Newest(sortKey(item)), index))
+    heapq.heapify(heap)
+
+    while heap:
+        _, index = heapq.heappop(heap)
+        stream = streams[index]
+        yield stream.pop()
+        item = stream.peek()
+        if item is not None:
+            heapq.heappush(heap, (_Newest(sortKey(item)), index))
+
+
+def mergeStreams(streams, sortKey, limit):
+    return list(islice(iterMerged(streams, sortKey), limit))
+
+
+def encodeCursor(streams):
+    """
+    Builds an opaque continuation cursor from the position of each stream,
+    or returns None when every stream has been read to the end.
+    """
+    if all(stream.isExhausted() for stream in streams):
+        return None
+    return encodeStartKeys([0 if stream.isExhausted() else stream.resumeKey for stream in streams])
+
+
+def encodeStartKeys(startKeys):
+    """
+    Builds a cursor from the start key of each stream, as returned by decodeCursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(startKeys).encode('utf-8')).decode('ascii')
+
+
+def isStartKey(entry, keyNames):
+    return (isinstance(entry, dict) and sorted(entry) == sorted(keyNames) and
+            all(isinstance(value, (type(u""), str)) for value in entry.values()))
+
+
+def decodeCursor(cursor, count, keyNames=None):
+    """
+    Returns the start key for each of count streams; 0 marks a finished stream
+    and None one that starts from the beginning. keyNames lists the attributes of
+    each stream's start keys. Raises ValueError for a cursor that cannot be
+    decoded or does not match the streams.
+    """
+    if not cursor:
+        return [None] * count
+    try:
+        state = json.loads(base64.urlsafe_b64decode(str(cursor)).decode('utf-8'))
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Cursor cannot be decoded: {}".format(e))
+    if not isinstance(state, list) or len(state) != count:
+        raise ValueError("Cursor does not match the query")
+    for index, entry in enumerate(state):
+        if entry is None or (type(entry) is int and entry == 0):
+            continue
+        if not isinstance(entry, dict) or (keyNames is not None and not isStartKey(entry, keyNames[index])):
+            raise ValueError("Cursor does not match the query")
+    return state
@@ -0,0 +1,235 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TABLE_OPERATIONS = ("get_item", "put_item", "update_item", "delete_item", "query", "scan",
+                    "batch_write_item", "transact_write_items")
+
+_local = threading.local()
+
+
+class CallRecorder(object):
+    """
+    Collects the DynamoDB calls made while handling one request.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def record(self, operation, seconds, capacity):
+        with self.lock:
+            self.calls.append((operation, seconds, capacity))
+
+    def summary(self):
+        """
+        Returns {operation: (count, seconds, capacity units)}.
+        """
+        summary = {}
+        with self.lock:
+            for operation, seconds, capacity in self.calls:
+                count, totalSeconds, totalCapacity = summary.get(operation, (0, 0.0, 0.0))
+                summary[operation] = (count + 1, totalSeconds + seconds, totalCapacity + capacity)
+        return summary
+
+
+def startRequest():
+    _local.recorder = CallRecorder()
+    return _local.recorder
+
+
+def endRequest():
+    recorder = getattr(_local, "recorder", None)
+    _local.recorder = None
+    return recorder
+
+
+def currentRecorder():
+    return getattr(_local, "recorder", None)
+
+
+def bindRecorder(fn):
+    """
+    Wraps fn so that calls it makes on another thread are recorded against the
+    request that is current on the calling thread.
+    """
+    recorder = currentRecorder()
+    if recorder is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        previous = currentRecorder()
+        _local.recorder = recorder
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.recorder = previous
+    return bound
+
+
+class RecordingThreadPool(ThreadPoolExecutor):
+    """
+    Thread pool whose tasks record their DynamoDB calls against the submitting request.
+    """
+    def submit(self, fn, *args, **kwargs):
+        return super(RecordingThreadPool, self).submit(bindRecorder(fn), *args, **kwargs)
+
+
+class InstrumentedTable(object):
+    """
+    Wraps a boto3 Table, or client, timing every data operation and recording its
+    consumed capacity against the current request.
+    """
+    def __init__(self, table):
+        self.table = table
+
+    def __getattr__(self, name):
+        attribute = getattr(self.table, name)
+        if name not in TABLE_OPERATIONS:
+            return attribute
+
+        def call(*args, **kwargs):
+            recorder = currentRecorder()
+            if recorder is None:
+                return attribute(*args, **kwargs)
+            kwargs.setdefault("ReturnConsumedCapacity", "TOTAL")
+            start = time.time()
+            try:
+                response = attribute(*args, **kwargs)
+            except Exception:
+                recorder.record(name, time.time() - start, 0.0)
+                raise
+            recorder.record(name, time.time() - start, consumedCapacity(response))
+            return response
+        return call
+
+
+def consumedCapacity(response):
+    """
+    Capacity units in a response, which lists them per table for multi-table operations.
+    """
+    consumed = response.get("ConsumedCapacity", {})
+    if isinstance(consumed, list):
+        return sum(float(table.get("CapacityUnits", 0.0)) for table in consumed)
+    return float(consumed.get("CapacityUnits", 0.0))
+
+
+def serverTiming(recorder, seconds):
+    """
+    Formats a Server-Timing header value for a request.
+    """
+    summary = recorder.summary() if recorder is not None else {}
+    count = sum(calls for calls, _, _ in summary.values())
+    dynamoSeconds = sum(spent for _, spent, _ in summary.values())
+    capacity = sum(units for _, _, units in summary.values())
+    metrics = ['app;dur=%.3f' % (seconds * 1000),
+               'dynamodb;dur=%.3f;desc="%d calls, %.1f capacity units"' % (dynamoSeconds * 1000, count, capacity)]
+    for operation, (calls, spent, _) in sorted(summary.items()):
+        metrics.append('dynamodb-%s;dur=%.3f;desc="%d calls"' % (operation.replace("_", "-"), spent * 1000, calls))
+    return ", ".join(metrics)
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21)
+
+
+def _labels(labels):
+    escaped = ('%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+               for name, value in labels)
+    return "{%s}" % ",".join(escaped)
+
+
+class Histogram(object):
+    def __init__(self, name, help, labelNames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelNames = labelNames
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labelValues, value):
+        series = self.series.get(labelValues)
+        if series is None:
+            series = self.series[labelValues] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s histogram" % self.name]
+        for labelValues, (counts, total, count) in sorted(self.series.items()):
+            labels = list(zip(self.labelNames, labelValues))
+            for bound, bucketCount in zip(self.buckets, counts):
+                lines.append("%s_bucket%s %d" % (self.name, _labels(labels + [("le", repr(float(bound)))]), bucketCount))
+            lines.append("%s_bucket%s %d" % (self.name, _labels(labels + [("le", "+Inf")]), count))
+            lines.append("%s_sum%s %s" % (self.name, _labels(labels), total))
+            lines.append("%s_count%s %d" % (self.name, _labels(labels), count))
+        return lines
+
+
+class Counter(object):
+    def __init__(self, name, help, labelNames):
+        self.name = name
+        self.help = help
+        self.labelNames = labelNames
+        self.series = {}
+
+    def inc(self, labelValues, amount=1):
+        self.series[labelValues] = self.series.get(labelValues, 0) + amount
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s counter" % self.name]
+        for labelValues, value in sorted(self.series.items()):
+            lines.append("%s%s %s" % (self.name, _labels(list(zip(self.labelNames, labelValues))), value))
+        return lines
+
+
+class Metrics(object):
+    """
+    Aggregates per-route and per-operation request and DynamoDB metrics, and
+    renders them in the Prometheus text exposition format.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requestSeconds = Histogram("tictactoe_request_duration_seconds",
+                                        "Time spent handling requests.", ("route",))
+        self.dynamoCalls = Histogram("tictactoe_dynamodb_calls_per_request",
+                                     "DynamoDB calls made per request.", ("route",), COUNT_BUCKETS)
+        self.dynamoSeconds = Histogram("tictactoe_dynamodb_call_duration_seconds",
+                                       "Latency of DynamoDB calls.", ("route", "operation"))
+        self.dynamoCapacity = Counter("tictactoe_dynamodb_consumed_capacity_units_total",
+                                      "DynamoDB capacity units consumed.", ("route", "operation"))
+        self.collectors = []
+
+    def addCollector(self, collect):
+        """
+        Registers a function returning extra exposition lines, rendered on every scrape.
+        """
+        self.collectors.append(collect)
+
+    def observeRequest(self, route, seconds, recorder):
+        calls = list(recorder.calls) if recorder is not None else []
+        with self.lock:
+            self.requestSeconds.observe((route,), seconds)
+            self.dynamoCalls.observe((route,), len(calls))
+            for operation, spent, capacity in calls:
+                self.dynamoSeconds.observe((route, operation), spent)
+                self.dynamoCapacity.inc((route, operation), capacity)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in (self.requestSeconds, self.dynamoCalls, self.dynamoSeconds, self.dynamoCapacity):
+                lines.extend(metric.render())
+        for collect in self.collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def singleMetric(name, kind, help, value):
+    """
+    Renders a metric that has no labels.
+    """
+    return ["# HELP %s %s" % (name, help), "# TYPE %s %s" % (name, kind), "%s %s" % (name, value)]
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from botocore.exceptions import ClientError
+from models.game import parseStatus, statusDateTimestamp
+
+INITIAL_RATING = 1200.0
+# How far a single game can move a rating.
+ELO_K = 32.0
+SCORES = {"Win": 1.0, "Tie": 0.5, "Lose": 0.0}
+
+
+def expectedScore(rating, opponentRating):
+    return 1.0 / (1.0 + 10 ** ((opponentRating - rating) / 400.0))
+
+
+class PlayerStats(object):
+    __slots__ = ('rating', 'wins', 'losses', 'ties')
+
+    def __init__(self, rating=INITIAL_RATING, wins=0, losses=0, ties=0):
+        self.rating = rating
+        self.wins = wins
+        self.losses = losses
+        self.ties = ties
+
+    def toList(self):
+        return [self.rating, self.wins, self.losses, self.ties]
+
+
+def isFinishedGame(item):
+    statusDate = item.get("StatusDate")
+    return bool(statusDate and item.get("Result") and parseStatus(statusDate) == "FINISHED")
+
+
+class Leaderboard(object):
+    """
+    Win, loss and tie counts and an Elo rating for every player, updated as games
+    finish. Players are kept in a list sorted by rating, so the rank of a player is
+    a binary search and the top of the table a slice; requests never read the
+    Games table. The state is saved to snapshotPath every snapshotSeconds when it
+    has changed, and loaded from there on start up.
+    """
+    def __init__(self, snapshotPath=None, snapshotSeconds=60, k=ELO_K):
+        self.snapshotPath = snapshotPath
+        self.snapshotSeconds = snapshotSeconds
+        self.k = k
+        self.lock = threading.Lock()
+        self.players = {}
+        # (-rating, user) for every player, highest rating first.
+        self.ranking = []
+        self.games = 0
+        self.dirty = False
+        # Games recorded while a rebuild is scanning the table, replayed once it is done.
+        self.pending = None
+
+    def _player(self, user):
+        player = self.players.get(user)
+        if player is None:
+            player = self.players[user] = PlayerStats()
+            insort(self.ranking, (-player.rating, user))
+        return player
+
+    def _setRating(self, user, player, rating):
+        del self.ranking[bisect_left(self.ranking, (-player.rating, user))]
+        player.rating = rating
+        insort(self.ranking, (-rating, user))
+
+    def _record(self, item):
+        host, opponent = item["HostId"], item["OpponentId"]
+        if host == opponent:
+            return
+        hostStats, opponentStats = self._player(host), self._player(opponent)
+        if item["Result"] == "Tie":
+            outcome = "Tie"
+        else:
+            outcome = "Win" if item["Result"] == host else "Lose"
+        if outcome == "Win":
+            hostStats.wins += 1
+            opponentStats.losses += 1
+        elif outcome == "Lose":
+            hostStats.losses += 1
+            opponentStats.wins += 1
+        else:
+            hostStats.ties += 1
+            opponentStats.ties += 1
+        change = self.k * (SCORES[outcome] - expectedScore(hostStats.rating, opponentStats.rating))
+        self._setRating(host, hostStats, hostStats.rating + change)
+        self._setRating(opponent, opponentStats, opponentStats.rating - change)
+        self.games += 1
+        self.dirty = True
+
+    def recordGame(self, item):
+        """
+        Counts a game that has just finished. Games that are not finished are ignored.
+        """
+        if not isFinishedGame(item):
+            return
+        with self.lock:
+            self._record(item)
+            if self.pending is not None:
+                self.pending.append(item)
+
+    def rank(self, user):
+        """
+        Returns the 1-based rank of user, shared by players with the same rating,
+        or None for a player without finished games.
+        """
+        with self.lock:
+            player = self.players.get(user)
+            if player is None:
+                return None
+            return bisect_left(self.ranking, (-player.rating, u"")) + 1
+
+    def rating(self, user):
+        with self.lock:
+            player = self.players.get(user)
+            return player.rating if player is not None else INITIAL_RATING
+
+    def stats(self, user):
+        with self.lock:
+            player = self.players.get(user)
+            if player is None:
+                return None
+            return self._entry(user, player, bisect_left(self.ranking, (-player.rating, u"")) + 1)
+
+    def top(self, count=10):
+        with self.lock:
+            entries = []
+            previous = None
+            for position, (negativeRating, user) in enumerate(self.ranking[:count]):
+                # Players with the same rating share the rank of the first of them.
+                if negativeRating != previous:
+                    rank = position + 1
+                    previous = negativeRating
+                entries.append(self._entry(user, self.players[user], rank))
+            return entries
+
+    def _entry(self, user, player, rank):
+        return {"user": user, "rank": rank, "rating": round(player.rating, 1),
+                "wins": player.wins, "losses": player.losses, "ties": player.ties}
+
+    def playerCount(self):
+        return len(self.players)
+
+    def load(self):
+        """
+        Loads the snapshot, if there is one. Returns whether it was loaded.
+        """
+        if self.snapshotPath is None or not os.path.exists(self.snapshotPath):
+            return False
+        with open(self.snapshotPath) as f:
+            state = json.load(f)
+        with self.lock:
+            self.players = dict((user, PlayerStats(*values)) for user, values in state["players"].items())
+            self.ranking = sorted((-player.rating, user) for user, player in self.players.items())
+            self.games = state["games"]
+            self.dirty = False
+        return True
+
+    def save(self):
+        if self.snapshotPath is None:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            state = {"players": dict((user, player.toList()) for user, player in self.players.items()),
+                     "games": self.games, "saved": time.time()}
+            self.dirty = False
+        # Every worker process saves its own copy of the same state, so each writes its own temporary file.
+        temporary = "%s.%d.tmp" % (self.snapshotPath, os.getpid())
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+        os.rename(temporary, self.snapshotPath)
+
+    def rebuildFrom(self, table, pageSize=100, limiter=None):
+        """
+        Replaces the leaderboard with one computed from every finished game in the
+        Games table, replaying them in the order they finished. With a limiter,
+        each page of the scan waits for a token, so the rebuild does not use up
+        the table's read capacity.
+        """
+        with self.lock:
+            self.pending = []
+        try:
+            finished = []
+            kwargs = {"Limit": pageSize}
+            while True:
+                if limiter is not None:
+                    limiter.acquire(1)
+                response = table.scan(**kwargs)
+                finished.extend(item for item in response["Items"] if isFinishedGame(item))
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except ClientError as e:
+            print("Error rebuilding leaderboard: {}".format(e))
+            with self.lock:
+                self.pending = None
+            return False
+
+        finished.sort(key=lambda item: statusDateTimestamp(item["StatusDate"]))
+        with self.lock:
+            scanned = set(item["GameId"] for item in finished)
+            pending = [item for item in self.pending if item["GameId"] not in scanned]
+            self.pending = None
+            self.players = {}
+            self.ranking = []
+            self.games = 0
+            for item in finished + pending:
+                self._record(item)
+        return True
+
+    def start(self):
+        """
+        Saves the snapshot periodically from a background thread.
+        """
+        if self.snapshotPath is None:
+            return
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.snapshotSeconds)
+            try:
+                self.save()
+            except (IOError, OSError) as e:
+                print("Error saving leaderboard snapshot: {}".format(e))
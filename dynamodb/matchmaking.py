@@ -0,0 +1,237 @@
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+from uuid import uuid4
+from gameCache import TTLCache
+
+# State bus channel announcing each pair of players matched by any worker.
+MATCH_CHANNEL = "match"
+
+
+class FifoQueue(object):
+    """
+    Pairs each player with whoever has been waiting longest.
+    """
+    def __init__(self):
+        self.waiting = OrderedDict()
+
+    def add(self, user, rating, now):
+        """
+        Returns the player user is paired with and the time they started waiting,
+        or (None, None) after queueing user.
+        """
+        self.waiting.pop(user, None)
+        for opponent, since in self.waiting.items():
+            del self.waiting[opponent]
+            return opponent, since
+        self.waiting[user] = now
+        return None, None
+
+    def restore(self, user, rating, since):
+        """
+        Puts a player who was paired back at the head of the queue, as they were.
+        """
+        self.waiting.pop(user, None)
+        self.waiting = OrderedDict([(user, since)] + list(self.waiting.items()))
+
+    def remove(self, user):
+        self.waiting.pop(user, None)
+
+    def expire(self, before):
+        while self.waiting:
+            user, since = next(iter(self.waiting.items()))
+            if since >= before:
+                break
+            del self.waiting[user]
+
+    def __len__(self):
+        return len(self.waiting)
+
+
+class SkillQueue(object):
+    """
+    Pairs players with similar ratings. Players wait in buckets bucketWidth rating
+    points wide and are paired within their bucket first; after waiting
+    widenSeconds they also accept the next bucket either side, and so on up to
+    maxSpread buckets away. Only the longest waiting player of a bucket is looked
+    at, so pairing takes a constant number of steps.
+    """
+    def __init__(self, bucketWidth=100, widenSeconds=5, maxSpread=3):
+        self.bucketWidth = bucketWidth
+        self.widenSeconds = widenSeconds
+        self.maxSpread = maxSpread
+        self.buckets = {}
+        self.bucketOf = {}
+
+    def add(self, user, rating, now):
+        self.remove(user)
+        bucket = int(rating // self.bucketWidth)
+        for spread in range(self.maxSpread + 1):
+            for candidate in sorted(set((bucket - spread, bucket + spread))):
+                waiting = self.buckets.get(candidate)
+                if not waiting:
+                    continue
+                opponent, since = next(iter(waiting.items()))
+                if now - since >= spread * self.widenSeconds:
+                    self.remove(opponent)
+                    return opponent, since
+        self.buckets.setdefault(bucket, OrderedDict())[user] = now
+        self.bucketOf[user] = bucket
+        return None, None
+
+    def restore(self, user, rating, since):
+        self.remove(user)
+        bucket = int(rating // self.bucketWidth)
+        self.buckets[bucket] = OrderedDict([(user, since)] + list(self.buckets.get(bucket, {}).items()))
+        self.bucketOf[user] = bucket
+
+    def remove(self, user):
+        bucket = self.bucketOf.pop(user, None)
+        if bucket is not None:
+            waiting = self.buckets[bucket]
+            del waiting[user]
+            if not waiting:
+                del self.buckets[bucket]
+
+    def expire(self, before):
+        for bucket, waiting in list(self.buckets.items()):
+            while waiting:
+                user, since = next(iter(waiting.items()))
+                if since >= before:
+                    break
+                self.remove(user)
+
+    def __len__(self):
+        return len(self.bucketOf)
+
+
+def newQueue(kind, options):
+    """
+    Returns a SkillQueue built with options for kind "skill", otherwise a FifoQueue.
+    """
+    return SkillQueue(**options) if kind == "skill" else FifoQueue()
+
+
+class SharedQueue(object):
+    """
+    Holds a FifoQueue or SkillQueue behind a lock of its own, so that several
+    threads, or several worker processes through a MatchQueueManager, can pair
+    players from the one queue.
+    """
+    def __init__(self, queue):
+        self.queue = queue
+        self.lock = threading.Lock()
+
+    def add(self, user, rating, now, before):
+        """
+        Drops the players who started waiting before before, then adds user as
+        the queue's add does.
+        """
+        with self.lock:
+            self.queue.expire(before)
+            return self.queue.add(user, rating, now)
+
+    def restore(self, user, rating, since):
+        with self.lock:
+            self.queue.restore(user, rating, since)
+
+    def remove(self, user):
+        with self.lock:
+            self.queue.remove(user)
+
+    def count(self):
+        with self.lock:
+            return len(self.queue)
+
+
+_served = []
+_servedLock = threading.Lock()
+
+
+def servedQueue(kind, options):
+    """
+    Returns the SharedQueue served to every worker, created for the first one to ask.
+    """
+    with _servedLock:
+        if not _served:
+            _served.append(SharedQueue(newQueue(kind, options)))
+        return _served[0]
+
+
+class MatchQueueManager(BaseManager):
+    """
+    Serves one SharedQueue from the process that starts the workers, so that
+    players are paired, and can leave the queue, whichever worker serves them.
+    """
+
+MatchQueueManager.register("servedQueue", servedQueue)
+
+
+def connectSharedQueue(address, authkey, kind, options):
+    """
+    Returns a proxy for the SharedQueue served at address, which is created with
+    kind and options if this is the first worker to connect.
+    """
+    manager = MatchQueueManager(address, authkey=authkey)
+    manager.connect()
+    return manager.servedQueue(kind, options)
+
+
+class Matchmaker(object):
+    """
+    Pairs players who ask for a quick game and starts their game straight away,
+    already in progress, without an invitation to accept. Waiting players are held
+    in queue, a SharedQueue or a proxy for one, for up to waitSeconds.
+
+    With several workers, the queue is served to all of them by a
+    MatchQueueManager. Matches are announced on the controller's state bus, so a
+    waiting player learns of their game from any worker.
+    """
+    def __init__(self, controller, queue=None, ratingFor=None, waitSeconds=60):
+        self.controller = controller
+        self.queue = queue if queue is not None else SharedQueue(FifoQueue())
+        self.ratingFor = ratingFor if ratingFor is not None else (lambda user: 0)
+        self.waitSeconds = waitSeconds
+        self.matches = TTLCache(maxSize=65536, ttl=waitSeconds)
+        self.controller.bus.subscribe(MATCH_CHANNEL, self.applyMatch)
+
+    def join(self, user):
+        """
+        Queues user for a game. Returns the GameId of their new game if another
+        player was waiting, otherwise None. Returns False if the game could not be
+        created; the waiting player keeps their place and user is not queued.
+        """
+        rating = self.ratingFor(user)
+        self.matches.invalidate(user)
+        now = time.time()
+        opponent, since = self.queue.add(user, rating, now, now - self.waitSeconds)
+        if opponent is None:
+            return None
+
+        # The player who waited hosts the game, and the one who just arrived moves first.
+        gameId = str(uuid4())
+        if not self.controller.createStartedGame(gameId, opponent, user):
+            # Unless they have been matched again in the meantime.
+            if self.matches.get(opponent) is None:
+                self.queue.restore(opponent, self.ratingFor(opponent), since)
+            return False
+        self.controller.bus.publish(MATCH_CHANNEL, (gameId, opponent, user))
+        return gameId
+
+    def leave(self, user):
+        self.queue.remove(user)
+
+    def status(self, user):
+        """
+        Returns the GameId of the game user was matched into, or None while they wait.
+        """
+        match = self.matches.get(user)
+        return match["GameId"] if match is not None else None
+
+    def applyMatch(self, message):
+        gameId, host, opponent = message
+        self.matches.put(host, {"GameId": gameId})
+
+    def waitingCount(self):
+        return self.queue.count()
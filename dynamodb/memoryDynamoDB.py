@@ -0,0 +1,683 @@
+import copy
+import re
+import threading
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+
+class ResourceNotFoundException(ClientError):
+    pass
+
+
+def _clientError(code, message, operationName, errorClass=ClientError):
+    return errorClass({"Error": {"Code": code, "Message": message}}, operationName)
+
+
+def _copyItem(item):
+    return dict((name, copy.deepcopy(value) if isinstance(value, (dict, list, set)) else value)
+                for name, value in item.items())
+
+
+def _itemSize(item):
+    return sum(len(name) + len(str(value)) for name, value in item.items())
+
+
+def _capacityUnits(size, unitSize, consistent=True):
+    """
+    Estimates the capacity units DynamoDB would charge for reading or writing size bytes.
+    """
+    units = max((size + unitSize - 1) // unitSize, 1)
+    return float(units) if consistent else units / 2.0
+
+
+def _prefixEnd(prefix):
+    """
+    Returns the smallest string that sorts after every string starting with prefix.
+    """
+    return prefix[:-1] + type(prefix)(chr(ord(prefix[-1]) + 1))
+
+
+_KEY_CONDITION = re.compile(r"^\s*(\w+)\s*=\s*(:\w+)\s*"
+                            r"(?:AND\s+begins_with\(\s*(\w+)\s*,\s*(:\w+)\s*\)\s*)?$", re.IGNORECASE)
+
+
+_TOKEN = re.compile(r"\s*(?:(<>|<=|>=|[=<>(),.\[\]+-])|(#\w+|:\w+|\w+))")
+
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise ValueError("Invalid expression: %s" % expression)
+        tokens.append(match.group(1) or match.group(2))
+        position = match.end()
+    return tokens
+
+
+class _Expression(object):
+    """
+    Evaluates the subset of DynamoDB condition, update and projection expressions
+    that the application writes: document paths, comparisons, AND/OR/NOT,
+    attribute_exists, attribute_not_exists, begins_with, if_not_exists and
+    list_append, and SET, REMOVE and ADD clauses.
+    """
+    def __init__(self, expression, names, values):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self, expected=None):
+        token = self.peek()
+        if token is None or (expected is not None and token.upper() != expected):
+            raise ValueError("Expected %s at %r" % (expected or "more input", token))
+        self.position += 1
+        return token
+
+    def done(self):
+        return self.position >= len(self.tokens)
+
+    # Document paths are lists of attribute names and list indexes.
+    def path(self):
+        path = [self.name(self.next())]
+        while self.peek() in (".", "["):
+            if self.next() == ".":
+                path.append(self.name(self.next()))
+            else:
+                path.append(int(self.next()))
+                self.next("]")
+        return path
+
+    def name(self, token):
+        return self.names[token] if token.startswith("#") else token
+
+    def resolve(self, item, path):
+        value = item
+        for part in path:
+            try:
+                value = value[part]
+            except (KeyError, IndexError, TypeError):
+                return None, False
+        return value, True
+
+    def operand(self, item):
+        token = self.peek()
+        if token.startswith(":"):
+            self.next()
+            return self.values[token], True
+        lowered = token.lower()
+        if lowered == "if_not_exists":
+            self.next()
+            self.next("(")
+            value, present = self.resolve(item, self.path())
+            self.next(",")
+            default, _ = self.operand(item)
+            self.next(")")
+            return (value if present else default), True
+        if lowered == "list_append":
+            self.next()
+            self.next("(")
+            first, _ = self.operand(item)
+            self.next(",")
+            second, _ = self.operand(item)
+            self.next(")")
+            return list(first or []) + list(second or []), True
+        return self.resolve(item, self.path())
+
+    # Conditions
+    def condition(self, item):
+        result = self.conjunction(item)
+        while self.peek() is not None and self.peek().upper() == "OR":
+            self.next()
+            result = self.conjunction(item) or result
+        return result
+
+    def conjunction(self, item):
+        result = self.negation(item)
+        while self.peek() is not None and self.peek().upper() == "AND":
+            self.next()
+            result = self.negation(item) and result
+        return result
+
+    def negation(self, item):
+        if self.peek() is not None and self.peek().upper() == "NOT":
+            self.next()
+            return not self.negation(item)
+        return self.predicate(item)
+
+    def predicate(self, item):
+        token = self.peek()
+        if token == "(":
+            self.next()
+            result = self.condition(item)
+            self.next(")")
+            return result
+        lowered = token.lower()
+        if lowered in ("attribute_exists", "attribute_not_exists"):
+            self.next()
+            self.next("(")
+            _, present = self.resolve(item, self.path())
+            self.next(")")
+            return present if lowered == "attribute_exists" else not present
+        if lowered == "begins_with":
+            self.next()
+            self.next("(")
+            value, present = self.operand(item)
+            self.next(",")
+            prefix, _ = self.operand(item)
+            self.next(")")
+            return present and hasattr(value, "startswith") and value.startswith(prefix)
+        left, leftPresent = self.operand(item)
+        operator = self.next()
+        right, rightPresent = self.operand(item)
+        if not (leftPresent and rightPresent):
+            return operator == "<>"
+        return {"=": left == right, "<>": left != right, "<": left < right, "<=": left <= right,
+                ">": left > right, ">=": left >= right}[operator]
+
+    # Updates
+    def update(self, item):
+        removed = []
+        while not self.done():
+            clause = self.next().upper()
+            while True:
+                if clause == "SET":
+                    path = self.path()
+                    self.next("=")
+                    value, _ = self.operand(item)
+                    if self.peek() in ("+", "-"):
+                        sign = 1 if self.next() == "+" else -1
+                        other, _ = self.operand(item)
+                        value = value + sign * other
+                    self.assign(item, path, copy.deepcopy(value))
+                elif clause == "REMOVE":
+                    removed.append(self.path())
+                elif clause == "ADD":
+                    path = self.path()
+                    value, _ = self.operand(item)
+                    current, present = self.resolve(item, path)
+                    if isinstance(value, set):
+                        self.assign(item, path, (current if present else set()) | value)
+                    else:
+                        self.assign(item, path, (current if present else 0) + value)
+                else:
+                    raise ValueError("Unsupported update clause: %s" % clause)
+                if self.peek() != ",":
+                    break
+                self.next()
+        # List elements are removed by their index before the update, so the highest go first.
+        for path in sorted(removed, reverse=True):
+            self.delete(item, path)
+        return item
+
+    def assign(self, item, path, value):
+        container, _ = self.resolve(item, path[:-1])
+        if container is None:
+            raise ValueError("The document path provided in the update expression is invalid for update")
+        if isinstance(path[-1], int) and path[-1] >= len(container):
+            container.append(value)
+        else:
+            container[path[-1]] = value
+
+    def delete(self, item, path):
+        container, present = self.resolve(item, path[:-1])
+        if present:
+            try:
+                del container[path[-1]]
+            except (KeyError, IndexError):
+                pass
+
+    # Projections
+    def project(self, item):
+        projected = {}
+        while not self.done():
+            path = self.path()
+            value, present = self.resolve(item, path)
+            if present and len(path) == 1:
+                projected[path[0]] = value
+            elif present:
+                # Nested paths are returned as the top level attribute holding them.
+                projected[path[0]] = item[path[0]]
+            if not self.done():
+                self.next(",")
+        return projected
+
+
+def _evaluateCondition(item, expression, names, values):
+    if not expression:
+        return True
+    return _Expression(expression, names, values).condition(item or {})
+
+
+def _applyUpdate(item, expression, names, values):
+    return _Expression(expression, names, values).update(item)
+
+
+class _Index(object):
+    """
+    A hash/range index kept as a sorted list of (range value, primary key) per hash value.
+    projection is the index's Projection: None or ALL for every attribute, or the
+    keys and any NonKeyAttributes for KEYS_ONLY and INCLUDE.
+    """
+    def __init__(self, hashKey, rangeKey, projection=None):
+        self.hashKey = hashKey
+        self.rangeKey = rangeKey
+        self.partitions = {}
+        self.projected = None
+        if projection is not None and projection.get("ProjectionType", "ALL") != "ALL":
+            self.projected = set([hashKey, rangeKey] + list(projection.get("NonKeyAttributes", [])))
+
+    def project(self, item, primaryKey):
+        """
+        Returns the copy of item stored in the index.
+        """
+        if self.projected is None:
+            return _copyItem(item)
+        return _copyItem(dict((name, value) for name, value in item.items()
+                              if name in self.projected or name == primaryKey))
+
+    def entryFor(self, item, primaryKey):
+        if self.hashKey not in item or (self.rangeKey is not None and self.rangeKey not in item):
+            return None
+        rangeValue = item[self.rangeKey] if self.rangeKey is not None else None
+        return item[self.hashKey], (rangeValue, item[primaryKey])
+
+    def add(self, item, primaryKey):
+        entry = self.entryFor(item, primaryKey)
+        if entry is not None:
+            insort(self.partitions.setdefault(entry[0], []), entry[1])
+
+    def remove(self, item, primaryKey):
+        entry = self.entryFor(item, primaryKey)
+        if entry is None:
+            return
+        partition = self.partitions.get(entry[0], [])
+        position = bisect_left(partition, entry[1])
+        if position < len(partition) and partition[position] == entry[1]:
+            del partition[position]
+            if not partition:
+                del self.partitions[entry[0]]
+
+
+class _TableData(object):
+    def __init__(self, name, keySchema, globalIndexes):
+        self.name = name
+        self.primaryKey = [key["AttributeName"] for key in keySchema if key["KeyType"] == "HASH"][0]
+        self.items = {}
+        self.indexes = {None: _Index(self.primaryKey, None)}
+        for index in globalIndexes:
+            schema = dict((key["KeyType"], key["AttributeName"]) for key in index["KeySchema"])
+            self.indexes[index["IndexName"]] = _Index(schema["HASH"], schema.get("RANGE"), index.get("Projection"))
+        self.lock = threading.RLock()
+
+    def store(self, key, old, new):
+        for index in self.indexes.values():
+            if old is not None:
+                index.remove(old, self.primaryKey)
+            if new is not None:
+                index.add(new, self.primaryKey)
+        if new is None:
+            self.items.pop(key, None)
+        else:
+            self.items[key] = new
+
+
+class MemoryTable(object):
+    """
+    In-process stand-in for the boto3 Table resource, implementing the subset of
+    the API that GameController uses: put/get/update/delete with the legacy
+    Expected and AttributeUpdates parameters, hash key plus begins_with
+    queries on the table and its global secondary indexes, and parallel scans.
+    """
+    def __init__(self, resource, name):
+        self.resource = resource
+        self.meta = resource.meta
+        self.name = name
+        self.table_name = name
+
+    def _data(self, operationName):
+        data = self.resource.tables.get(self.name)
+        if data is None:
+            raise _clientError("ResourceNotFoundException", "Requested resource not found: Table: %s not found" % self.name,
+                               operationName, ResourceNotFoundException)
+        return data
+
+    @property
+    def table_status(self):
+        self._data("DescribeTable")
+        return "ACTIVE"
+
+    @property
+    def item_count(self):
+        return len(self._data("DescribeTable").items)
+
+    def load(self):
+        self._data("DescribeTable")
+
+    def reload(self):
+        self.load()
+
+    def _respond(self, response, returnConsumedCapacity, units):
+        if returnConsumedCapacity in ("TOTAL", "INDEXES"):
+            response["ConsumedCapacity"] = {"TableName": self.name, "CapacityUnits": units}
+        return response
+
+    def _checkConditions(self, current, expected, conditionExpression, names, values, operationName):
+        self._checkExpected(current, expected, operationName)
+        if conditionExpression and not _evaluateCondition(current, conditionExpression, names, values):
+            raise _clientError("ConditionalCheckFailedException", "The conditional request failed", operationName)
+
+    def _checkExpected(self, current, expected, operationName):
+        for name, condition in (expected or {}).items():
+            present = current is not None and name in current
+            value = current.get(name) if present else None
+            if "ComparisonOperator" in condition:
+                operator = condition["ComparisonOperator"]
+                arguments = condition.get("AttributeValueList", [])
+                if operator == "BEGINS_WITH":
+                    ok = present and hasattr(value, "startswith") and value.startswith(arguments[0])
+                elif operator == "EQ":
+                    ok = present and value == arguments[0]
+                elif operator == "NE":
+                    ok = not present or value != arguments[0]
+                elif operator == "NULL":
+                    ok = not present
+                elif operator == "NOT_NULL":
+                    ok = present
+                else:
+                    raise _clientError("ValidationException", "Unsupported ComparisonOperator: %s" % operator, operationName)
+            elif condition.get("Exists", True) is False:
+                ok = not present
+            else:
+                ok = present and value == condition["Value"]
+            if not ok:
+                raise _clientError("ConditionalCheckFailedException", "The conditional request failed", operationName)
+
+    def put_item(self, Item, Expected=None, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues="NONE", ReturnConsumedCapacity="NONE"):
+        data = self._data("PutItem")
+        key = Item[data.primaryKey]
+        with data.lock:
+            old = data.items.get(key)
+            self._checkConditions(old, Expected, ConditionExpression, ExpressionAttributeNames,
+                                  ExpressionAttributeValues, "PutItem")
+            data.store(key, old, _copyItem(Item))
+        response = {}
+        if ReturnValues == "ALL_OLD" and old is not None:
+            response["Attributes"] = _copyItem(old)
+        return self._respond(response, ReturnConsumedCapacity, _capacityUnits(_itemSize(Item), 1024))
+
+    def get_item(self, Key, ConsistentRead=False, ProjectionExpression=None, ExpressionAttributeNames=None,
+                 ReturnConsumedCapacity="NONE"):
+        data = self._data("GetItem")
+        with data.lock:
+            item = data.items.get(Key[data.primaryKey])
+            response = {"Item": _copyItem(item)} if item is not None else {}
+        if item is not None and ProjectionExpression:
+            response["Item"] = _Expression(ProjectionExpression, ExpressionAttributeNames, None).project(response["Item"])
+        # Reads are charged for the whole item, whatever is projected.
+        size = _itemSize(item) if item is not None else 0
+        return self._respond(response, ReturnConsumedCapacity, _capacityUnits(size, 4096, ConsistentRead))
+
+    def update_item(self, Key, AttributeUpdates=None, Expected=None, UpdateExpression=None, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None, ReturnValues="NONE",
+                    ReturnConsumedCapacity="NONE"):
+        data = self._data("UpdateItem")
+        key = Key[data.primaryKey]
+        with data.lock:
+            old = data.items.get(key)
+            self._checkConditions(old, Expected, ConditionExpression, ExpressionAttributeNames,
+                                  ExpressionAttributeValues, "UpdateItem")
+            new = _copyItem(old) if old is not None else dict(Key)
+            if UpdateExpression:
+                try:
+                    _applyUpdate(new, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+                except (ValueError, KeyError, TypeError) as e:
+                    raise _clientError("ValidationException", str(e), "UpdateItem")
+            for name, update in (AttributeUpdates or {}).items():
+                action = update.get("Action", "PUT")
+                if action == "PUT":
+                    new[name] = copy.deepcopy(update["Value"])
+                elif action == "DELETE":
+                    if "Value" in update and isinstance(new.get(name), set):
+                        new[name] = new[name] - update["Value"]
+                    else:
+                        new.pop(name, None)
+                elif action == "ADD":
+                    if isinstance(update["Value"], set):
+                        new[name] = new.get(name, set()) | update["Value"]
+                    else:
+                        new[name] = new.get(name, 0) + update["Value"]
+            data.store(key, old, new)
+        response = {}
+        if ReturnValues == "ALL_NEW":
+            response["Attributes"] = _copyItem(new)
+        elif ReturnValues == "ALL_OLD" and old is not None:
+            response["Attributes"] = _copyItem(old)
+        return self._respond(response, ReturnConsumedCapacity, _capacityUnits(_itemSize(new), 1024))
+
+    def delete_item(self, Key, Expected=None, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues="NONE", ReturnConsumedCapacity="NONE"):
+        data = self._data("DeleteItem")
+        key = Key[data.primaryKey]
+        with data.lock:
+            old = data.items.get(key)
+            self._checkConditions(old, Expected, ConditionExpression, ExpressionAttributeNames,
+                                  ExpressionAttributeValues, "DeleteItem")
+            if old is not None:
+                data.store(key, old, None)
+        response = {}
+        if ReturnValues == "ALL_OLD" and old is not None:
+            response["Attributes"] = _copyItem(old)
+        size = _itemSize(old) if old is not None else 0
+        return self._respond(response, ReturnConsumedCapacity, _capacityUnits(size, 1024))
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues, IndexName=None, Limit=None,
+              ScanIndexForward=True, ExclusiveStartKey=None, ConsistentRead=False, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ReturnConsumedCapacity="NONE"):
+        data = self._data("Query")
+        index = data.indexes.get(IndexName)
+        match = _KEY_CONDITION.match(KeyConditionExpression)
+        if index is None or match is None or match.group(1) != index.hashKey:
+            raise _clientError("ValidationException", "Unsupported query: %s" % KeyConditionExpression, "Query")
+        hashValue = ExpressionAttributeValues[match.group(2)]
+        prefix = ExpressionAttributeValues[match.group(4)] if match.group(3) else None
+
+        with data.lock:
+            partition = index.partitions.get(hashValue, [])
+            low, high = 0, len(partition)
+            if prefix:
+                low = bisect_left(partition, (prefix,))
+                high = bisect_left(partition, (_prefixEnd(prefix),))
+            if ExclusiveStartKey is not None:
+                start = (ExclusiveStartKey.get(index.rangeKey), ExclusiveStartKey[data.primaryKey])
+                if ScanIndexForward:
+                    low = max(low, bisect_right(partition, start))
+                else:
+                    high = min(high, bisect_left(partition, start))
+            entries = partition[low:high]
+            if not ScanIndexForward:
+                entries.reverse()
+            limited = Limit is not None and len(entries) >= Limit
+            if Limit is not None:
+                entries = entries[:Limit]
+            items = [index.project(data.items[primaryKey], data.primaryKey) for _, primaryKey in entries]
+
+        # Reads are charged for the items as stored in the index, whatever is projected.
+        size = sum(_itemSize(item) for item in items)
+        lastKey = None
+        if limited and items:
+            last = items[-1]
+            lastKey = dict((name, last[name]) for name in (data.primaryKey, index.hashKey, index.rangeKey) if name)
+        if ProjectionExpression:
+            items = [_Expression(ProjectionExpression, ExpressionAttributeNames, None).project(item) for item in items]
+        response = {"Items": items, "Count": len(items), "ScannedCount": len(items)}
+        if lastKey is not None:
+            response["LastEvaluatedKey"] = lastKey
+        return self._respond(response, ReturnConsumedCapacity, _capacityUnits(size, 4096, ConsistentRead))
+
+
+    def scan(self, Segment=None, TotalSegments=None, Limit=None, ExclusiveStartKey=None, ConsistentRead=False,
+             ReturnConsumedCapacity="NONE"):
+        data = self._data("Scan")
+        with data.lock:
+            keys = sorted(data.items)
+            if TotalSegments is not None:
+                keys = [key for key in keys if _segmentOf(key, TotalSegments) == Segment]
+            if ExclusiveStartKey is not None:
+                keys = keys[bisect_right(keys, ExclusiveStartKey[data.primaryKey]):]
+            limited = Limit is not None and len(keys) > Limit
+            if Limit is not None:
+                keys = keys[:Limit]
+            items = [_copyItem(data.items[key]) for key in keys]
+
+        response = {"Items": items, "Count": len(items), "ScannedCount": len(items)}
+        if limited and items:
+            response["LastEvaluatedKey"] = {data.primaryKey: items[-1][data.primaryKey]}
+        size = sum(_itemSize(item) for item in items)
+        return self._respond(response, ReturnConsumedCapacity, _capacityUnits(size, 4096, ConsistentRead))
+
+
+def _segmentOf(key, totalSegments):
+    return zlib.crc32(key.encode("utf-8") if not isinstance(key, bytes) else key) % totalSegments
+
+
+class _Waiter(object):
+    def wait(self, **kwargs):
+        pass
+
+
+class _Exceptions(object):
+    ResourceNotFoundException = ResourceNotFoundException
+
+
+class MemoryClient(object):
+    exceptions = _Exceptions
+
+    def __init__(self, resource):
+        self.resource = resource
+
+    def transact_write_items(self, TransactItems, ReturnConsumedCapacity="NONE", ClientRequestToken=None):
+        """
+        Applies every Put, Update, Delete and ConditionCheck, which take low-level
+        attribute values, or none of them if any condition fails.
+        """
+        deserializer = TypeDeserializer()
+
+        def plain(values):
+            return dict((name, deserializer.deserialize(value)) for name, value in (values or {}).items())
+
+        operations = []
+        for transactItem in TransactItems:
+            (kind, request), = transactItem.items()
+            data = MemoryTable(self.resource, request["TableName"])._data("TransactWriteItems")
+            key = plain(request["Item"] if kind == "Put" else request["Key"])[data.primaryKey]
+            operations.append((kind, request, data, key, plain(request.get("ExpressionAttributeValues"))))
+
+        locks = sorted(set(data.lock for _, _, data, _, _ in operations), key=id)
+        for lock in locks:
+            lock.acquire()
+        try:
+            reasons = []
+            for kind, request, data, key, values in operations:
+                ok = _evaluateCondition(data.items.get(key), request.get("ConditionExpression"),
+                                        request.get("ExpressionAttributeNames"), values)
+                reasons.append({"Code": "None"} if ok else {"Code": "ConditionalCheckFailed"})
+            if any(reason["Code"] != "None" for reason in reasons):
+                error = _clientError("TransactionCanceledException",
+                                     "Transaction cancelled, please refer cancellation reasons for specific reasons [%s]"
+                                     % ", ".join(reason["Code"] for reason in reasons), "TransactWriteItems")
+                error.response["CancellationReasons"] = reasons
+                raise error
+
+            consumed = {}
+            for kind, request, data, key, values in operations:
+                old = data.items.get(key)
+                if kind == "Put":
+                    new = plain(request["Item"])
+                elif kind == "Update":
+                    new = _copyItem(old) if old is not None else plain(request["Key"])
+                    _applyUpdate(new, request["UpdateExpression"], request.get("ExpressionAttributeNames"), values)
+                elif kind == "Delete":
+                    new = None
+                else:
+                    continue
+                data.store(key, old, new)
+                size = _itemSize(new if new is not None else old or {})
+                consumed[data.name] = consumed.get(data.name, 0.0) + 2 * _capacityUnits(size, 1024)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+        response = {}
+        if ReturnConsumedCapacity in ("TOTAL", "INDEXES"):
+            response["ConsumedCapacity"] = [{"TableName": name, "CapacityUnits": units} for name, units in consumed.items()]
+        return response
+
+    def describe_table(self, TableName):
+        table = MemoryTable(self.resource, TableName)
+        table.load()
+        return {"Table": {"TableName": TableName, "TableStatus": "ACTIVE", "ItemCount": table.item_count}}
+
+    def get_waiter(self, name):
+        return _Waiter()
+
+
+class _Meta(object):
+    def __init__(self, client):
+        self.client = client
+
+
+class MemoryDynamoDB(object):
+    """
+    In-process stand-in for the boto3 DynamoDB service resource, holding tables
+    in dicts and sorted index structures. Useful for load testing the application
+    without a network hop to DynamoDB or DynamoDB Local.
+    """
+    def __init__(self):
+        self.tables = {}
+        self.meta = _Meta(MemoryClient(self))
+
+    def Table(self, name):
+        return MemoryTable(self, name)
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity="NONE"):
+        """
+        Applies up to 25 puts and deletes. Every request is processed, so
+        UnprocessedItems is always empty.
+        """
+        if sum(len(requests) for requests in RequestItems.values()) > 25:
+            raise _clientError("ValidationException", "Too many items requested for the BatchWriteItem call",
+                               "BatchWriteItem")
+        consumed = []
+        for name, requests in RequestItems.items():
+            table = MemoryTable(self, name)
+            units = 0.0
+            for request in requests:
+                if "PutRequest" in request:
+                    response = table.put_item(Item=request["PutRequest"]["Item"], ReturnConsumedCapacity="TOTAL")
+                else:
+                    response = table.delete_item(Key=request["DeleteRequest"]["Key"], ReturnConsumedCapacity="TOTAL")
+                units += response["ConsumedCapacity"]["CapacityUnits"]
+            consumed.append({"TableName": name, "CapacityUnits": units})
+        response = {"UnprocessedItems": {}}
+        if ReturnConsumedCapacity in ("TOTAL", "INDEXES"):
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def create_table(self, TableName, KeySchema, AttributeDefinitions=None, ProvisionedThroughput=None,
+                     GlobalSecondaryIndexes=(), BillingMode=None):
+        if TableName in self.tables:
+            raise _clientError("ResourceInUseException", "Table already exists: %s" % TableName, "CreateTable")
+        if (BillingMode or "PROVISIONED") == "PROVISIONED" and ProvisionedThroughput is None:
+            raise _clientError("ValidationException", "No provisioned throughput specified for the table", "CreateTable")
+        self.tables[TableName] = _TableData(TableName, KeySchema, GlobalSecondaryIndexes or ())
+        return MemoryTable(self, TableName)
@@ -0,0 +1,93 @@
+import random
+import threading
+import time
+from botocore.exceptions import ClientError
+from batchWriter import RateLimiter, THROTTLING_ERRORS
+from instrumentation import TABLE_OPERATIONS
+
+# Reasons a transaction was cancelled that are worth retrying as they are.
+RETRYABLE_CANCELLATIONS = ("ThrottlingError", "ProvisionedThroughputExceeded", "TransactionConflict")
+
+
+def isThrottled(error):
+    """
+    Whether a ClientError was caused by throttling, so that the same request can
+    succeed if it is sent again later. A transaction counts only if none of its
+    conditions failed.
+    """
+    code = error.response.get("Error", {}).get("Code")
+    if code in THROTTLING_ERRORS:
+        return True
+    if code == "TransactionCanceledException":
+        reasons = [reason.get("Code") for reason in error.response.get("CancellationReasons", [])]
+        return (any(reason in RETRYABLE_CANCELLATIONS for reason in reasons) and
+                all(reason in RETRYABLE_CANCELLATIONS + ("None", None) for reason in reasons))
+    return False
+
+
+class RetryPolicy(object):
+    """
+    Retries throttled DynamoDB requests with exponential backoff and full jitter,
+    optionally spacing requests out with a token bucket shared by every thread.
+    Counts throttled requests, retries and requests given up on, per operation.
+    Requests that fail for any other reason are not retried.
+    """
+    def __init__(self, maxAttempts=3, baseDelay=0.05, maxDelay=2.0, requestsPerSecond=None):
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.limiter = RateLimiter(requestsPerSecond) if requestsPerSecond else None
+        self.lock = threading.Lock()
+        self.throttles = {}
+        self.retries = {}
+        self.failures = {}
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.maxDelay, self.baseDelay * (2 ** attempt)))
+
+    def _count(self, counters, operation):
+        with self.lock:
+            counters[operation] = counters.get(operation, 0) + 1
+
+    def call(self, operation, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire(1)
+            try:
+                return fn(*args, **kwargs)
+            except ClientError as e:
+                if not isThrottled(e):
+                    raise
+                self._count(self.throttles, operation)
+                attempt += 1
+                if attempt >= self.maxAttempts:
+                    self._count(self.failures, operation)
+                    raise
+            self._count(self.retries, operation)
+            time.sleep(self.delay(attempt))
+
+    def stats(self):
+        """
+        Returns {"throttles": {operation: count}, "retries": {...}, "failures": {...}}.
+        """
+        with self.lock:
+            return {"throttles": dict(self.throttles), "retries": dict(self.retries), "failures": dict(self.failures)}
+
+
+class RetryingTable(object):
+    """
+    Wraps a boto3 Table, or client, sending every data operation through a RetryPolicy.
+    """
+    def __init__(self, table, policy):
+        self.table = table
+        self.policy = policy
+
+    def __getattr__(self, name):
+        attribute = getattr(self.table, name)
+        if name not in TABLE_OPERATIONS:
+            return attribute
+
+        def call(*args, **kwargs):
+            return self.policy.call(name, attribute, *args, **kwargs)
+        return call
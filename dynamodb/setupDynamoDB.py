@@ -1,20 +1,105 @@
 import boto3
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 from urllib2 import urlopen
 import json
+from memoryDynamoDB import MemoryDynamoDB
+from models.game import LIST_ATTRIBUTES
 
+# Connections kept open to DynamoDB, shared by every thread using the connection.
+# This should be at least the number of request threads plus the query pool size.
+DEFAULT_MAX_POOL_CONNECTIONS = 32
 
-def getDynamoDBConnection(config=None, endpoint=None, port=None, local=False, use_instance_metadata=False):
+
+def getClientConfig(config=None, maxPoolConnections=None):
+    """
+    Builds the botocore client configuration: a connection pool sized for the
+    worker threads, TCP keep-alive, short timeouts and adaptive retries.
+    """
+    def option(name, default, get='get'):
+        if config is not None and config.has_option('dynamodb', name):
+            return getattr(config, get)('dynamodb', name)
+        return default
+
+    options = {
+        'max_pool_connections': maxPoolConnections or option('maxPoolConnections', DEFAULT_MAX_POOL_CONNECTIONS, 'getint'),
+        'connect_timeout': option('connectTimeout', 2, 'getfloat'),
+        'read_timeout': option('readTimeout', 5, 'getfloat'),
+        'retries': {'mode': option('retryMode', 'adaptive'), 'max_attempts': option('maxAttempts', 4, 'getint')},
+        'tcp_keepalive': True
+    }
+    region = option('region', None)
+    if region:
+        options['region_name'] = region
+    try:
+        return Config(**options)
+    except TypeError:
+        # tcp_keepalive needs a newer botocore; HTTP connections are still reused through the pool.
+        del options['tcp_keepalive']
+        return Config(**options)
+
+
+def getTableCapacity(config=None):
+    """
+    Reads the billing mode and the provisioned capacity of the Games table and of
+    its indexes from the [capacity] section. The indexes default to the table's capacity.
+    """
+    def option(name, default, get='getint'):
+        if config is not None and config.has_option('capacity', name):
+            return getattr(config, get)('capacity', name)
+        return default
+
+    capacity = {
+        'billingMode': option('billingMode', 'PROVISIONED', 'get').upper(),
+        'readCapacity': option('readCapacity', 1),
+        'writeCapacity': option('writeCapacity', 1)
+    }
+    capacity['indexReadCapacity'] = option('indexReadCapacity', capacity['readCapacity'])
+    capacity['indexWriteCapacity'] = option('indexWriteCapacity', capacity['writeCapacity'])
+    if capacity['billingMode'] not in ('PROVISIONED', 'PAY_PER_REQUEST'):
+        raise ValueError("billingMode must be PROVISIONED or PAY_PER_REQUEST, not %s" % capacity['billingMode'])
+    return capacity
+
+
+def getIndexProjection(config=None):
+    """
+    Reads which attributes the indexes hold from the [capacity] section: ALL, or
+    INCLUDE for only those the dashboard lists, which leaves the boards out.
+    """
+    projection = 'ALL'
+    if config is not None and config.has_option('capacity', 'indexProjection'):
+        projection = config.get('capacity', 'indexProjection').upper()
+    if projection not in ('ALL', 'INCLUDE'):
+        raise ValueError("indexProjection must be ALL or INCLUDE, not %s" % projection)
+    return projection
+
+
+def indexProjection(projectionType, keys):
+    if projectionType == 'ALL':
+        return {'ProjectionType': 'ALL'}
+    return {'ProjectionType': 'INCLUDE',
+            'NonKeyAttributes': [name for name in LIST_ATTRIBUTES if name not in keys]}
+
+
+def getDynamoDBConnection(config=None, endpoint=None, port=None, local=False, use_instance_metadata=False, memory=False,
+                          maxPoolConnections=None):
+    if memory:
+        # Keep the tables in this process; nothing is persisted
+        return MemoryDynamoDB()
+
+    # A single resource, and so a single client and connection pool, is shared by all threads.
+    clientConfig = getClientConfig(config, maxPoolConnections)
     if local:
         # Connect to local DynamoDB
         dynamodb = boto3.resource(
             'dynamodb',
-            endpoint_url='http://{}:{}'.format(endpoint, port)
+            endpoint_url='http://{}:{}'.format(endpoint, port),
+            config=clientConfig
         )
     else:
         try:
             session = boto3.Session()  # Create a session to use the default profile or environment variables
-            dynamodb = session.resource('dynamodb')
+            dynamodb = session.resource('dynamodb', config=clientConfig)
         except NoCredentialsError:
             print("No AWS credentials found.")
             raise
@@ -27,7 +112,10 @@ def getDynamoDBConnection(config=None, endpoint=None, port=None, local=False, us
 
     return dynamodb
 
-def createGamesTable(dynamodb):
+def createGamesTable(dynamodb, capacity=None, projectionType='ALL'):
+    if capacity is None:
+        capacity = getTableCapacity()
+    provisioned = capacity['billingMode'] == 'PROVISIONED'
     try:
         # Create the DynamoDB client
         client = dynamodb.meta.client
@@ -40,13 +128,7 @@ def createGamesTable(dynamodb):
                     {'AttributeName': 'HostId', 'KeyType': 'HASH'},
                     {'AttributeName': 'StatusDate', 'KeyType': 'RANGE'}
                 ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 1,
-                    'WriteCapacityUnits': 1
-                }
+                'Projection': indexProjection(projectionType, ('GameId', 'HostId', 'StatusDate'))
             },
             {
                 'IndexName': 'OpponentId-StatusDate-index',
@@ -54,16 +136,23 @@ def createGamesTable(dynamodb):
                     {'AttributeName': 'OpponentId', 'KeyType': 'HASH'},
                     {'AttributeName': 'StatusDate', 'KeyType': 'RANGE'}
                 ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 1,
-                    'WriteCapacityUnits': 1
-                }
+                'Projection': indexProjection(projectionType, ('GameId', 'OpponentId', 'StatusDate'))
             }
         ]
 
+        # On-demand tables and their indexes take no provisioned throughput
+        throughput = {}
+        if provisioned:
+            throughput['ProvisionedThroughput'] = {
+                'ReadCapacityUnits': capacity['readCapacity'],
+                'WriteCapacityUnits': capacity['writeCapacity']
+            }
+            for index in global_indexes:
+                index['ProvisionedThroughput'] = {
+                    'ReadCapacityUnits': capacity['indexReadCapacity'],
+                    'WriteCapacityUnits': capacity['indexWriteCapacity']
+                }
+
         # Create the table
         table = dynamodb.create_table(
             TableName='Games',
@@ -76,11 +165,9 @@ def createGamesTable(dynamodb):
                 {'AttributeName': 'OpponentId', 'AttributeType': 'S'},
                 {'AttributeName': 'StatusDate', 'AttributeType': 'S'}
             ],
-            ProvisionedThroughput={
-                'ReadCapacityUnits': 1,
-                'WriteCapacityUnits': 1
-            },
-            GlobalSecondaryIndexes=global_indexes
+            BillingMode=capacity['billingMode'],
+            GlobalSecondaryIndexes=global_indexes,
+            **throughput
         )
 
         # Wait until the table exists
@@ -0,0 +1,116 @@
+import threading
+from multiprocessing.connection import Listener, Client
+
+
+class LocalBus(object):
+    """
+    Delivers messages to the handlers subscribed in this process. Used when the
+    application runs as a single process, where there is nothing to share.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handlers = {}
+
+    def subscribe(self, channel, handler):
+        with self.lock:
+            self.handlers.setdefault(channel, []).append(handler)
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        with self.lock:
+            handlers = list(self.handlers.get(channel, ()))
+        for handler in handlers:
+            handler(message)
+
+    def close(self):
+        pass
+
+
+class SocketBus(LocalBus):
+    """
+    Shares messages with the other worker processes through a BusBroker.
+    Handlers in this process get a message as soon as it is published, and
+    handlers in the other workers shortly after.
+    """
+    def __init__(self, address, authkey):
+        super(SocketBus, self).__init__()
+        self.connection = Client(address, authkey=authkey)
+        self.sendLock = threading.Lock()
+        self.reader = threading.Thread(target=self.read)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+        try:
+            with self.sendLock:
+                self.connection.send((channel, message))
+        except (IOError, EOFError) as e:
+            print("Error publishing to the state bus: {}".format(e))
+
+    def read(self):
+        while True:
+            try:
+                channel, message = self.connection.recv()
+            except (IOError, EOFError):
+                return
+            try:
+                self.deliver(channel, message)
+            except Exception as e:
+                print("Error handling a state bus message: {}".format(e))
+
+    def close(self):
+        self.connection.close()
+
+
+class BusBroker(object):
+    """
+    Relays every message published by one worker to all of the others, over a
+    local socket. Messages are passed on without being unpickled.
+    """
+    def __init__(self, address=None, authkey=None):
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.lock = threading.Lock()
+        self.connections = {}
+
+    def start(self):
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except Exception as e:
+                print("Error accepting a state bus connection: {}".format(e))
+                continue
+            with self.lock:
+                self.connections[connection] = threading.Lock()
+            thread = threading.Thread(target=self.relay, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    def relay(self, connection):
+        while True:
+            try:
+                message = connection.recv_bytes()
+            except (IOError, EOFError):
+                break
+            with self.lock:
+                others = [(other, lock) for other, lock in self.connections.items() if other is not connection]
+            for other, lock in others:
+                try:
+                    with lock:
+                        other.send_bytes(message)
+                except (IOError, EOFError):
+                    pass
+        with self.lock:
+            self.connections.pop(connection, None)
+        connection.close()
+
+    def close(self):
+        self.listener.close()
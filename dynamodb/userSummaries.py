@@ -0,0 +1,251 @@
+from boto3.dynamodb.types import TypeSerializer
+from models.game import statusDateTimestamp
+
+# Summary items live in the Games table, next to the games, under GameId "USER#<user>".
+# They have no HostId, OpponentId or StatusDate, so they are not in either index.
+SUMMARY_PREFIX = "USER#"
+# Each pending invitation and game in progress is an attribute of its own, holding
+# the fields the dashboard shows, so it can be added or removed without reading
+# the summary first.
+INVITE_PREFIX = "Invite#"
+GAME_PREFIX = "Game#"
+RECENT = "Recent"
+# Finished games are prepended to the Recent list, which is trimmed back to
+# RECENT_GAMES entries once it grows past twice that.
+RECENT_GAMES = 10
+COUNTERS = {"Win": "Wins", "Lose": "Losses", "Tie": "Ties"}
+
+RECORD_ATTRIBUTES = ("HostId", "OpponentId", "OUser", "StatusDate")
+
+
+def summaryKey(user):
+    return SUMMARY_PREFIX + user
+
+
+def isSummaryKey(gameId):
+    return gameId.startswith(SUMMARY_PREFIX)
+
+
+def gameRecord(item):
+    """
+    The fields of a game kept in its players' summaries.
+    """
+    record = dict((name, item[name]) for name in RECORD_ATTRIBUTES)
+    if item.get("Result"):
+        record["Result"] = item["Result"]
+    return record
+
+
+def recordItem(gameId, record):
+    item = dict(record)
+    item["GameId"] = gameId
+    return item
+
+
+def _legacyCondition(write, name, condition):
+    placeholder = write.name(name)
+    if "ComparisonOperator" in condition:
+        operator = condition["ComparisonOperator"]
+        if operator != "BEGINS_WITH":
+            raise ValueError("Unsupported ComparisonOperator: %s" % operator)
+        return "begins_with(%s, %s)" % (placeholder, write.value(condition["AttributeValueList"][0]))
+    if condition.get("Exists", True) is False:
+        return "attribute_not_exists(%s)" % placeholder
+    return "%s = %s" % (placeholder, write.value(condition["Value"]))
+
+
+class _Write(object):
+    """
+    One write of a transaction, with its expression attribute names and values.
+    """
+    def __init__(self, tableName, key):
+        self.tableName = tableName
+        self.key = key
+        self.names = {}
+        self.values = {}
+        self.conditions = []
+
+    def name(self, name):
+        placeholder = "#n%d" % len(self.names)
+        self.names[placeholder] = name
+        return placeholder
+
+    def value(self, value):
+        placeholder = ":v%d" % len(self.values)
+        self.values[placeholder] = value
+        return placeholder
+
+    def expect(self, expected):
+        """
+        Adds conditions given in the legacy Expected format.
+        """
+        for name, condition in sorted((expected or {}).items()):
+            self.conditions.append(_legacyCondition(self, name, condition))
+        return self
+
+    def request(self, serializer):
+        request = {"TableName": self.tableName}
+        if self.conditions:
+            request["ConditionExpression"] = " AND ".join(self.conditions)
+        if self.names:
+            request["ExpressionAttributeNames"] = self.names
+        if self.values:
+            request["ExpressionAttributeValues"] = dict((placeholder, serializer.serialize(value))
+                                                        for placeholder, value in self.values.items())
+        return request
+
+
+class Put(_Write):
+    def __init__(self, tableName, item, keyName="GameId"):
+        super(Put, self).__init__(tableName, {keyName: item[keyName]})
+        self.item = item
+
+    def request(self, serializer):
+        request = super(Put, self).request(serializer)
+        request["Item"] = dict((name, serializer.serialize(value)) for name, value in self.item.items())
+        return {"Put": request}
+
+
+class Delete(_Write):
+    def request(self, serializer):
+        request = super(Delete, self).request(serializer)
+        request["Key"] = dict((name, serializer.serialize(value)) for name, value in self.key.items())
+        return {"Delete": request}
+
+
+class Update(_Write):
+    def __init__(self, tableName, key):
+        super(Update, self).__init__(tableName, key)
+        self.sets = []
+        self.removes = []
+        self.adds = []
+        self.assigned = {}
+        self.removed = []
+        self.added = {}
+
+    def set(self, name, value):
+        self.sets.append("%s = %s" % (self.name(name), self.value(value)))
+        self.assigned[name] = value
+        return self
+
+    def remove(self, name):
+        self.removes.append(self.name(name))
+        self.removed.append(name)
+        return self
+
+    def add(self, name, value):
+        self.adds.append("%s %s" % (self.name(name), self.value(value)))
+        self.added[name] = value
+        return self
+
+    def prepend(self, name, values):
+        placeholder = self.name(name)
+        self.sets.append("%s = list_append(%s, if_not_exists(%s, %s))"
+                         % (placeholder, self.value(list(values)), placeholder, self.value([])))
+        return self
+
+    def attributeUpdates(self, attributeUpdates):
+        """
+        Adds the PUT, ADD and DELETE actions of a legacy AttributeUpdates map.
+        """
+        for name, update in sorted((attributeUpdates or {}).items()):
+            action = update.get("Action", "PUT")
+            if action == "PUT":
+                self.set(name, update["Value"])
+            elif action == "ADD":
+                self.add(name, update["Value"])
+            else:
+                self.remove(name)
+        return self
+
+    def applyTo(self, item):
+        """
+        Returns item with the SET, REMOVE and numeric ADD actions of this update applied.
+        """
+        updated = dict(item)
+        updated.update(self.assigned)
+        for name in self.removed:
+            updated.pop(name, None)
+        for name, value in self.added.items():
+            updated[name] = updated.get(name, 0) + value
+        return updated
+
+    def request(self, serializer):
+        request = super(Update, self).request(serializer)
+        request["Key"] = dict((name, serializer.serialize(value)) for name, value in self.key.items())
+        clauses = []
+        if self.sets:
+            clauses.append("SET " + ", ".join(self.sets))
+        if self.removes:
+            clauses.append("REMOVE " + ", ".join(self.removes))
+        if self.adds:
+            clauses.append("ADD " + ", ".join(self.adds))
+        request["UpdateExpression"] = " ".join(clauses)
+        return {"Update": request}
+
+
+def transactWrite(client, writes):
+    serializer = TypeSerializer()
+    return client.transact_write_items(TransactItems=[write.request(serializer) for write in writes])
+
+
+def _summaryUpdate(tableName, user):
+    return Update(tableName, {"GameId": summaryKey(user)})
+
+
+def gameCreated(tableName, item):
+    """
+    Summary updates for a new invitation.
+    """
+    return [_summaryUpdate(tableName, item["OpponentId"]).set(INVITE_PREFIX + item["GameId"], gameRecord(item))]
+
+
+def gameAccepted(tableName, item):
+    gameId = item["GameId"]
+    record = gameRecord(item)
+    return [_summaryUpdate(tableName, item["OpponentId"]).remove(INVITE_PREFIX + gameId).set(GAME_PREFIX + gameId, record),
+            _summaryUpdate(tableName, item["HostId"]).set(GAME_PREFIX + gameId, record)]
+
+
+def gameRejected(tableName, item):
+    return [_summaryUpdate(tableName, item["OpponentId"]).remove(INVITE_PREFIX + item["GameId"])]
+
+
+def gameFinished(tableName, item):
+    """
+    Summary updates for both players of a game that has just finished, given the
+    finished game item.
+    """
+    gameId = item["GameId"]
+    record = gameRecord(item)
+    updates = []
+    for user in (item["HostId"], item["OpponentId"]):
+        if item["Result"] == "Tie":
+            outcome = "Tie"
+        else:
+            outcome = "Win" if item["Result"] == user else "Lose"
+        updates.append(_summaryUpdate(tableName, user).remove(GAME_PREFIX + gameId)
+                       .prepend(RECENT, [recordItem(gameId, record)]).add(COUNTERS[outcome], 1))
+    return updates
+
+
+def _newestFirst(items):
+    return sorted(items, key=lambda item: statusDateTimestamp(item["StatusDate"]), reverse=True)
+
+
+def readSummary(summary, pageSize):
+    """
+    Returns up to pageSize invitations, games in progress and most recent finished
+    games in a summary item as game items, and whether older finished games exist.
+    """
+    invites = []
+    inProgress = []
+    for name, value in summary.items():
+        if name.startswith(INVITE_PREFIX):
+            invites.append(recordItem(name[len(INVITE_PREFIX):], value))
+        elif name.startswith(GAME_PREFIX):
+            inProgress.append(recordItem(name[len(GAME_PREFIX):], value))
+    recent = summary.get(RECENT, [])
+    finished = [dict(record) for record in recent[:pageSize]]
+    played = sum(int(summary.get(counter, 0)) for counter in COUNTERS.values())
+    return _newestFirst(invites)[:pageSize], _newestFirst(inProgress)[:pageSize], finished, played > len(finished)
@@ -0,0 +1,215 @@
+# Names of the Games table attributes holding each square, in bit order.
+SQUARES = ["TopLeft", "TopMiddle", "TopRight",
+           "MiddleLeft", "MiddleMiddle", "MiddleRight",
+           "BottomLeft", "BottomMiddle", "BottomRight"]
+
+SQUARE_INDEX = dict((name, index) for index, name in enumerate(SQUARES))
+
+EMPTY = " "
+
+# Attribute holding the whole board as one string of markers, row by row,
+# e.g. "X O  X  O". Games stored before it was introduced have an attribute per square.
+BOARD_ATTRIBUTE = "Board"
+
+# Games on other than the classic 3x3 board, three in a row, store their size and the
+# number of markers in a row that wins. Their board is always packed.
+SIZE_ATTRIBUTE = "BoardSize"
+WIN_LENGTH_ATTRIBUTE = "WinLength"
+DEFAULT_SIZE = 3
+DEFAULT_WIN_LENGTH = 3
+MAX_SIZE = 19
+
+FULL_MASK = (1 << len(SQUARES)) - 1
+
+WIN_LINES = [[0, 1, 2], [3, 4, 5], [6, 7, 8],
+             [0, 3, 6], [1, 4, 7], [2, 5, 8],
+             [0, 4, 8], [2, 4, 6]]
+
+WIN_MASKS = tuple(sum(1 << i for i in line) for line in WIN_LINES)
+
+# LINES_THROUGH[index] holds the masks of the lines that run through square index.
+LINES_THROUGH = tuple(tuple(mask for mask in WIN_MASKS if mask >> index & 1) for index in range(len(SQUARES)))
+
+# Row and column steps of the four lines through a square.
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def _buildWinTable():
+    table = bytearray(FULL_MASK + 1)
+    for mask in range(FULL_MASK + 1):
+        if any(mask & winMask == winMask for winMask in WIN_MASKS):
+            table[mask] = 1
+    return table
+
+# WINNING[mask] is 1 when the set of squares in mask completes a line.
+WINNING = _buildWinTable()
+
+
+def isValidSize(size, winLength):
+    return DEFAULT_SIZE <= size <= MAX_SIZE and DEFAULT_WIN_LENGTH <= winLength <= size
+
+
+class Board(object):
+    """
+    Compact board of size x size squares, won by winLength markers in a row. Each
+    player's markers are held as an integer, bit i being set when that player holds
+    square i, counting row by row, so evaluating a position is a handful of integer
+    operations. The classic 3x3 board looks every position up in a table; on larger
+    boards a move is checked along the four lines through it, at most winLength - 1
+    squares either way.
+    """
+    __slots__ = ('x', 'o', 'size', 'winLength')
+
+    def __init__(self, x=0, o=0, size=DEFAULT_SIZE, winLength=DEFAULT_WIN_LENGTH):
+        self.x = x
+        self.o = o
+        self.size = size
+        self.winLength = winLength
+
+    @classmethod
+    def empty(cls, size=DEFAULT_SIZE, winLength=DEFAULT_WIN_LENGTH):
+        return cls(0, 0, size, winLength)
+
+    @classmethod
+    def fromItem(cls, item):
+        """
+        Reads the board of a game item, from the packed Board attribute when the
+        item has one, or else from the attribute for each square.
+        """
+        size = int(item.get(SIZE_ATTRIBUTE, DEFAULT_SIZE))
+        winLength = int(item.get(WIN_LENGTH_ATTRIBUTE, DEFAULT_WIN_LENGTH))
+        packed = item.get(BOARD_ATTRIBUTE)
+        if packed is not None:
+            return cls.fromPacked(packed, size, winLength)
+        x = o = 0
+        for index, name in enumerate(SQUARES):
+            marker = item.get(name)
+            if marker == "X":
+                x |= 1 << index
+            elif marker == "O":
+                o |= 1 << index
+        return cls(x, o)
+
+    @classmethod
+    def fromPacked(cls, packed, size=DEFAULT_SIZE, winLength=DEFAULT_WIN_LENGTH):
+        x = o = 0
+        for index, marker in enumerate(packed[:size * size]):
+            if marker == "X":
+                x |= 1 << index
+            elif marker == "O":
+                o |= 1 << index
+        return cls(x, o, size, winLength)
+
+    def toPacked(self):
+        return "".join(self.toList())
+
+    def toAttributes(self):
+        """
+        Returns the Games table attributes for the occupied squares of a 3x3 board.
+        """
+        return dict((name, self[index]) for index, name in enumerate(SQUARES) if self[index] != EMPTY)
+
+    def toList(self):
+        return [self[index] for index in range(len(self))]
+
+    def isClassic(self):
+        return self.size == DEFAULT_SIZE and self.winLength == DEFAULT_WIN_LENGTH
+
+    def indexOf(self, position):
+        """
+        Returns the index of a square given by index, as a number or a string of
+        digits, or by name on a 3x3 board. Returns None for squares off the board.
+        """
+        if isinstance(position, int) or (hasattr(position, "isdigit") and position.isdigit()):
+            index = int(position)
+            return index if 0 <= index < len(self) else None
+        if self.size == DEFAULT_SIZE:
+            return SQUARE_INDEX.get(position)
+        return None
+
+    def __getitem__(self, index):
+        bit = 1 << index
+        if self.x & bit:
+            return "X"
+        if self.o & bit:
+            return "O"
+        return EMPTY
+
+    def __iter__(self):
+        return iter(self.toList())
+
+    def __len__(self):
+        return self.size * self.size
+
+    def rows(self):
+        markers = self.toList()
+        return [markers[row * self.size:(row + 1) * self.size] for row in range(self.size)]
+
+    def isOccupied(self, index):
+        return bool((self.x | self.o) & (1 << index))
+
+    def place(self, index, marker):
+        """
+        Returns a new board with marker placed on square index.
+        """
+        bit = 1 << index
+        if marker == "X":
+            return Board(self.x | bit, self.o, self.size, self.winLength)
+        return Board(self.x, self.o | bit, self.size, self.winLength)
+
+    def winsWith(self, index):
+        """
+        Whether the marker on square index is part of winLength or more in a row.
+        """
+        bit = 1 << index
+        markers = self.x if self.x & bit else self.o if self.o & bit else 0
+        if not markers:
+            return False
+        if self.isClassic():
+            return any(markers & mask == mask for mask in LINES_THROUGH[index])
+        size = self.size
+        row, column = divmod(index, size)
+        for rowStep, columnStep in DIRECTIONS:
+            count = 1
+            for sign in (1, -1):
+                r, c = row + sign * rowStep, column + sign * columnStep
+                for _ in range(self.winLength - 1):
+                    if not (0 <= r < size and 0 <= c < size and markers >> (r * size + c) & 1):
+                        break
+                    count += 1
+                    r += sign * rowStep
+                    c += sign * columnStep
+            if count >= self.winLength:
+                return True
+        return False
+
+    def winner(self):
+        if self.isClassic():
+            if WINNING[self.x]:
+                return "X"
+            if WINNING[self.o]:
+                return "O"
+            return None
+        # Checks every square, for boards stored before their last move was evaluated.
+        for index in range(len(self)):
+            if self.isOccupied(index) and self.winsWith(index):
+                return self[index]
+        return None
+
+    def isFull(self):
+        return (self.x | self.o) == (1 << len(self)) - 1
+
+    def __eq__(self, other):
+        return (isinstance(other, Board) and self.x == other.x and self.o == other.o and
+                self.size == other.size and self.winLength == other.winLength)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.x, self.o, self.size, self.winLength))
+
+    def __repr__(self):
+        if self.isClassic():
+            return "Board(%r)" % "".join(self.toList())
+        return "Board(%r, size=%d, winLength=%d)" % ("".join(self.toList()), self.size, self.winLength)
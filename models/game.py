@@ -1,47 +1,144 @@
 from boto.dynamodb2.items import Item
+import time
 from datetime import datetime
+from models.board import Board
 
-class Game:
+# StatusDate is either written in the legacy format, the status followed by str(datetime.now()),
+#   "IN_PROGRESS_2016-01-01 10:00:00.000000"
+# or in the compact format, a one letter status code and a fixed width epoch timestamp in milliseconds,
+#   "I#1451642400000"
+# Both sort by date within a status, so either can be range-scanned on the StatusDate indexes.
+LEGACY = "legacy"
+COMPACT = "compact"
+
+STATUS_CODES = {"PENDING": "P", "IN_PROGRESS": "I", "FINISHED": "F"}
+CODE_STATUSES = dict((code, status) for status, code in STATUS_CODES.items())
+COMPACT_SEPARATOR = "#"
+
+# Attributes a Game needs to be listed on the dashboard; the board is not among them.
+LIST_ATTRIBUTES = ("GameId", "HostId", "OpponentId", "StatusDate", "OUser", "Turn", "Result")
+
+# Counts the writes to a game, so that a client holding a version knows whether its copy is current.
+# Games written before the counter was added have no Version and count as version 0.
+VERSION_ATTRIBUTE = "Version"
+
+# Index of the square the first move was played on, which the final board alone does not tell.
+OPENING_ATTRIBUTE = "Opening"
+
+
+def isCompactStatusDate(statusDate):
+    return statusDate[1:2] == COMPACT_SEPARATOR
+
+
+def statusPrefix(status, statusDateFormat=LEGACY):
+    """
+    Returns the prefix shared by every StatusDate with the given status.
+    """
+    if statusDateFormat == COMPACT:
+        return STATUS_CODES[status] + COMPACT_SEPARATOR
+    return status + "_"
+
+
+def statusPrefixOf(status, statusDate):
+    """
+    Returns the prefix for status in the same format as an existing StatusDate value.
+    """
+    return statusPrefix(status, COMPACT if isCompactStatusDate(statusDate) else LEGACY)
+
+
+def encodeStatusDate(status, statusDateFormat=LEGACY, now=None):
+    if now is None:
+        now = time.time()
+    if statusDateFormat == COMPACT:
+        return "%s%013d" % (statusPrefix(status, COMPACT), int(round(now * 1000)))
+    return statusPrefix(status, LEGACY) + str(datetime.fromtimestamp(now))
+
+
+def parseStatus(statusDate):
+    if isCompactStatusDate(statusDate):
+        return CODE_STATUSES[statusDate[0]]
+    return statusDate.rsplit("_", 1)[0]
+
+
+def statusDateTimestamp(statusDate):
+    """
+    Returns the time in a StatusDate value as epoch milliseconds, in either format.
+    """
+    if isCompactStatusDate(statusDate):
+        return int(statusDate[2:])
+    date = statusDate.rsplit("_", 1)[-1]
+    # Parsed by position rather than with strptime, as this runs for every merged query result.
+    seconds = time.mktime((int(date[0:4]), int(date[5:7]), int(date[8:10]),
+                           int(date[11:13]), int(date[14:16]), int(date[17:19]), 0, 0, -1))
+    micros = int(date[20:26].ljust(6, "0")) if len(date) > 20 else 0
+    return int(seconds) * 1000 + micros // 1000
+
+class Game(object):
     """
     This Game class acts as a wrapper on top of an item in the Games table.
     Each of the fields in the table is of a String type.
     GameId is the primary key.
     HostId-StatusDate, Opponent-StatusDate are Global Secondary Indexes that are Hash-Range Keys.
     The other attributes are used to maintain game state.
+    The status and date are parsed from StatusDate once, on first access.
     """
+    __slots__ = ('item', 'gameId', 'hostId', 'opponent', 'statusDate', 'o', 'turn', '_status', '_timestamp', '_date')
+
     def __init__(self, item):
         self.item = item
         self.gameId = item["GameId"]
         self.hostId = item["HostId"]
         self.opponent = item["OpponentId"]
-        self.statusDate = item["StatusDate"].split("_")
+        self.statusDate = item["StatusDate"]
         self.o = item["OUser"]
-        self.turn = item["Turn"]
+        # Games listed from a user summary have no Turn.
+        self.turn = item.get("Turn")
+        self._status = None
+        self._timestamp = None
+        self._date = None
 
     def getStatus(self):
-        status = self.statusDate[0]
-        if len(self.statusDate) > 2:
-            status += "_" + self.statusDate[1]
-        return status
+        if self._status is None:
+            self._status = parseStatus(self.statusDate)
+        return self._status
     status = property(getStatus)
 
+    def getTimestamp(self):
+        if self._timestamp is None:
+            self._timestamp = statusDateTimestamp(self.statusDate)
+        return self._timestamp
+    timestamp = property(getTimestamp)
+
     def getDate(self):
-        index = 1
-        if len(self.statusDate) > 2:
-            index = 2
-        date = datetime.strptime(self.statusDate[index], '%Y-%m-%d %H:%M:%S.%f')
-        return datetime.strftime(date, '%Y-%m-%d %H:%M:%S')
+        if self._date is None:
+            if isCompactStatusDate(self.statusDate):
+                self._date = datetime.fromtimestamp(self.timestamp / 1000.0).strftime('%Y-%m-%d %H:%M:%S')
+            else:
+                # The legacy format already starts with '%Y-%m-%d %H:%M:%S'.
+                self._date = self.statusDate.rsplit("_", 1)[-1][:19]
+        return self._date
     date = property(getDate)
 
+    def getBoard(self):
+        return Board.fromItem(self.item)
+    board = property(getBoard)
+
+    def getVersion(self):
+        return int(self.item.get(VERSION_ATTRIBUTE, 0))
+    version = property(getVersion)
+
     def __eq__(self, other):
         if other is None:
             return False
-        return self.statusDate[1] == other.statusDate[1]
+        return self.timestamp == other.timestamp
+
+    def __ne__(self, other):
+        return not self == other
 
     def __lt__(self, other):
         if other is None:
             return False
-        return self.statusDate[1] < other.statusDate[1]
+        return self.timestamp < other.timestamp
 
     def getOpposingPlayer(self, current_player):
         if current_player == self.hostId:
@@ -50,11 +147,12 @@ class Game:
             return self.hostId
 
     def getResult(self, current_player):
-        if self.item["Result"] is None:
+        result = self.item.get("Result")
+        if result is None:
             return None
-        if self.item["Result"] == "Tie":
+        if result == "Tie":
             return "Tie"
-        if self.item["Result"] == current_player:
+        if result == current_player:
             return "Win"
         else:
             return "Lose"
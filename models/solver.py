@@ -0,0 +1,151 @@
+import struct
+from models.board import SQUARES, FULL_MASK, WINNING
+
+# Image of each square under the eight symmetries of the board: the rotations
+# by 0, 90, 180 and 270 degrees, each with and without a mirror.
+def _symmetries():
+    def rotate(square):
+        row, column = divmod(square, 3)
+        return column * 3 + (2 - row)
+
+    def mirror(square):
+        row, column = divmod(square, 3)
+        return row * 3 + (2 - column)
+
+    permutations = []
+    permutation = list(range(len(SQUARES)))
+    for _ in range(4):
+        permutations.append(tuple(permutation))
+        permutations.append(tuple(mirror(square) for square in permutation))
+        permutation = [rotate(square) for square in permutation]
+    return permutations
+
+SYMMETRIES = _symmetries()
+
+
+def _maskMaps():
+    maps = []
+    for permutation in SYMMETRIES:
+        images = [0] * (FULL_MASK + 1)
+        for mask in range(FULL_MASK + 1):
+            for square in range(len(SQUARES)):
+                if mask & (1 << square):
+                    images[mask] |= 1 << permutation[square]
+        maps.append(images)
+    return maps
+
+# MASK_MAPS[s][mask] is mask with every square moved by symmetry s.
+MASK_MAPS = _maskMaps()
+
+NO_MOVE = 0xF
+TABLE_MAGIC = b"TTTS"
+_HEADER = struct.Struct("<4sH")
+_ENTRY = struct.Struct("<HHb")
+
+
+def _bitCount(mask):
+    return bin(mask).count("1")
+
+
+def _canonical(mine, theirs):
+    """
+    Returns the smallest image of the position under the board symmetries.
+    """
+    return min((images[mine], images[theirs]) for images in MASK_MAPS)
+
+
+class Solver(object):
+    """
+    Perfect-play table for every legal position, keyed by the markers of the
+    player to move and of their opponent. Positions are solved by negamax once,
+    for one representative of each set of symmetric positions, and the table is
+    then expanded so that choosing a move is a single array lookup.
+
+    A score is positive when the player to move wins, negative when they lose and
+    zero for a tie; the further it is from zero, the sooner the game ends.
+    """
+    def __init__(self, solved):
+        # solved maps a canonical (mine, theirs) position to (best move, score).
+        self.solved = solved
+        self.moves = bytearray([NO_MOVE]) * ((FULL_MASK + 1) * (FULL_MASK + 1))
+        self.scores = bytearray((FULL_MASK + 1) * (FULL_MASK + 1))
+        for (mine, theirs), (move, score) in solved.items():
+            for permutation, images in zip(SYMMETRIES, MASK_MAPS):
+                index = (images[mine] << 9) | images[theirs]
+                self.moves[index] = permutation[move] if move != NO_MOVE else NO_MOVE
+                self.scores[index] = score & 0xFF
+
+    @classmethod
+    def build(cls):
+        solved = {}
+
+        def negamax(mine, theirs):
+            key = canonicalMine, canonicalTheirs = _canonical(mine, theirs)
+            if key not in solved:
+                empty = FULL_MASK & ~(canonicalMine | canonicalTheirs)
+                if WINNING[canonicalTheirs]:
+                    solved[key] = (NO_MOVE, -(_bitCount(empty) + 1))
+                elif not empty:
+                    solved[key] = (NO_MOVE, 0)
+                else:
+                    best = None
+                    for square in range(len(SQUARES)):
+                        if empty & (1 << square):
+                            score = -negamax(canonicalTheirs, canonicalMine | (1 << square))
+                            if best is None or score > best[1]:
+                                best = (square, score)
+                    solved[key] = best
+            return solved[key][1]
+
+        negamax(0, 0)
+        return cls(solved)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, count = _HEADER.unpack_from(data)
+        if magic != TABLE_MAGIC or len(data) != _HEADER.size + count * _ENTRY.size:
+            raise ValueError("Not a solver table: %s" % path)
+        solved = {}
+        for index in range(count):
+            mine, moveAndTheirs, score = _ENTRY.unpack_from(data, _HEADER.size + index * _ENTRY.size)
+            solved[(mine, moveAndTheirs & FULL_MASK)] = (moveAndTheirs >> 9, score)
+        return cls(solved)
+
+    def save(self, path):
+        """
+        Writes the canonical positions, five bytes each, to path.
+        """
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(TABLE_MAGIC, len(self.solved)))
+            for (mine, theirs), (move, score) in sorted(self.solved.items()):
+                f.write(_ENTRY.pack(mine, (move << 9) | theirs, score))
+
+    def bestMove(self, mine, theirs):
+        """
+        Returns the best square for the player holding mine to play, or None
+        when the game is over.
+        """
+        move = self.moves[(mine << 9) | theirs]
+        return None if move == NO_MOVE else move
+
+    def score(self, mine, theirs):
+        score = self.scores[(mine << 9) | theirs]
+        return score - 0x100 if score > 0x7F else score
+
+    def playFor(self, board, marker):
+        """
+        Returns the best square for marker to play on a Board, or None.
+        """
+        if marker == "X":
+            return self.bestMove(board.x, board.o)
+        return self.bestMove(board.o, board.x)
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m models.solver <table file>")
+    solver = Solver.build()
+    solver.save(sys.argv[1])
+    print("Wrote {} positions to {}".format(len(solver.solved), sys.argv[1]))
@@ -0,0 +1,113 @@
+"""
+Rebuilds the per-user summary items from the games in the Games table.
+
+Scans the table, gathers each user's pending invitations, games in progress,
+most recent finished games and win, loss and tie counts, and writes one
+summary item per user with batch writes, replacing any summary already there.
+
+    python rebuildSummaries.py --config config
+
+Run it before setting userSummaries=true, and again whenever the summaries may
+have drifted, while the application is stopped: games that change during the
+scan are not reflected in the summaries it writes.
+"""
+import sys
+import os
+import argparse
+import time
+from ConfigParser import ConfigParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dynamodb'))
+from dynamodb.batchWriter import RateLimiter, batchWrite
+from dynamodb.setupDynamoDB import getDynamoDBConnection
+from dynamodb.userSummaries import (INVITE_PREFIX, GAME_PREFIX, RECENT, RECENT_GAMES, COUNTERS, summaryKey,
+                                    isSummaryKey, gameRecord, recordItem)
+from models.game import parseStatus, statusDateTimestamp
+
+
+class SummaryBuilder(object):
+    """
+    Accumulates summary items from the games passed to add().
+    """
+    def __init__(self):
+        self.summaries = {}
+        self.finished = {}
+
+    def summary(self, user):
+        if user not in self.summaries:
+            self.summaries[user] = dict((counter, 0) for counter in COUNTERS.values())
+            self.summaries[user]["GameId"] = summaryKey(user)
+            self.finished[user] = []
+        return self.summaries[user]
+
+    def add(self, item):
+        if isSummaryKey(item["GameId"]) or "StatusDate" not in item:
+            return
+        gameId = item["GameId"]
+        status = parseStatus(item["StatusDate"])
+        if status == "PENDING":
+            self.summary(item["OpponentId"])[INVITE_PREFIX + gameId] = gameRecord(item)
+        elif status == "IN_PROGRESS":
+            for user in (item["HostId"], item["OpponentId"]):
+                self.summary(user)[GAME_PREFIX + gameId] = gameRecord(item)
+        elif status == "FINISHED" and item.get("Result"):
+            for user in (item["HostId"], item["OpponentId"]):
+                if item["Result"] == "Tie":
+                    outcome = "Tie"
+                else:
+                    outcome = "Win" if item["Result"] == user else "Lose"
+                self.summary(user)[COUNTERS[outcome]] += 1
+                self.finished[user].append(recordItem(gameId, gameRecord(item)))
+
+    def items(self):
+        for user, summary in self.summaries.items():
+            finished = sorted(self.finished[user], key=lambda item: statusDateTimestamp(item["StatusDate"]),
+                              reverse=True)
+            summary[RECENT] = finished[:RECENT_GAMES]
+            yield summary
+
+
+def scanGames(table, pageSize):
+    kwargs = {"Limit": pageSize}
+    while True:
+        response = table.scan(**kwargs)
+        for item in response["Items"]:
+            yield item
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the TicTacToe user summaries', prog='rebuildSummaries.py')
+    parser.add_argument('--config', help='Path to the config file containing application settings.')
+    parser.add_argument('--mode', help='Whether to connect to a DynamoDB service endpoint, or to DynamoDB Local.',
+                        choices=['local', 'service'], default='service')
+    parser.add_argument('--endpoint', help='An endpoint to connect to.')
+    parser.add_argument('--port', help='The port of DynamoDB Local endpoint to connect to.', type=int)
+    parser.add_argument('--pageSize', help='Items read per scan request.', type=int, default=100)
+    parser.add_argument('--writesPerSecond', help='Maximum summaries written per second.', type=float, default=25)
+    args = parser.parse_args()
+
+    configFile = args.config or os.environ.get('CONFIG_FILE')
+    config = None
+    if configFile is not None:
+        config = ConfigParser()
+        config.read(configFile)
+
+    dynamodb = getDynamoDBConnection(config=config, endpoint=args.endpoint, port=args.port, local=(args.mode == 'local'))
+    start = time.time()
+    builder = SummaryBuilder()
+    for item in scanGames(dynamodb.Table("Games"), args.pageSize):
+        builder.add(item)
+    summaries = list(builder.items())
+    unwritten = batchWrite(dynamodb, "Games", [{"PutRequest": {"Item": summary}} for summary in summaries],
+                           RateLimiter(args.writesPerSecond))
+    if unwritten:
+        print("Error writing user summaries: {} of {} were still unprocessed after retrying; run it again".format(
+            len(unwritten), len(summaries)))
+        sys.exit(1)
+    print("Wrote {} user summaries in {:.1f}s".format(len(summaries), time.time() - start))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Production entry point for the TicTacToe application.
+
+Starts a pool of worker processes that accept connections on one shared
+listening socket, each serving requests from its own threads. Game event
+streams are served by an event loop in each worker instead, so that open
+boards do not hold request threads. The workers share a session secret, and
+share game changes through a state bus so that every worker's game cache and
+open boards stay current. Quick play players wait in one queue, served to the
+workers from this process.
+
+    python server.py --workers 4 --threads 32 --config config --mode service
+
+Arguments that are not listed in --help are passed on to application.py.
+"""
+import sys
+import os
+import argparse
+import binascii
+import multiprocessing
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ConfigParser import ConfigParser
+from werkzeug.serving import BaseWSGIServer, ThreadedWSGIServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dynamodb'))
+from dynamodb.stateBus import BusBroker
+from dynamodb.matchmaking import MatchQueueManager
+from dynamodb.eventStreams import EventStreams
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    A WSGI server that handles requests on a fixed size pool of threads.
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd=None):
+        BaseWSGIServer.__init__(self, host, port, app, fd=fd)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.processRequestThread, request, client_address)
+
+    def processRequestThread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def listenPort(options):
+    """
+    Resolves the port the same way application.py does.
+    """
+    if 'SERVER_PORT' in os.environ:
+        return int(os.environ['SERVER_PORT'])
+    if options.serverPort is not None:
+        return options.serverPort
+    configFile = os.environ.get('CONFIG_FILE', options.config)
+    if configFile is not None:
+        config = ConfigParser()
+        config.read(configFile)
+        if config.has_option('flask', 'serverPort'):
+            return config.getint('flask', 'serverPort')
+    return 5000
+
+
+def runWorker(listener, host, threads, applicationArgs):
+    # Ctrl+C is handled by the parent, which stops the workers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    sys.argv = ["application.py"] + applicationArgs
+    import application
+    application.application.debug = False
+    if threads:
+        server = PooledWSGIServer(host, 0, application.application, threads, fd=listener.fileno())
+    else:
+        server = ThreadedWSGIServer(host, 0, application.application, fd=listener.fileno())
+    # Every accepted connection goes to the event loop first, which hands back those that are not event streams.
+    streams = EventStreams(application.controller.hub, server.process_request,
+                           streamSeconds=application.EVENT_STREAM_SECONDS,
+                           keepaliveSeconds=application.EVENT_KEEPALIVE_SECONDS)
+    server.process_request = streams.add
+    streams.start()
+    server.serve_forever()
+
+
+def startWorker(listener, options, applicationArgs):
+    worker = multiprocessing.Process(target=runWorker, args=(listener, options.host, options.threads, applicationArgs))
+    worker.daemon = True
+    worker.start()
+    return worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the TicTacToe sample app with several worker processes',
+                                     prog='server.py')
+    parser.add_argument('--workers', help='Number of worker processes. Defaults to the number of CPUs.', type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument('--threads', help='Number of request threads per worker. Defaults to a thread per request. '
+                        'Open boards do not use request threads.', type=int, default=0)
+    parser.add_argument('--host', help='The address to listen on.', default='0.0.0.0')
+    parser.add_argument('--serverPort', help='The port to listen on.', type=int)
+    parser.add_argument('--config', help='Path to the config file containing application settings.')
+    parser.add_argument('--mode', help='Passed on to application.py.', default='service')
+    options, applicationArgs = parser.parse_known_args()
+
+    applicationArgs += ['--mode', options.mode]
+    if options.config is not None:
+        applicationArgs += ['--config', options.config]
+
+    if options.mode == 'memory' and options.workers > 1:
+        parser.error('--mode memory keeps the tables inside one process; run it with --workers 1')
+
+    listener = socket.socket(socket.AF_INET6 if ':' in options.host else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((options.host, listenPort(options)))
+    listener.listen(128)
+
+    # Shared by the workers through their environment.
+    if 'SECRET_KEY' not in os.environ:
+        os.environ['SECRET_KEY'] = binascii.hexlify(os.urandom(32))
+    broker = None
+    if options.workers > 1:
+        authkey = binascii.hexlify(os.urandom(32))
+        broker = BusBroker(authkey=authkey)
+        broker.start()
+        os.environ['STATE_BUS_ADDRESS'] = broker.address
+        os.environ['STATE_BUS_AUTHKEY'] = authkey
+        # The quick play queue, served from this process so that every worker pairs players from it.
+        matchQueues = MatchQueueManager(authkey=authkey).get_server()
+        thread = threading.Thread(target=matchQueues.serve_forever)
+        thread.daemon = True
+        thread.start()
+        os.environ['MATCH_QUEUE_ADDRESS'] = matchQueues.address
+
+    workers = [startWorker(listener, options, applicationArgs) for _ in range(options.workers)]
+    print("Serving on {}:{} with {} workers".format(options.host, listener.getsockname()[1], options.workers))
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            time.sleep(1)
+            for index, worker in enumerate(workers):
+                if not worker.is_alive():
+                    print("Worker {} exited with code {}; restarting it".format(worker.pid, worker.exitcode))
+                    workers[index] = startWorker(listener, options, applicationArgs)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+        if broker is not None:
+            broker.close()
+
+if __name__ == '__main__':
+    main()
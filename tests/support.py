@@ -0,0 +1,21 @@
+from dynamodb.connectionManager import ConnectionManager
+from dynamodb.gameController import GameController
+
+
+def memoryController(**options):
+    """
+    Returns a GameController over a Games table of its own, kept in memory.
+    """
+    return GameController(ConnectionManager(mode='memory'), **options)
+
+
+def finishGame(controller, gameId, host, opponent):
+    """
+    Starts a game between host and opponent and plays it until opponent wins.
+    Returns the finished game.
+    """
+    assert controller.createStartedGame(gameId, host, opponent)
+    for square, user in ((0, opponent), (3, host), (1, opponent), (4, host), (2, opponent)):
+        success, item = controller.makeMove(gameId, square, user)
+        assert success
+    return item
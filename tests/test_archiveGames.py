@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from botocore.exceptions import ClientError
+
+from archiveGames import ArchiveFile, Checkpoint, GameArchiver
+from dynamodb.batchWriter import BATCH_SIZE, batchWrite
+from dynamodb.retry import RetryPolicy
+from dynamodb.userSummaries import summaryKey
+from tests.support import finishGame, memoryController
+
+
+class FakeDynamoDB(object):
+    """
+    Answers BatchWriteItem calls by leaving unprocessed the requests chosen by unprocessed(pending).
+    """
+    def __init__(self, unprocessed):
+        self.unprocessed = unprocessed
+        self.written = []
+        self.calls = 0
+
+    def batch_write_item(self, RequestItems):
+        self.calls += 1
+        (tableName, pending), = RequestItems.items()
+        left = self.unprocessed(pending)
+        self.written.extend(request for request in pending if request not in left)
+        return {"UnprocessedItems": {tableName: left}} if left else {}
+
+
+def throttle(pending):
+    raise ClientError({"Error": {"Code": "ThrottlingException"}}, "BatchWriteItem")
+
+
+def putRequests(count):
+    return [{"PutRequest": {"Item": {"GameId": str(index)}}} for index in range(count)]
+
+
+class BatchWriteTest(unittest.TestCase):
+    policy = RetryPolicy(maxAttempts=3, baseDelay=0.001)
+
+    def testWritesEveryRequestInBatches(self):
+        dynamodb = FakeDynamoDB(lambda pending: [])
+        requests = putRequests(2 * BATCH_SIZE + 10)
+        self.assertEqual(batchWrite(dynamodb, "Games", requests, policy=self.policy), [])
+        self.assertEqual(dynamodb.written, requests)
+        self.assertEqual(dynamodb.calls, 3)
+
+    def testRetriesUnprocessedRequests(self):
+        attempts = []
+
+        def firstTimeOnly(pending):
+            attempts.append(len(pending))
+            return pending[1:] if len(attempts) == 1 else []
+        dynamodb = FakeDynamoDB(firstTimeOnly)
+        requests = putRequests(BATCH_SIZE)
+        self.assertEqual(batchWrite(dynamodb, "Games", requests, policy=self.policy), [])
+        self.assertEqual(attempts, [BATCH_SIZE, BATCH_SIZE - 1])
+        self.assertEqual(sorted(dynamodb.written), sorted(requests))
+
+    def testReturnsTheRequestsItCouldNotWrite(self):
+        # One request of each attempt gets through, and the third batch is never sent.
+        dynamodb = FakeDynamoDB(lambda pending: pending[1:])
+        requests = putRequests(2 * BATCH_SIZE + 10)
+        unwritten = batchWrite(dynamodb, "Games", requests, policy=self.policy)
+        self.assertEqual(dynamodb.calls, self.policy.maxAttempts)
+        self.assertEqual(len(unwritten), len(requests) - self.policy.maxAttempts)
+        self.assertEqual(sorted(dynamodb.written + unwritten), sorted(requests))
+
+    def testThrottledBatchesAreReturnedUnwritten(self):
+        dynamodb = FakeDynamoDB(throttle)
+        requests = putRequests(BATCH_SIZE + 1)
+        self.assertEqual(batchWrite(dynamodb, "Games", requests, policy=self.policy), requests)
+        self.assertEqual(dynamodb.calls, self.policy.maxAttempts)
+
+    def testOtherErrorsAreRaised(self):
+        def invalid(pending):
+            raise ClientError({"Error": {"Code": "ValidationException"}}, "BatchWriteItem")
+        dynamodb = FakeDynamoDB(invalid)
+        with self.assertRaises(ClientError):
+            batchWrite(dynamodb, "Games", putRequests(1), policy=self.policy)
+        self.assertEqual(dynamodb.calls, 1)
+
+
+class GameArchiverTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.controller = memoryController(userSummaries=True)
+        self.dynamodb = self.controller.cm.dynamodb
+        self.table = self.dynamodb.Table("Games")
+        for index in range(3):
+            finishGame(self.controller, "old%d" % index, "alice", "bob")
+        self.controller.createNewGame("pending", "alice", "carol")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def archive(self, cutoff):
+        path = os.path.join(self.directory, "archive.jsonl")
+        checkpoint = Checkpoint(os.path.join(self.directory, "checkpoint"), cutoff, 2)
+        archiver = GameArchiver(self.dynamodb, checkpoint, totalSegments=2, pageSize=2, writesPerSecond=1000)
+        archive = ArchiveFile(path)
+        try:
+            counts = archiver.run(archive)
+        finally:
+            archive.close()
+        with open(path) as f:
+            return counts, sorted(json.loads(line)["GameId"] for line in f)
+
+    def summary(self, user):
+        return self.table.get_item(Key={"GameId": summaryKey(user)})["Item"]
+
+    def testArchivesFinishedGamesAndTrimsTheSummaries(self):
+        (scanned, archived), gameIds = self.archive(int((time.time() + 60) * 1000))
+        self.assertEqual(archived, 3)
+        self.assertEqual(gameIds, ["old0", "old1", "old2"])
+        for gameId in gameIds:
+            self.assertNotIn("Item", self.table.get_item(Key={"GameId": gameId}))
+        self.assertIn("Item", self.table.get_item(Key={"GameId": "pending"}))
+        for user in ("alice", "bob"):
+            self.assertEqual(self.summary(user)["Recent"], [])
+        # The counters still count the archived games.
+        self.assertEqual((self.summary("alice")["Losses"], self.summary("bob")["Wins"]), (3, 3))
+
+    def testKeepsGamesFinishedAfterTheCutoff(self):
+        (scanned, archived), gameIds = self.archive(int((time.time() - 60) * 1000))
+        self.assertEqual((archived, gameIds), (0, []))
+        self.assertEqual(len(self.summary("alice")["Recent"]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
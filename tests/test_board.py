@@ -0,0 +1,93 @@
+import random
+import unittest
+
+from models.board import Board, WIN_LINES, EMPTY
+
+
+def linesThrough(index, size, winLength):
+    """
+    The squares of every line of winLength that runs through square index.
+    """
+    row, column = divmod(index, size)
+    for rowStep, columnStep in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for offset in range(winLength):
+            cells = [(row + rowStep * (step - offset), column + columnStep * (step - offset))
+                     for step in range(winLength)]
+            if all(0 <= r < size and 0 <= c < size for r, c in cells):
+                yield [r * size + c for r, c in cells]
+
+
+def holdsLine(markers, marker, size, winLength):
+    return any(all(markers[square] == marker for square in line)
+               for index in range(size * size) for line in linesThrough(index, size, winLength))
+
+
+def randomBoard(rng, size, winLength):
+    markers = [rng.choice("XO ") for _ in range(size * size)]
+    board = Board.fromPacked("".join(markers), size, winLength)
+    return markers, board
+
+
+class BoardTest(unittest.TestCase):
+    def testPackedRoundTrip(self):
+        rng = random.Random(1)
+        for size in (3, 5, 7):
+            markers, board = randomBoard(rng, size, 3)
+            self.assertEqual(board.toPacked(), "".join(markers))
+            self.assertEqual(Board.fromPacked(board.toPacked(), size, 3), board)
+
+    def testItemWithSquareAttributes(self):
+        item = {"GameId": "g", "TopLeft": "X", "MiddleMiddle": "O", "BottomRight": "X"}
+        board = Board.fromItem(item)
+        self.assertEqual(board.toAttributes(), {"TopLeft": "X", "MiddleMiddle": "O", "BottomRight": "X"})
+
+    def testIndexOf(self):
+        board = Board.empty()
+        self.assertEqual(board.indexOf("MiddleMiddle"), 4)
+        self.assertEqual(board.indexOf("8"), 8)
+        self.assertIsNone(board.indexOf(9))
+        self.assertIsNone(board.indexOf("Nowhere"))
+        self.assertIsNone(Board.empty(5, 4).indexOf("TopLeft"))
+
+    def testClassicWinner(self):
+        for line in WIN_LINES:
+            board = Board.empty()
+            for index in line:
+                board = board.place(index, "O")
+            self.assertEqual(board.winner(), "O")
+        self.assertIsNone(Board.fromPacked("XOXXOOOXX").winner())
+        self.assertTrue(Board.fromPacked("XOXXOOOXX").isFull())
+
+    def testWinnerMatchesBruteForce(self):
+        rng = random.Random(2)
+        for size, winLength in ((3, 3), (4, 3), (5, 4), (6, 5)):
+            for _ in range(300):
+                markers, board = randomBoard(rng, size, winLength)
+                xWins = holdsLine(markers, "X", size, winLength)
+                oWins = holdsLine(markers, "O", size, winLength)
+                if not xWins and not oWins:
+                    self.assertIsNone(board.winner())
+                elif xWins != oWins:
+                    self.assertEqual(board.winner(), "X" if xWins else "O")
+
+    def testWinsWithOnlyCountsLinesThroughTheSquare(self):
+        # X holds the top row; the X on square 8 is not part of it.
+        board = Board.fromPacked("XXXOO   X")
+        self.assertTrue(board.winsWith(0))
+        self.assertFalse(board.winsWith(8))
+        self.assertFalse(board.winsWith(5))
+
+    def testWinsWithMatchesBruteForce(self):
+        rng = random.Random(3)
+        for size, winLength in ((3, 3), (5, 4)):
+            for _ in range(200):
+                markers, board = randomBoard(rng, size, winLength)
+                for index in range(size * size):
+                    expected = markers[index] != EMPTY and any(
+                        all(markers[square] == markers[index] for square in line)
+                        for line in linesThrough(index, size, winLength))
+                    self.assertEqual(board.winsWith(index), expected, (markers, index))
+
+
+if __name__ == '__main__':
+    unittest.main()
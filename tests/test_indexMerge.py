@@ -0,0 +1,114 @@
+import base64
+import json
+import random
+import unittest
+
+from dynamodb.indexMerge import IndexStream, mergeStreams, encodeCursor, encodeStartKeys, decodeCursor
+from tests.support import memoryController, finishGame
+
+KEY_NAMES = [("GameId", "HostId", "StatusDate"), ("GameId", "OpponentId", "StatusDate")]
+
+
+def listStream(items, pageSize, startKey=None, exhausted=False):
+    """
+    A stream over items, sorted newest first, read pageSize at a time.
+    """
+    def fetchPage(startKey):
+        start = 0 if startKey is None else [item["id"] for item in items].index(startKey["id"]) + 1
+        page = items[start:start + pageSize]
+        lastKey = {"id": page[-1]["id"]} if page and start + pageSize < len(items) else None
+        return page, lastKey
+    return IndexStream(fetchPage, lambda item: {"id": item["id"]}, startKey, exhausted)
+
+
+def encoded(state):
+    return base64.urlsafe_b64encode(json.dumps(state).encode('utf-8')).decode('ascii')
+
+
+class MergeTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(4)
+        times = rng.sample(range(1000), 60)
+        items = [{"id": "i%d" % time, "time": time} for time in times]
+        self.lists = [sorted(items[start::3], key=lambda item: item["time"], reverse=True) for start in range(3)]
+        self.newestFirst = sorted(items, key=lambda item: item["time"], reverse=True)
+
+    def testMergeIsNewestFirst(self):
+        streams = [listStream(items, 7) for items in self.lists]
+        merged = mergeStreams(streams, lambda item: item["time"], 100)
+        self.assertEqual(merged, self.newestFirst)
+
+    def testCursorResumesEveryStream(self):
+        pages = []
+        cursor = None
+        while True:
+            startKeys = decodeCursor(cursor, len(self.lists))
+            streams = [listStream(items, 4, startKey, exhausted=(startKey == 0))
+                       for items, startKey in zip(self.lists, startKeys)]
+            pages.append(mergeStreams(streams, lambda item: item["time"], 9))
+            cursor = encodeCursor(streams)
+            if cursor is None:
+                break
+        self.assertEqual(sum(pages, []), self.newestFirst)
+        self.assertTrue(all(len(page) == 9 for page in pages[:-1]))
+
+
+class DecodeCursorTest(unittest.TestCase):
+    def testNoCursorStartsEveryStream(self):
+        self.assertEqual(decodeCursor(None, 2), [None, None])
+        self.assertEqual(decodeCursor("", 2, KEY_NAMES), [None, None])
+
+    def testRoundTrip(self):
+        startKeys = [{"GameId": "g", "HostId": "alice", "StatusDate": "FINISHED_1"}, 0]
+        self.assertEqual(decodeCursor(encodeStartKeys(startKeys), 2, KEY_NAMES), startKeys)
+
+    def testRejectsTamperedCursors(self):
+        tampered = [
+            "%%%",
+            "YWJj",
+            encoded({"GameId": "g"}),
+            encoded([None]),
+            encoded([1, "x"]),
+            encoded([False, None]),
+            encoded([{"GameId": "g", "Other": "x", "StatusDate": "s"}, None]),
+            encoded([{"GameId": "g", "HostId": 1, "StatusDate": "s"}, None]),
+            encoded([{"GameId": "g", "HostId": "alice", "StatusDate": "s"},
+                     {"GameId": "g", "HostId": "alice", "StatusDate": "s"}]),
+        ]
+        for cursor in tampered:
+            self.assertRaises(ValueError, decodeCursor, cursor, 2, KEY_NAMES)
+
+
+class GamesPageTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.controller = memoryController()
+        opponents = ["bob", "carol", "dave"]
+        for index in range(14):
+            opponent = opponents[index % len(opponents)]
+            # alice alternates between hosting and being invited.
+            host, invitee = ("alice", opponent) if index % 2 else (opponent, "alice")
+            finishGame(cls.controller, "g%02d" % index, host, invitee)
+        cls.controller.createStartedGame("live", "alice", "bob")
+
+    def pages(self, limit, cursor=None):
+        pages = []
+        while True:
+            games, cursor = self.controller.getGamesPage("alice", "FINISHED", limit, cursor)
+            pages.append([game["GameId"] for game in games])
+            if cursor is None:
+                return pages
+
+    def testPagesListEveryFinishedGameOnceNewestFirst(self):
+        pages = self.pages(4)
+        self.assertEqual(sum(pages, []), ["g%02d" % index for index in reversed(range(14))])
+        self.assertEqual([len(page) for page in pages], [4, 4, 4, 2])
+
+    def testTamperedCursorStartsAgain(self):
+        first = self.controller.getGamesPage("alice", "FINISHED", 4)[0]
+        cursor = encoded([{"GameId": "g", "Nope": "x", "StatusDate": "s"}, None])
+        self.assertEqual(self.controller.getGamesPage("alice", "FINISHED", 4, cursor)[0], first)
+
+
+if __name__ == '__main__':
+    unittest.main()
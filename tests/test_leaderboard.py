@@ -0,0 +1,102 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from dynamodb.leaderboard import ELO_K, INITIAL_RATING, Leaderboard
+from tests.support import finishGame, memoryController
+
+
+def finished(gameId, host, opponent, result, timestamp=1):
+    return {"GameId": gameId, "HostId": host, "OpponentId": opponent, "Result": result,
+            "StatusDate": "FINISHED_%d" % timestamp}
+
+
+class LeaderboardTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testEloUpdatesAreSymmetric(self):
+        leaderboard = Leaderboard()
+        players = ["alice", "bob", "carol", "dave"]
+        rng = random.Random(7)
+        for index in range(200):
+            host, opponent = rng.sample(players, 2)
+            before = leaderboard.rating(host), leaderboard.rating(opponent)
+            leaderboard.recordGame(finished("g%d" % index, host, opponent, rng.choice([host, opponent, "Tie"])))
+            gained = leaderboard.rating(host) - before[0]
+            lost = before[1] - leaderboard.rating(opponent)
+            self.assertAlmostEqual(gained, lost)
+            self.assertLessEqual(abs(gained), ELO_K)
+        self.assertAlmostEqual(sum(leaderboard.rating(user) for user in players), INITIAL_RATING * len(players))
+
+    def testEqualRatings(self):
+        leaderboard = Leaderboard()
+        leaderboard.recordGame(finished("tie", "alice", "bob", "Tie"))
+        self.assertEqual((leaderboard.rating("alice"), leaderboard.rating("bob")), (INITIAL_RATING, INITIAL_RATING))
+        leaderboard.recordGame(finished("win", "alice", "bob", "alice"))
+        self.assertEqual(leaderboard.rating("alice"), INITIAL_RATING + ELO_K / 2)
+        self.assertEqual(leaderboard.rating("bob"), INITIAL_RATING - ELO_K / 2)
+
+    def testUpsetsMoveRatingsFurther(self):
+        leaderboard = Leaderboard()
+        leaderboard.recordGame(finished("g0", "alice", "bob", "alice"))
+        favourite = leaderboard.rating("alice")
+        leaderboard.recordGame(finished("g1", "alice", "bob", "alice"))
+        expectedWin = leaderboard.rating("alice") - favourite
+        leaderboard.recordGame(finished("g2", "alice", "bob", "bob"))
+        upset = leaderboard.rating("bob") - (INITIAL_RATING - ELO_K / 2 - expectedWin)
+        self.assertGreater(upset, expectedWin)
+
+    def testOnlyFinishedGamesBetweenTwoPlayersCount(self):
+        leaderboard = Leaderboard()
+        leaderboard.recordGame(dict(finished("live", "alice", "bob", "alice"), StatusDate="IN_PROGRESS_1"))
+        leaderboard.recordGame(finished("self", "alice", "alice", "alice"))
+        self.assertEqual(leaderboard.playerCount(), 0)
+        self.assertIsNone(leaderboard.rank("alice"))
+        self.assertEqual(leaderboard.rating("alice"), INITIAL_RATING)
+
+    def testRanksAndTop(self):
+        leaderboard = Leaderboard()
+        leaderboard.recordGame(finished("g0", "alice", "bob", "alice"))
+        leaderboard.recordGame(finished("g1", "carol", "dave", "carol"))
+        leaderboard.recordGame(finished("g2", "erin", "frank", "Tie"))
+        # alice and carol have the same rating, as have bob and dave.
+        self.assertEqual([(entry["user"], entry["rank"]) for entry in leaderboard.top(6)],
+                         [("alice", 1), ("carol", 1), ("erin", 3), ("frank", 3), ("bob", 5), ("dave", 5)])
+        self.assertEqual(leaderboard.rank("dave"), 5)
+        self.assertEqual(leaderboard.stats("alice"),
+                         {"user": "alice", "rank": 1, "rating": 1216.0, "wins": 1, "losses": 0, "ties": 0})
+        self.assertEqual(len(leaderboard.top(2)), 2)
+
+    def testSnapshotRoundTrip(self):
+        path = os.path.join(self.directory, "leaderboard.json")
+        leaderboard = Leaderboard(snapshotPath=path)
+        for index, result in enumerate(["alice", "bob", "Tie", "alice"]):
+            leaderboard.recordGame(finished("g%d" % index, "alice", "bob", result))
+        leaderboard.save()
+        loaded = Leaderboard(snapshotPath=path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.top(), leaderboard.top())
+        self.assertEqual(loaded.games, 4)
+        self.assertFalse(Leaderboard(snapshotPath=os.path.join(self.directory, "missing.json")).load())
+
+    def testRebuildMatchesTheGamesAsTheyFinished(self):
+        controller = memoryController()
+        live = Leaderboard()
+        for index, (host, opponent) in enumerate([("alice", "bob"), ("bob", "carol"), ("carol", "alice"),
+                                                  ("alice", "bob"), ("dave", "alice")]):
+            live.recordGame(finishGame(controller, "g%d" % index, host, opponent))
+        controller.createStartedGame("live", "alice", "dave")
+        rebuilt = Leaderboard()
+        self.assertTrue(rebuilt.rebuildFrom(controller.cm.getGamesTable(), pageSize=2))
+        self.assertEqual(live.playerCount(), 4)
+        self.assertEqual(rebuilt.top(), live.top())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import binascii
+import os
+import threading
+import time
+import unittest
+
+from dynamodb.matchmaking import (FifoQueue, MatchQueueManager, Matchmaker, SharedQueue, SkillQueue,
+                                  connectSharedQueue)
+from dynamodb.stateBus import LocalBus
+from tests.support import memoryController
+
+
+class FifoQueueTest(unittest.TestCase):
+    def testPairsWithTheLongestWaiting(self):
+        queue = FifoQueue()
+        self.assertEqual(queue.add("alice", 0, 1), (None, None))
+        self.assertEqual(queue.add("bob", 0, 2), ("alice", 1))
+        self.assertEqual(len(queue), 0)
+        queue.add("carol", 0, 3)
+        queue.add("carol", 0, 4)
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.add("dave", 0, 5), ("carol", 4))
+
+    def testExpireRemoveAndRestore(self):
+        queue = FifoQueue()
+        queue.add("alice", 0, 0)
+        queue.expire(1)
+        self.assertEqual(queue.add("bob", 0, 2), (None, None))
+        queue.remove("bob")
+        self.assertEqual(queue.add("carol", 0, 3), (None, None))
+        self.assertEqual(queue.add("dave", 0, 4), ("carol", 3))
+        queue.add("erin", 0, 5)
+        queue.restore("carol", 0, 3)
+        self.assertEqual(queue.add("frank", 0, 6), ("carol", 3))
+        self.assertEqual(queue.add("grace", 0, 7), ("erin", 5))
+
+
+class SkillQueueTest(unittest.TestCase):
+    def testPairsWithinABucketFirst(self):
+        queue = SkillQueue(bucketWidth=100, widenSeconds=5, maxSpread=2)
+        queue.add("alice", 1050, 0)
+        queue.add("bob", 1250, 0)
+        self.assertEqual(queue.add("carol", 1260, 0), ("bob", 0))
+        self.assertEqual(queue.add("dave", 1099, 0), ("alice", 0))
+
+    def testWidensWithWaiting(self):
+        queue = SkillQueue(bucketWidth=100, widenSeconds=5, maxSpread=2)
+        queue.add("alice", 1000, 0)
+        self.assertEqual(queue.add("bob", 1200, 9), (None, None))
+        queue.remove("bob")
+        # alice has now waited two widenings, enough for a player two buckets away.
+        self.assertEqual(queue.add("bob", 1200, 10), ("alice", 0))
+        queue.add("carol", 1000, 10)
+        self.assertEqual(queue.add("dave", 1300, 100), (None, None))
+        self.assertEqual(len(queue), 2)
+
+    def testExpireRemoveAndRestore(self):
+        queue = SkillQueue(bucketWidth=100)
+        queue.add("alice", 1000, 0)
+        queue.add("bob", 1500, 5)
+        queue.add("carol", 2000, 10)
+        queue.expire(5)
+        queue.remove("carol")
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.add("dave", 1000, 20), (None, None))
+        self.assertEqual(queue.add("erin", 1510, 20), ("bob", 5))
+        queue.restore("bob", 1500, 5)
+        self.assertEqual(queue.add("frank", 1590, 21), ("bob", 5))
+
+
+class MatchmakerTest(unittest.TestCase):
+    def setUp(self):
+        self.controller = memoryController()
+
+    def testPairsTwoPlayersIntoAStartedGame(self):
+        matchmaker = Matchmaker(self.controller)
+        self.assertIsNone(matchmaker.join("alice"))
+        self.assertIsNone(matchmaker.status("alice"))
+        self.assertEqual(matchmaker.waitingCount(), 1)
+        gameId = matchmaker.join("bob")
+        self.assertEqual(matchmaker.status("alice"), gameId)
+        self.assertEqual(matchmaker.waitingCount(), 0)
+        game = self.controller.getGame(gameId)
+        # The player who waited hosts, and the one who arrived moves first.
+        self.assertEqual((game["HostId"], game["OpponentId"], game["Turn"]), ("alice", "bob", "bob"))
+        self.assertTrue(game["StatusDate"].startswith("IN_PROGRESS"))
+
+    def testLeaveCancels(self):
+        matchmaker = Matchmaker(self.controller)
+        matchmaker.join("alice")
+        matchmaker.leave("alice")
+        self.assertEqual(matchmaker.waitingCount(), 0)
+        self.assertIsNone(matchmaker.join("bob"))
+
+    def testWaitingPlayersExpire(self):
+        matchmaker = Matchmaker(self.controller, waitSeconds=0.01)
+        matchmaker.join("alice")
+        time.sleep(0.05)
+        self.assertIsNone(matchmaker.join("bob"))
+        self.assertEqual(matchmaker.waitingCount(), 1)
+
+    def testWaitingPlayerKeepsTheirPlaceWhenTheGameCannotBeCreated(self):
+        class Failing(object):
+            bus = LocalBus()
+
+            def createStartedGame(self, gameId, host, opponent):
+                return False
+        matchmaker = Matchmaker(Failing())
+        matchmaker.join("alice")
+        self.assertFalse(matchmaker.join("bob"))
+        self.assertEqual(matchmaker.waitingCount(), 1)
+        matchmaker.controller = self.controller
+        gameId = matchmaker.join("carol")
+        self.assertEqual(self.controller.getGame(gameId)["HostId"], "alice")
+
+
+class SharedQueueTest(unittest.TestCase):
+    def testWorkersShareTheServedQueue(self):
+        authkey = binascii.hexlify(os.urandom(8))
+        server = MatchQueueManager(authkey=authkey).get_server()
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        first, second = [connectSharedQueue(server.address, authkey, "fifo", {}) for _ in range(2)]
+        controller = memoryController()
+        firstWorker = Matchmaker(controller, queue=first)
+        secondWorker = Matchmaker(controller, queue=second)
+        firstWorker.join("shared-alice")
+        self.assertEqual(second.count(), 1)
+        secondWorker.leave("shared-alice")
+        self.assertEqual(first.count(), 0)
+        firstWorker.join("shared-bob")
+        gameId = secondWorker.join("shared-carol")
+        self.assertEqual(controller.getGame(gameId)["HostId"], "shared-bob")
+
+    def testLocalQueue(self):
+        queue = SharedQueue(FifoQueue())
+        queue.add("alice", 0, 1, 0)
+        self.assertEqual(queue.add("bob", 0, 3, 2), (None, None))
+        self.assertEqual(queue.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
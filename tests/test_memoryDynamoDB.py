@@ -0,0 +1,114 @@
+import unittest
+from botocore.exceptions import ClientError
+from boto3.dynamodb.types import TypeSerializer
+
+from dynamodb.connectionManager import ConnectionManager
+from dynamodb.gameController import HOST_INDEX
+
+
+def errorCode(error):
+    return error.response["Error"]["Code"]
+
+
+class MemoryDynamoDBTest(unittest.TestCase):
+    def setUp(self):
+        self.dynamodb = ConnectionManager(mode='memory').dynamodb
+        self.table = self.dynamodb.Table("Games")
+
+    def game(self, gameId, host, statusDate):
+        return {"GameId": gameId, "HostId": host, "OpponentId": "bob", "StatusDate": statusDate}
+
+    def testPutWithExpectedFailsWhenTheItemExists(self):
+        expected = {"GameId": {"Exists": False}}
+        self.table.put_item(Item=self.game("g", "alice", "PENDING_1"), Expected=expected)
+        with self.assertRaises(ClientError) as caught:
+            self.table.put_item(Item=self.game("g", "alice", "PENDING_2"), Expected=expected)
+        self.assertEqual(errorCode(caught.exception), "ConditionalCheckFailedException")
+        self.assertEqual(self.table.get_item(Key={"GameId": "g"})["Item"]["StatusDate"], "PENDING_1")
+
+    def testLegacyUpdate(self):
+        self.table.put_item(Item=dict(self.game("g", "alice", "IN_PROGRESS_1"), Version=1, Turn="bob"))
+        response = self.table.update_item(
+            Key={"GameId": "g"},
+            AttributeUpdates={"Turn": {"Value": "alice", "Action": "PUT"}, "Version": {"Value": 1, "Action": "ADD"}},
+            Expected={"Turn": {"Value": "bob"},
+                      "StatusDate": {"AttributeValueList": ["IN_PROGRESS"], "ComparisonOperator": "BEGINS_WITH"}},
+            ReturnValues="ALL_NEW")
+        self.assertEqual((response["Attributes"]["Turn"], response["Attributes"]["Version"]), ("alice", 2))
+        with self.assertRaises(ClientError):
+            self.table.update_item(Key={"GameId": "g"}, AttributeUpdates={"Turn": {"Value": "bob", "Action": "PUT"}},
+                                   Expected={"Turn": {"Value": "bob"}})
+
+    def testUpdateExpressionWithConditionOnAList(self):
+        self.table.put_item(Item={"GameId": "USER#alice", "Recent": [{"GameId": "a"}, {"GameId": "b"}]})
+        with self.assertRaises(ClientError):
+            self.table.update_item(Key={"GameId": "USER#alice"}, UpdateExpression="SET #r = :new",
+                                   ConditionExpression="#r = :old", ExpressionAttributeNames={"#r": "Recent"},
+                                   ExpressionAttributeValues={":new": [], ":old": [{"GameId": "a"}]})
+        self.table.update_item(Key={"GameId": "USER#alice"}, UpdateExpression="SET #r = :new",
+                               ConditionExpression="#r = :old", ExpressionAttributeNames={"#r": "Recent"},
+                               ExpressionAttributeValues={":new": [{"GameId": "b"}],
+                                                          ":old": [{"GameId": "a"}, {"GameId": "b"}]})
+        self.assertEqual(self.table.get_item(Key={"GameId": "USER#alice"})["Item"]["Recent"], [{"GameId": "b"}])
+
+    def testIndexQueryPagesNewestFirst(self):
+        for index in range(7):
+            self.table.put_item(Item=self.game("g%d" % index, "alice", "FINISHED_%d" % index))
+        self.table.put_item(Item=self.game("p", "alice", "PENDING_9"))
+        self.table.put_item(Item=self.game("other", "carol", "FINISHED_5"))
+        found = []
+        kwargs = {}
+        while True:
+            response = self.table.query(IndexName=HOST_INDEX, Limit=3, ScanIndexForward=False,
+                                         KeyConditionExpression="HostId = :u AND begins_with(StatusDate, :s)",
+                                         ExpressionAttributeValues={":u": "alice", ":s": "FINISHED"}, **kwargs)
+            found.extend(item["GameId"] for item in response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        self.assertEqual(found, ["g%d" % index for index in reversed(range(7))])
+
+    def testParallelScanSegmentsCoverTheTableOnce(self):
+        for index in range(40):
+            self.table.put_item(Item=self.game("g%02d" % index, "alice", "FINISHED_1"))
+        found = []
+        for segment in range(3):
+            kwargs = {"Segment": segment, "TotalSegments": 3, "Limit": 5}
+            while True:
+                response = self.table.scan(**kwargs)
+                found.extend(item["GameId"] for item in response["Items"])
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        self.assertEqual(sorted(found), ["g%02d" % index for index in range(40)])
+
+    def testTransactionIsAllOrNothing(self):
+        serializer = TypeSerializer()
+        self.table.put_item(Item=self.game("g", "alice", "PENDING_1"))
+        client = self.dynamodb.meta.client
+        items = [
+            {"Put": {"TableName": "Games", "Item": {"GameId": serializer.serialize("new")}}},
+            {"Delete": {"TableName": "Games", "Key": {"GameId": serializer.serialize("g")},
+                        "ConditionExpression": "begins_with(StatusDate, :s)",
+                        "ExpressionAttributeValues": {":s": serializer.serialize("IN_PROGRESS")}}}
+        ]
+        with self.assertRaises(ClientError) as caught:
+            client.transact_write_items(TransactItems=items)
+        self.assertEqual(errorCode(caught.exception), "TransactionCanceledException")
+        self.assertEqual([reason["Code"] for reason in caught.exception.response["CancellationReasons"]],
+                         ["None", "ConditionalCheckFailed"])
+        self.assertNotIn("Item", self.table.get_item(Key={"GameId": "new"}))
+        self.assertIn("Item", self.table.get_item(Key={"GameId": "g"}))
+
+    def testBatchWriteLimit(self):
+        requests = [{"PutRequest": {"Item": {"GameId": str(index)}}} for index in range(26)]
+        with self.assertRaises(ClientError) as caught:
+            self.dynamodb.batch_write_item(RequestItems={"Games": requests})
+        self.assertEqual(errorCode(caught.exception), "ValidationException")
+        response = self.dynamodb.batch_write_item(RequestItems={"Games": requests[:25]})
+        self.assertEqual(response["UnprocessedItems"], {})
+        self.assertEqual(self.table.item_count, 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import time
+import unittest
+from botocore.exceptions import ClientError
+
+from dynamodb.batchWriter import RateLimiter
+from dynamodb.retry import RetryPolicy, RetryingTable, isThrottled
+
+
+def clientError(code, reasons=None):
+    response = {"Error": {"Code": code}}
+    if reasons is not None:
+        response["CancellationReasons"] = [{"Code": reason} for reason in reasons]
+    return ClientError(response, "Operation")
+
+
+class Flaky(object):
+    """
+    Raises each of errors in turn from get_item, then returns the item.
+    """
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+        self.name = "Games"
+
+    def get_item(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"Item": kwargs["Key"]}
+
+
+class RetryTest(unittest.TestCase):
+    def testIsThrottled(self):
+        self.assertTrue(isThrottled(clientError("ProvisionedThroughputExceededException")))
+        self.assertTrue(isThrottled(clientError("ThrottlingException")))
+        self.assertFalse(isThrottled(clientError("ConditionalCheckFailedException")))
+        self.assertTrue(isThrottled(clientError("TransactionCanceledException", ["None", "TransactionConflict"])))
+        # A transaction whose condition failed fails again however often it is sent.
+        self.assertFalse(isThrottled(clientError("TransactionCanceledException",
+                                                 ["ConditionalCheckFailed", "ThrottlingError"])))
+        self.assertFalse(isThrottled(clientError("TransactionCanceledException", ["None", "None"])))
+
+    def testRetriesThrottledRequests(self):
+        policy = RetryPolicy(maxAttempts=3, baseDelay=0.001)
+        table = Flaky(clientError("ThrottlingException"), clientError("ThrottlingException"))
+        self.assertEqual(RetryingTable(table, policy).get_item(Key={"GameId": "g"}), {"Item": {"GameId": "g"}})
+        self.assertEqual(table.calls, 3)
+        self.assertEqual(policy.stats(), {"throttles": {"get_item": 2}, "retries": {"get_item": 2}, "failures": {}})
+
+    def testGivesUpAfterMaxAttempts(self):
+        policy = RetryPolicy(maxAttempts=2, baseDelay=0.001)
+        table = Flaky(*[clientError("ThrottlingException")] * 3)
+        with self.assertRaises(ClientError):
+            RetryingTable(table, policy).get_item(Key={"GameId": "g"})
+        self.assertEqual(table.calls, 2)
+        self.assertEqual(policy.stats()["failures"], {"get_item": 1})
+
+    def testOtherErrorsAreNotRetried(self):
+        policy = RetryPolicy(maxAttempts=3, baseDelay=0.001)
+        table = Flaky(clientError("ConditionalCheckFailedException"))
+        with self.assertRaises(ClientError):
+            RetryingTable(table, policy).get_item(Key={"GameId": "g"})
+        self.assertEqual(table.calls, 1)
+        self.assertEqual(policy.stats()["throttles"], {})
+
+    def testOnlyDataOperationsAreWrapped(self):
+        table = Flaky()
+        self.assertEqual(RetryingTable(table, RetryPolicy()).name, "Games")
+
+    def testDelaysAreBounded(self):
+        policy = RetryPolicy(baseDelay=0.05, maxDelay=0.3)
+        for attempt in range(1, 10):
+            delay = policy.delay(attempt)
+            self.assertTrue(0 <= delay <= min(0.3, 0.05 * 2 ** attempt))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def testLimitsTheRate(self):
+        limiter = RateLimiter(100)
+        start = time.time()
+        # The first second's worth is available straight away.
+        for _ in range(150):
+            limiter.acquire(1)
+        self.assertGreaterEqual(time.time() - start, 0.4)
+
+    def testLargeRequestsAreNotStarved(self):
+        limiter = RateLimiter(10)
+        start = time.time()
+        limiter.acquire(25)
+        self.assertLess(time.time() - start, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from models.board import Board, FULL_MASK
+from models.solver import Solver
+from tests.support import memoryController
+
+
+class SolverTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.solver = Solver.build()
+
+    def outcomes(self, board, solverMarker, toMove):
+        """
+        Plays the solver against every possible sequence of opponent moves and
+        returns the set of winners, None standing for a tie.
+        """
+        winner = board.winner()
+        if winner is not None or board.isFull():
+            return set([winner])
+        if toMove == solverMarker:
+            index = self.solver.playFor(board, solverMarker)
+            self.assertIsNotNone(index)
+            self.assertFalse(board.isOccupied(index))
+            return self.outcomes(board.place(index, toMove), solverMarker, "O" if toMove == "X" else "X")
+        results = set()
+        for index in range(len(board)):
+            if not board.isOccupied(index):
+                results |= self.outcomes(board.place(index, toMove), solverMarker, "O" if toMove == "X" else "X")
+        return results
+
+    def testNeverLosesMovingFirst(self):
+        for marker in ("X", "O"):
+            outcomes = self.outcomes(Board.empty(), marker, marker)
+            self.assertNotIn("O" if marker == "X" else "X", outcomes)
+
+    def testNeverLosesMovingSecond(self):
+        for marker in ("X", "O"):
+            outcomes = self.outcomes(Board.empty(), marker, "O" if marker == "X" else "X")
+            self.assertNotIn("O" if marker == "X" else "X", outcomes)
+
+    def testPerfectPlayIsATie(self):
+        self.assertEqual(self.solver.score(0, 0), 0)
+
+    def testTakesAWinningMove(self):
+        # X to move holds two of the top row, with the third square free.
+        board = Board.fromPacked("XX OO    ")
+        self.assertEqual(self.solver.playFor(board, "X"), 2)
+
+    def testNoMoveOnAFinishedBoard(self):
+        self.assertIsNone(self.solver.playFor(Board.fromPacked("XXXOO    "), "O"))
+        self.assertIsNone(self.solver.bestMove(FULL_MASK & 0b101010101, FULL_MASK & 0b010101010))
+
+    def testSaveAndLoadRoundTrip(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "solver.bin")
+            self.solver.save(path)
+            loaded = Solver.load(path)
+            self.assertEqual(loaded.solved, self.solver.solved)
+            self.assertEqual(loaded.moves, self.solver.moves)
+            self.assertEqual(loaded.scores, self.solver.scores)
+        finally:
+            shutil.rmtree(directory)
+
+    def testLoadRejectsOtherFiles(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "solver.bin")
+            with open(path, "wb") as f:
+                f.write(b"not a solver table")
+            self.assertRaises(ValueError, Solver.load, path)
+        finally:
+            shutil.rmtree(directory)
+
+
+class ComputerOpponentTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.solver = Solver.build()
+
+    def testComputerAnswersEveryMoveAndNeverLoses(self):
+        controller = memoryController(solver=self.solver)
+        self.assertTrue(controller.isComputer(controller.computerUser))
+        self.assertTrue(controller.createNewGame("g", "alice", controller.computerUser))
+        item = controller.getGame("g")
+        while item["Turn"] == "alice":
+            board = controller.getBoardState(item)
+            square = next(index for index in range(len(board)) if not board.isOccupied(index))
+            success, item = controller.makeMove("g", square, "alice")
+            self.assertTrue(success)
+        self.assertEqual(item["Turn"], "N/A")
+        self.assertNotEqual(item["Result"], "alice")
+
+    def testComputerOnlyPlaysTheClassicBoard(self):
+        controller = memoryController(solver=self.solver)
+        self.assertFalse(controller.createNewGame("g", "alice", controller.computerUser, 5, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+from dynamodb.connectionManager import ConnectionManager
+from dynamodb.gameController import GameController
+from dynamodb.userSummaries import summaryKey, COUNTERS, INVITE_PREFIX, RECENT_GAMES
+from rebuildSummaries import SummaryBuilder, scanGames
+from tests.support import finishGame
+
+
+def gameIds(games):
+    return [game["GameId"] for game in games]
+
+
+class UserSummariesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cm = ConnectionManager(mode='memory')
+        cls.table = cm.getGamesTable()
+        cls.summaries = GameController(cm, userSummaries=True)
+        cls.queries = GameController(cm)
+        players = ["bob", "carol", "dave"]
+        for index in range(RECENT_GAMES + 4):
+            opponent = players[index % len(players)]
+            host, invitee = ("alice", opponent) if index % 2 else (opponent, "alice")
+            finishGame(cls.summaries, "f%02d" % index, host, invitee)
+        for index, opponent in enumerate(players):
+            cls.summaries.createNewGame("invite%d" % index, opponent, "alice")
+            cls.summaries.createStartedGame("live%d" % index, "alice", opponent)
+        cls.summaries.rejectGameInvite(cls.summaries.getGame("invite1"))
+        cls.summaries.acceptGameInvite(cls.summaries.getGame("invite2"))
+
+    def finishedPages(self, dashboard):
+        finished = gameIds(dashboard["finished"])
+        cursor = dashboard["finishedCursor"]
+        while cursor is not None:
+            page = self.queries.getDashboard("alice", finishedCursor=cursor)
+            finished.extend(gameIds(page["finished"]))
+            cursor = page["finishedCursor"]
+        return finished
+
+    def testDashboardMatchesTheIndexQueries(self):
+        for user in ("alice", "bob", "carol", "dave"):
+            fromSummary = self.summaries.getDashboard(user)
+            fromQueries = self.queries.getDashboard(user)
+            self.assertIn("record", fromSummary)
+            self.assertEqual(sorted(gameIds(fromSummary["invites"])), sorted(gameIds(fromQueries["invites"])))
+            self.assertEqual(gameIds(fromSummary["inProgress"]), gameIds(fromQueries["inProgress"]))
+            self.assertEqual(gameIds(fromSummary["finished"]), gameIds(fromQueries["finished"]))
+
+    def testFinishedPagesAreInTheSameOrder(self):
+        fromSummary = self.finishedPages(self.summaries.getDashboard("alice"))
+        fromQueries = self.finishedPages(self.queries.getDashboard("alice"))
+        self.assertEqual(fromSummary, fromQueries)
+        self.assertEqual(fromSummary, ["f%02d" % index for index in reversed(range(RECENT_GAMES + 4))])
+
+    def testRecordCountsEveryFinishedGame(self):
+        record = self.summaries.getDashboard("alice")["record"]
+        self.assertEqual(sum(record.values()), RECENT_GAMES + 4)
+        # alice wins the games she was invited to, and loses those she hosted.
+        self.assertEqual(record["Wins"], (RECENT_GAMES + 5) // 2)
+
+    def testRejectedInviteLeavesTheSummary(self):
+        summary = self.table.get_item(Key={"GameId": summaryKey("alice")})["Item"]
+        self.assertIn(INVITE_PREFIX + "invite0", summary)
+        self.assertNotIn(INVITE_PREFIX + "invite1", summary)
+        self.assertNotIn(INVITE_PREFIX + "invite2", summary)
+
+    def testFailedTransactionChangesNothing(self):
+        self.assertTrue(self.summaries.createNewGame("late", "bob", "alice"))
+        invite = self.summaries.getGame("late")
+        self.assertTrue(self.summaries.acceptGameInvite(invite))
+        before = self.table.get_item(Key={"GameId": summaryKey("alice")})["Item"]
+        # Answering an invite that is no longer pending fails, summary and all.
+        self.assertFalse(self.summaries.acceptGameInvite(invite))
+        self.assertFalse(self.summaries.rejectGameInvite(invite))
+        self.assertEqual(self.table.get_item(Key={"GameId": summaryKey("alice")})["Item"], before)
+
+    def testRebuildMatchesTheLiveSummaries(self):
+        builder = SummaryBuilder()
+        for item in scanGames(self.table, 7):
+            builder.add(item)
+        for rebuilt in builder.items():
+            live = self.table.get_item(Key={"GameId": rebuilt["GameId"]})["Item"]
+            # Counters only appear in a live summary once they are first added to.
+            self.assertEqual(sorted(set(live) - set(COUNTERS.values())),
+                             sorted(set(rebuilt) - set(COUNTERS.values())))
+            for name, value in rebuilt.items():
+                if name in COUNTERS.values():
+                    self.assertEqual(live.get(name, 0), value, name)
+                elif name == "Recent":
+                    self.assertEqual(gameIds(live[name])[:RECENT_GAMES], gameIds(value))
+                else:
+                    self.assertEqual(live[name], value, name)
+
+
+if __name__ == '__main__':
+    unittest.main()